@@ -0,0 +1,108 @@
+"""Population analytics over pre-aggregated category rollups.
+
+The result store keeps one counter per (day, site, assessment type, category)
+and bumps it in the same transaction that stores a result. Dashboards read
+those counters, which are at most days x sites x categories rows however many
+results have been submitted. ``backfill`` rebuilds the counters from the
+stored history in parallel, e.g. after a category threshold changes.
+``describe_inputs`` summarizes the raw measurements behind the results, read
+column by column from the store's input tables.
+"""
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+import numpy as np
+
+from codec import decode_record
+from result_store import rollup_key
+
+# Dimensions a summary can be broken down by, besides assessment type
+GROUP_DIMENSIONS = ('day', 'site')
+
+
+def summarize(rows, group_by=()):
+    """Category counts and shares per assessment type, optionally per day and/or site.
+
+    ``rows`` are (day, site, assessment_type, category, count) tuples from
+    ``get_rollups``.
+    """
+    groups = {}
+    for day, site, assessment_type, category, count in rows:
+        dimensions = {'day': day, 'site': site}
+        key = tuple(dimensions[name] for name in group_by) + (assessment_type,)
+        groups.setdefault(key, Counter())[category] += count
+
+    summary = []
+    for key, counts in sorted(groups.items()):
+        total = sum(counts.values())
+        entry = dict(zip(group_by, key))
+        entry['assessment_type'] = key[-1]
+        entry['total'] = total
+        entry['categories'] = {category: {'count': count, 'share': round(count / total, 4)}
+                               for category, count in counts.most_common()}
+        summary.append(entry)
+    return summary
+
+
+def describe_inputs(columns, types):
+    """Per-field summary of input columns ({field: [value]}, value types from codec.INPUT_SCHEMAS).
+
+    Numbers get their count, mean, range and 10th/50th/90th percentiles over
+    the answered values; yes/no and text answers get counts per answer.
+    """
+    summary = {}
+    for name, values in columns.items():
+        if types[name] in (int, float):
+            # None (unanswered) becomes NaN and is left out with real NaNs
+            data = np.asarray(values, dtype=float)
+            data = data[~np.isnan(data)]
+            entry = {'count': int(data.size)}
+            if data.size:
+                low, median, high = np.percentile(data, [10, 50, 90])
+                entry.update(mean=round(float(data.mean()), 3), min=float(data.min()), p10=float(low),
+                             median=float(median), p90=float(high), max=float(data.max()))
+        else:
+            answers = Counter('unanswered' if value is None else 'yes' if value is True else 'no' if value is False
+                              else value for value in values)
+            entry = {'count': len(values), 'answers': dict(answers.most_common())}
+        summary[name] = entry
+    return summary
+
+
+def count_history_range(path, first_id, last_id, categorize):
+    """Rollup counts of the history rows with first_id <= id <= last_id"""
+    counts = Counter()
+    with closing(sqlite3.connect(f'file:{path}?mode=ro', uri=True)) as conn:
+        rows = conn.execute("SELECT assessment_type, payload FROM history WHERE id BETWEEN ? AND ?",
+                            (first_id, last_id))
+        for assessment_type, payload in rows:
+            counts[rollup_key(assessment_type, decode_record(payload), categorize)] += 1
+    return counts
+
+
+def backfill(store, categorize, workers=1, chunk_rows=100000):
+    """Rebuild every rollup of a SQLite result store from its history.
+
+    The history is split into id ranges counted by ``workers`` processes; rows
+    stored while the backfill runs are counted when the new rollups are swapped
+    in. ``categorize(assessment_type, result)`` labels records stored without a
+    category. Returns the number of history rows counted.
+    """
+    first_id, last_id = store.history_id_range()
+    counts = Counter()
+    if first_id is not None:
+        ranges = [(start, min(start + chunk_rows - 1, last_id))
+                  for start in range(first_id, last_id + 1, chunk_rows)]
+        if workers <= 1:
+            parts = (count_history_range(store.path, start, end, categorize) for start, end in ranges)
+            for part in parts:
+                counts.update(part)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for part in pool.map(count_history_range, [store.path] * len(ranges),
+                                     *zip(*ranges), [categorize] * len(ranges)):
+                    counts.update(part)
+    counts = store.replace_rollups(counts, last_id, categorize)
+    return sum(counts.values())
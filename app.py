@@ -1,44 +1,130 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import (Flask, Response, render_template, stream_template, request, redirect, url_for, session, flash,
+                   get_flashed_messages, abort, jsonify, g)
+import itertools
 import json
-from datetime import datetime
+import logging
+import math
+import os
+import secrets
+from collections import namedtuple
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from types import MappingProxyType
+
+from flask.sessions import SecureCookieSessionInterface
+from markupsafe import Markup
+
+from analytics import GROUP_DIMENSIONS, describe_inputs, summarize
+from codec import INPUT_SCHEMAS, SCHEMAS as CODEC_SCHEMAS
+from composite import DerivationGraph, Node
+from lookup import LookupScorer
+from documents import Document, DocumentCache, content_key, html_to_pdf, weasyprint
+from metrics import render_prometheus, stage_timer
+from page_cache import PageCache
+from result_store import DEFAULT_SITE, create_result_store
+from rules import RuleFile
 
 app = Flask(__name__)
 app.secret_key = 'health-plus-secret-key-2024'  # Change this in production
 
+# Submission logging: 'text' (default) or compact 'json' events, for 1 in N submissions
+app.config['LOG_FORMAT'] = os.environ.get('HEALTHPLUS_LOG_FORMAT', 'text')
+app.config['LOG_SAMPLE_RATE'] = max(1, int(os.environ.get('HEALTHPLUS_LOG_SAMPLE_RATE', '1')))
+
+# Static pages are rendered once per process and served with ETags (off in debug mode)
+app.config['PAGE_CACHE'] = os.environ.get('HEALTHPLUS_PAGE_CACHE', '1') != '0'
+page_cache = PageCache()
+
+# Self-hosted CSS/fonts built by build_assets.py; without a build the CDNs are used
+ASSET_MANIFEST_PATH = os.path.join(app.static_folder, 'dist', 'manifest.json')
+
+def load_asset_manifest(path=ASSET_MANIFEST_PATH):
+    """Map of logical asset names to content-hashed paths under static/"""
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+
+asset_manifest = load_asset_manifest()
+
+def asset_url(name):
+    return url_for('static', filename=asset_manifest[name])
+
+app.jinja_env.globals.update(asset_manifest=asset_manifest, asset_url=asset_url)
+
+@app.after_request
+def cache_hashed_assets(response):
+    """Hashed build output never changes under the same name, so cache it for good"""
+    if (request.endpoint == 'static' and response.status_code == 200
+            and request.view_args.get('filename', '').startswith('dist/')):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+# Results are kept server-side; the session cookie only carries an opaque id
+result_store = create_result_store()
+
+# Cut points of the band-based scorers, from a versioned rule file that is
+# reloaded when it changes (see rules.py); stored results record its version
+app.config['RULES_PATH'] = os.environ.get('HEALTHPLUS_RULES', os.path.join(app.root_path, 'rules', 'thresholds.json'))
+threshold_rules = RuleFile(app.config['RULES_PATH'])
+
+@app.before_request
+def refresh_threshold_rules():
+    threshold_rules.refresh()
+
+# Site (clinic, screening camp) this deployment records results for, used by the analytics rollups
+app.config['SITE'] = os.environ.get('HEALTHPLUS_SITE', DEFAULT_SITE)
+# /admin/* is only served when a token is configured, and requires "Authorization: Bearer <token>"
+app.config['ADMIN_TOKEN'] = os.environ.get('HEALTHPLUS_ADMIN_TOKEN')
+# Largest request body accepted, in bytes (413 beyond it); also enforced by the ASGI adapter while reading
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('HEALTHPLUS_MAX_BODY_BYTES', 10 * 1024 * 1024))
+
+# The session cookie only carries the sid keying a user's results and history,
+# so it outlives the browser session; each request renews it
+app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=int(os.environ.get('HEALTHPLUS_SESSION_DAYS', 365)))
+
+class SharedPageSessionInterface(SecureCookieSessionInterface):
+    """Signed-cookie sessions that don't renew the cookie on pages from the shared page cache.
+
+    A Set-Cookie (and the Vary: Cookie that comes with it) would keep shared
+    caches from storing those pages; every other request still renews it.
+    """
+
+    def should_set_cookie(self, app, session):
+        if g.get('shared_page'):
+            return session.modified
+        return super().should_set_cookie(app, session)
+
+app.session_interface = SharedPageSessionInterface()
+
+def get_session_id(create=False):
+    """Return the opaque id keying this session's results in the result store"""
+    sid = session.get('sid')
+    if sid is None and create:
+        sid = secrets.token_urlsafe(16)
+        session['sid'] = sid
+    if sid is not None and not session.permanent:
+        # Also upgrades cookies issued before sessions were permanent
+        session.permanent = True
+    return sid
+
 # Health assessment calculations
 def calculate_bmi(weight_kg, height_m):
     """Calculate BMI"""
     if height_m <= 0:
         return None
     bmi = weight_kg / (height_m ** 2)
-    
-    if bmi < 18.5:
-        category = "Underweight"
-    elif bmi < 25:
-        category = "Normal weight"
-    elif bmi < 30:
-        category = "Overweight"
-    else:
-        category = "Obese"
+    category = threshold_rules.current.classify('bmi', bmi=bmi)['category']
     
     return {"value": round(bmi, 1), "category": category}
 
 def assess_cardiovascular(bp_systolic, bp_diastolic):
     """Assess cardiovascular health based on blood pressure"""
-    if bp_systolic < 120 and bp_diastolic < 80:
-        status = "Normal"
-        risk = "Low"
-    elif bp_systolic < 130 and bp_diastolic < 80:
-        status = "Elevated"
-        risk = "Medium"
-    elif bp_systolic < 140 or bp_diastolic < 90:
-        status = "Stage 1 Hypertension"
-        risk = "Medium-High"
-    else:
-        status = "Stage 2 Hypertension"
-        risk = "High"
+    outcome = threshold_rules.current.classify('cardiovascular', systolic=bp_systolic, diastolic=bp_diastolic)
     
-    return {"status": status, "risk": risk}
+    return {"status": outcome['status'], "risk": outcome['risk']}
 
 def assess_stroke_risk(age, bp_systolic, smoking, diabetes, heart_disease):
     """Non-laboratory stroke risk assessment"""
@@ -100,80 +186,21 @@ def assess_metabolic(waist_circumference, gender, bp_systolic):
 
 def assess_respiratory(spo2):
     """Assess respiratory health based on SpO2"""
-    if spo2 >= 95:
-        status = "Normal"
-    elif spo2 >= 90:
-        status = "Mild Hypoxemia"
-    else:
-        status = "Severe Hypoxemia - Seek Medical Attention"
+    status = threshold_rules.current.classify('respiratory', spo2=spo2)['status']
     
     return {"status": status, "spo2": spo2}
 
 def assess_fitness(resting_hr, age):
     """Assess physical fitness based on resting heart rate"""
     max_hr = 220 - age
-    
-    if resting_hr < 60:
-        status = "Athlete Level"
-    elif resting_hr < 70:
-        status = "Excellent"
-    elif resting_hr < 80:
-        status = "Good"
-    elif resting_hr < 90:
-        status = "Average"
-    else:
-        status = "Below Average"
+    status = threshold_rules.current.classify('fitness', resting_hr=resting_hr)['status']
     
     return {"status": status, "hr_zone": f"{round((resting_hr/max_hr)*100)}% of max"}
 
 def assess_body_composition(bf_percentage, gender, age):
     """Assess body composition based on BIA body fat percentage"""
-    if gender.lower() == 'male':
-        if age < 30:
-            if bf_percentage < 8:
-                status = "Essential Fat"
-            elif bf_percentage < 14:
-                status = "Athletes"
-            elif bf_percentage < 18:
-                status = "Fitness"
-            elif bf_percentage < 25:
-                status = "Average"
-            else:
-                status = "Obese"
-        else:
-            if bf_percentage < 11:
-                status = "Essential Fat"
-            elif bf_percentage < 17:
-                status = "Athletes"
-            elif bf_percentage < 22:
-                status = "Fitness"
-            elif bf_percentage < 28:
-                status = "Average"
-            else:
-                status = "Obese"
-    else:
-        if age < 30:
-            if bf_percentage < 16:
-                status = "Essential Fat"
-            elif bf_percentage < 20:
-                status = "Athletes"
-            elif bf_percentage < 24:
-                status = "Fitness"
-            elif bf_percentage < 31:
-                status = "Average"
-            else:
-                status = "Obese"
-        else:
-            if bf_percentage < 20:
-                status = "Essential Fat"
-            elif bf_percentage < 25:
-                status = "Athletes"
-            elif bf_percentage < 29:
-                status = "Fitness"
-            elif bf_percentage < 36:
-                status = "Average"
-            else:
-                status = "Obese"
+    status = threshold_rules.current.classify('body-composition', bf_percentage=bf_percentage,
+                                              gender=gender, age=age)['status']
     
     return {"status": status, "percentage": bf_percentage}
 
@@ -214,57 +241,13 @@ def assess_mental_health(phq9_score):
 
 def assess_temperature(temp_celsius):
     """Assess general wellness based on body temperature"""
-    if 36.1 <= temp_celsius <= 37.2:
-        status = "Normal"
-    elif temp_celsius < 36.1:
-        status = "Hypothermia Risk"
-    elif temp_celsius <= 38.0:
-        status = "Low-Grade Fever"
-    else:
-        status = "Fever - Seek Medical Attention"
+    status = threshold_rules.current.classify('temperature', temperature=temp_celsius)['status']
     
     return {"status": status, "temperature": temp_celsius}
 
 def assess_grip_strength(grip_kg, gender, age):
     """Assess functional health based on grip strength"""
-    if gender.lower() == 'male':
-        if age < 30:
-            if grip_kg >= 50:
-                status = "Excellent"
-            elif grip_kg >= 40:
-                status = "Good"
-            elif grip_kg >= 30:
-                status = "Average"
-            else:
-                status = "Below Average"
-        else:
-            if grip_kg >= 45:
-                status = "Excellent"
-            elif grip_kg >= 35:
-                status = "Good"
-            elif grip_kg >= 25:
-                status = "Average"
-            else:
-                status = "Below Average"
-    else:
-        if age < 30:
-            if grip_kg >= 30:
-                status = "Excellent"
-            elif grip_kg >= 25:
-                status = "Good"
-            elif grip_kg >= 20:
-                status = "Average"
-            else:
-                status = "Below Average"
-        else:
-            if grip_kg >= 28:
-                status = "Excellent"
-            elif grip_kg >= 22:
-                status = "Good"
-            elif grip_kg >= 18:
-                status = "Average"
-            else:
-                status = "Below Average"
+    status = threshold_rules.current.classify('grip-strength', grip_kg=grip_kg, gender=gender, age=age)['status']
     
     return {"status": status, "strength": grip_kg}
 
@@ -774,665 +757,1362 @@ def assess_hydration(urine_color, thirst_level, activity_level, fluid_intake, sy
     
     return {"status": status, "hydration_score": hydration_score, "recommendation": recommendation}
 
+# Assessment registry: each assessment declares its form schema and scorer, so
+# submissions are dispatched with one dict lookup and parsed by shared code.
+#
+# Field kinds: 'int'/'float' are required numbers (a default makes them optional),
+# 'optional_int'/'optional_float' become None when left blank, 'yes_no' is a
+# checkbox/radio answered 'yes', and 'text' is passed through as submitted.
+# Numbers must be finite and within the field's (low, high) limits; every number
+# field has them, which also keeps ints inside the stores' 64-bit integer columns.
+FormField = namedtuple('FormField', ['name', 'kind', 'default', 'limits'], defaults=[None, None])
+Assessment = namedtuple('Assessment', ['name', 'scorer', 'fields', 'build_args'], defaults=[None])
+
+NUMBER_FIELD_TYPES = {'int': int, 'float': float, 'optional_int': int, 'optional_float': float}
+
+def parse_field(field, value):
+    """Convert one submitted form value according to its field declaration"""
+    if value is None:
+        value = field.default
+    if field.kind == 'yes_no':
+        return value == 'yes'
+    if field.kind.startswith('optional_') and not value:
+        return None
+    if value is None:
+        raise ValueError(f"Missing value for '{field.name}'")
+    if field.kind == 'text':
+        return value
+    try:
+        number = NUMBER_FIELD_TYPES[field.kind](value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid value for '{field.name}': {value!r}") from None
+    if not math.isfinite(number):
+        raise ValueError(f"Invalid value for '{field.name}': {value!r}")
+    if field.limits is not None and not field.limits[0] <= number <= field.limits[1]:
+        raise ValueError(f"'{field.name}' must be between {field.limits[0]} and {field.limits[1]}")
+    return number
+
+def parse_inputs(assessment, form):
+    """Parse every declared field of an assessment from a form-like mapping"""
+    return {field.name: parse_field(field, form.get(field.name)) for field in assessment.fields}
+
+def score_inputs(assessment, inputs):
+    """Run an assessment's scorer on parsed inputs; raises ValueError for inputs it can't score"""
+    try:
+        if assessment.build_args is not None:
+            args = assessment.build_args(inputs)
+        else:
+            args = [inputs[field.name] for field in assessment.fields]
+        return assessment.scorer(*args)
+    except ArithmeticError:
+        # e.g. a zero height, or numbers too large to square
+        raise ValueError("Values out of range for this assessment") from None
+
+def _yes_no_fields(*names):
+    return [FormField(name, 'yes_no') for name in names]
+
+# Ages are whole years; scorers like assess_fitness (220 - age) break beyond this
+AGE_FIELD = FormField('age', 'int', limits=(0, 120))
+# Blood pressure in mmHg, shared by every form that asks for it
+SYSTOLIC_FIELD = FormField('systolic', 'int', limits=(0, 300))
+DIASTOLIC_FIELD = FormField('diastolic', 'int', limits=(0, 200))
+
+HEARING_FREQUENCIES = ('250', '500', '1000', '2000', '4000')
+
+ASSESSMENTS = {assessment.name: assessment for assessment in [
+    Assessment('bmi', calculate_bmi,
+               [FormField('weight', 'float', limits=(0, 1000)), FormField('height', 'float', limits=(0, 300))],
+               # Height is entered in cm
+               lambda v: (v['weight'], v['height'] / 100)),
+    Assessment('cardiovascular', assess_cardiovascular,
+               [SYSTOLIC_FIELD, DIASTOLIC_FIELD]),
+    Assessment('stroke-risk', assess_stroke_risk,
+               [AGE_FIELD, SYSTOLIC_FIELD]
+               + _yes_no_fields('smoking', 'diabetes', 'heart_disease')),
+    Assessment('metabolic', assess_metabolic,
+               [FormField('waist', 'float', limits=(0, 300)), FormField('gender', 'text'), SYSTOLIC_FIELD]),
+    Assessment('respiratory', assess_respiratory,
+               [FormField('spo2', 'int', limits=(0, 100))]),
+    Assessment('fitness', assess_fitness,
+               [FormField('resting_hr', 'int', limits=(0, 300)), AGE_FIELD]),
+    Assessment('body-composition', assess_body_composition,
+               [FormField('bf_percentage', 'float', limits=(0, 100)), FormField('gender', 'text'), AGE_FIELD]),
+    Assessment('posture', assess_posture,
+               [FormField('alignment', 'int', limits=(1, 5)), FormField('balance', 'int', limits=(1, 5))]),
+    Assessment('mental-health', assess_mental_health,
+               # Each PHQ-9 answer is scored 0-3
+               [FormField(f'q{i}', 'int', limits=(0, 3)) for i in range(1, 10)],
+               # PHQ-9 score is the sum of the nine answers
+               lambda v: (sum(v[f'q{i}'] for i in range(1, 10)),)),
+    Assessment('temperature', assess_temperature,
+               [FormField('temperature', 'float', limits=(20, 45))]),
+    Assessment('grip-strength', assess_grip_strength,
+               [FormField('grip_strength', 'float', limits=(0, 200)), FormField('gender', 'text'), AGE_FIELD]),
+    Assessment('lifestyle', assess_lifestyle,
+               [FormField('smoking_status', 'text'), FormField('physical_activity', 'int', 0, (0, 7 * 24 * 60))]),
+    # Simplified - in real app would use actual Snellen chart results
+    Assessment('vision', assess_vision,
+               [FormField('acuity', 'float', limits=(1, 800))]),
+    Assessment('hearing', assess_hearing,
+               # Hearing thresholds in dB HL
+               [FormField(f'freq_{freq}', 'int', 0, (-10, 120)) for freq in HEARING_FREQUENCIES],
+               lambda v: ({freq: v[f'freq_{freq}'] for freq in HEARING_FREQUENCIES},)),
+    Assessment('prostate', assess_prostate,
+               [AGE_FIELD, FormField('family_history', 'yes_no'),
+                FormField('psa_level', 'optional_float', limits=(0, 10000)), FormField('symptoms', 'yes_no')]),
+    Assessment('hiv', assess_hiv,
+               [AGE_FIELD] + _yes_no_fields('risk_behaviors', 'symptoms', 'recent_exposure')),
+    Assessment('pregnancy', assess_pregnancy,
+               [FormField('weeks_pregnant', 'int', limits=(0, 45)), SYSTOLIC_FIELD._replace(kind='optional_int'),
+                DIASTOLIC_FIELD._replace(kind='optional_int')]
+               + _yes_no_fields('symptoms', 'previous_complications'),
+               lambda v: (v['weeks_pregnant'],
+                          (v['systolic'], v['diastolic']) if v['systolic'] and v['diastolic'] else None,
+                          v['symptoms'], v['previous_complications'])),
+    Assessment('breast-cancer', assess_breast_cancer,
+               [AGE_FIELD, FormField('family_history', 'text', 'none'),
+                FormField('genetic_factors', 'yes_no'), FormField('previous_biopsy', 'yes_no'),
+                FormField('breast_density', 'text', 'normal'), FormField('hormonal_factors', 'yes_no')]),
+    Assessment('tuberculosis', assess_tuberculosis,
+               [AGE_FIELD] + _yes_no_fields('symptoms', 'exposure', 'immunocompromised', 'previous_tb')),
+    Assessment('covid19', assess_covid19,
+               _yes_no_fields('symptoms', 'exposure')
+               + [FormField('vaccination_status', 'text', 'unknown'), FormField('underlying_conditions', 'yes_no'),
+                  FormField('age_group', 'text', 'adult')]),
+    Assessment('malaria', assess_malaria,
+               _yes_no_fields('symptoms', 'travel_history', 'area_residence', 'previous_malaria', 'prevention_measures')),
+    Assessment('liver-problem', assess_liver_problem,
+               [FormField('symptoms', 'yes_no'), FormField('alcohol_use', 'text', 'none')]
+               + _yes_no_fields('medications', 'family_history', 'previous_liver_issues')),
+    Assessment('hepatitis-b', assess_hepatitis_b,
+               [AGE_FIELD, FormField('vaccination_status', 'text', 'unknown')]
+               + _yes_no_fields('exposure', 'symptoms', 'risk_behaviors')),
+    Assessment('diabetes', assess_diabetes,
+               [AGE_FIELD] + _yes_no_fields('family_history', 'symptoms')
+               + [FormField('bmi_category', 'text', 'Normal weight'), FormField('physical_activity', 'text', 'moderate'),
+                  FormField('blood_pressure', 'yes_no')]),
+    Assessment('hydration', assess_hydration,
+               [FormField('urine_color', 'text', 'light_yellow'), FormField('thirst_level', 'text', 'normal'),
+                FormField('activity_level', 'text', 'moderate'), FormField('fluid_intake', 'text', 'moderate'),
+                FormField('symptoms', 'yes_no')]),
+]}
+
+# Stored inputs are laid out by codec.INPUT_SCHEMAS (field order and value
+# type per assessment); a field added above must be appended there too, and
+# importing the app fails until it is, rather than storing mislaid inputs.
+FIELD_VALUE_TYPES = {**NUMBER_FIELD_TYPES, 'yes_no': bool, 'text': str}
+for _assessment in ASSESSMENTS.values():
+    _declared = tuple((field.name, FIELD_VALUE_TYPES[field.kind]) for field in _assessment.fields)
+    if INPUT_SCHEMAS.get(_assessment.name) != _declared:
+        raise RuntimeError(f"{_assessment.name}: form fields {_declared} don't match codec.INPUT_SCHEMAS "
+                           f"{INPUT_SCHEMAS.get(_assessment.name)}")
+if set(INPUT_SCHEMAS) != set(ASSESSMENTS):
+    raise RuntimeError("ASSESSMENTS and codec.INPUT_SCHEMAS differ in: "
+                       f"{', '.join(sorted(set(INPUT_SCHEMAS) ^ set(ASSESSMENTS)))}")
+
+# Scorers that only take booleans, small enumerations and ages are compiled
+# into lookup tables at startup (HEALTHPLUS_LOOKUP_TABLES=0 turns this off).
+# Domains are per scorer argument, holding the values the forms offer; anything
+# else is scored by the original function. `python lookup.py` verifies the tables.
+# Scorers driven by threshold_rules can change at runtime and must not be listed.
+YES_NO = (False, True)
+AGES = range(0, 121)
+VACCINATION_STATUSES = ('fully_vaccinated', 'partially_vaccinated', 'not_vaccinated', 'unknown')
+SCORER_DOMAINS = {
+    'posture': [range(1, 6), range(1, 6)],
+    'mental-health': [range(0, 28)],
+    'hiv': [AGES, YES_NO, YES_NO, YES_NO],
+    'tuberculosis': [AGES, YES_NO, YES_NO, YES_NO, YES_NO],
+    'covid19': [YES_NO, YES_NO, VACCINATION_STATUSES, YES_NO, ('child', 'adult', 'elderly')],
+    'malaria': [YES_NO] * 5,
+    'liver-problem': [YES_NO, ('none', 'moderate', 'heavy'), YES_NO, YES_NO, YES_NO],
+    'hepatitis-b': [AGES, VACCINATION_STATUSES, YES_NO, YES_NO, YES_NO],
+    'hydration': [('pale', 'light_yellow', 'dark'), ('not_thirsty', 'normal', 'thirsty', 'very_thirsty'),
+                  ('low', 'moderate', 'high'), ('adequate', 'moderate', 'low'), YES_NO],
+}
+
+if os.environ.get('HEALTHPLUS_LOOKUP_TABLES', '1') != '0':
+    for _name, _domains in SCORER_DOMAINS.items():
+        ASSESSMENTS[_name] = ASSESSMENTS[_name]._replace(scorer=LookupScorer(ASSESSMENTS[_name].scorer, _domains))
+
+# Fields of each scorer's result dict and their value types, for consumers that
+# need a fixed schema (bulk scoring output columns, compact storage)
+RISK_RESULT_FIELDS = (('risk_score', int), ('risk', str), ('recommendation', str))
+RESULT_FIELDS = {
+    'bmi': (('value', float), ('category', str)),
+    'cardiovascular': (('status', str), ('risk', str)),
+    'stroke-risk': (('score', int), ('risk', str)),
+    'metabolic': (('factors', int), ('status', str)),
+    'respiratory': (('status', str), ('spo2', int)),
+    'fitness': (('status', str), ('hr_zone', str)),
+    'body-composition': (('status', str), ('percentage', float)),
+    'posture': (('status', str), ('score', int)),
+    'mental-health': (('severity', str), ('score', int), ('recommendation', str)),
+    'temperature': (('status', str), ('temperature', float)),
+    'grip-strength': (('status', str), ('strength', float)),
+    'lifestyle': (('status', str), ('risk_score', int)),
+    'vision': (('status', str), ('acuity', str)),
+    'hearing': (('status', str), ('normal_frequencies', int)),
+    'prostate': RISK_RESULT_FIELDS,
+    'hiv': RISK_RESULT_FIELDS,
+    'pregnancy': (('trimester', str), ('weeks', int), ('status', str), ('risk', str),
+                  ('risk_factors', int), ('recommendation', str)),
+    'breast-cancer': RISK_RESULT_FIELDS,
+    'tuberculosis': RISK_RESULT_FIELDS,
+    'covid19': RISK_RESULT_FIELDS,
+    'malaria': RISK_RESULT_FIELDS,
+    'liver-problem': RISK_RESULT_FIELDS,
+    'hepatitis-b': RISK_RESULT_FIELDS,
+    'diabetes': RISK_RESULT_FIELDS,
+    'hydration': (('status', str), ('hydration_score', int), ('recommendation', str)),
+}
+
+# Compact records store result values in codec.SCHEMAS order, so both must list
+# the same fields; a result field added to one and not the other fails here.
+_CODEC_RESULT_FIELDS = dict(CODEC_SCHEMAS)
+for _name, _fields in RESULT_FIELDS.items():
+    _names = tuple(field for field, _ in _fields)
+    if _CODEC_RESULT_FIELDS.get(_name) != _names:
+        raise RuntimeError(f"{_name}: result fields {_names} don't match codec.SCHEMAS {_CODEC_RESULT_FIELDS.get(_name)}")
+if set(RESULT_FIELDS) != set(ASSESSMENTS):
+    raise RuntimeError(f"RESULT_FIELDS and ASSESSMENTS differ in: {', '.join(sorted(set(RESULT_FIELDS) ^ set(ASSESSMENTS)))}")
+
+# Result field holding each assessment's headline category; 'status' when not listed
+CATEGORY_FIELDS = {
+    'bmi': 'category',
+    'stroke-risk': 'risk',
+    'mental-health': 'severity',
+    'pregnancy': 'risk',
+    **{name: 'risk' for name, fields in RESULT_FIELDS.items() if fields is RISK_RESULT_FIELDS},
+}
+
+def result_category(assessment_type, result):
+    """Headline category label of a result, e.g. "Stage 2 Hypertension" """
+    return result.get(CATEGORY_FIELDS.get(assessment_type, 'status'))
+
+# Concern level of each result category: 0 nothing to act on, 1 worth improving,
+# 2 worth discussing with a professional, 3 seek care
+LOW_MODERATE_HIGH_LEVELS = {'Low Risk': 0, 'Moderate Risk': 2, 'High Risk': 3}
+CATEGORY_RISK_LEVELS = {
+    'bmi': {'Normal weight': 0, 'Underweight': 1, 'Overweight': 1, 'Obese': 2},
+    'cardiovascular': {'Normal': 0, 'Elevated': 1, 'Stage 1 Hypertension': 2, 'Stage 2 Hypertension': 3},
+    'stroke-risk': {'Low': 0, 'Medium': 2, 'High': 3},
+    'metabolic': {'Healthy': 0, 'At Risk': 1, 'Metabolic Syndrome Risk': 2},
+    'respiratory': {'Normal': 0, 'Mild Hypoxemia': 2, 'Severe Hypoxemia - Seek Medical Attention': 3},
+    'fitness': {'Athlete Level': 0, 'Excellent': 0, 'Good': 0, 'Average': 1, 'Below Average': 1},
+    'body-composition': {'Athletes': 0, 'Fitness': 0, 'Average': 0, 'Essential Fat': 1, 'Obese': 2},
+    'posture': {'Excellent Posture': 0, 'Good Posture': 0, 'Fair - Needs Improvement': 1,
+                'Poor - Consult Professional': 2},
+    'mental-health': {'Minimal or None': 0, 'Mild': 1, 'Moderate': 2, 'Moderately Severe': 3, 'Severe': 3},
+    'temperature': {'Normal': 0, 'Low-Grade Fever': 1, 'Hypothermia Risk': 2, 'Fever - Seek Medical Attention': 3},
+    'grip-strength': {'Excellent': 0, 'Good': 0, 'Average': 0, 'Below Average': 1},
+    'lifestyle': {'Low Risk Lifestyle': 0, 'Moderate Risk Lifestyle': 1, 'High Risk Lifestyle': 2},
+    'vision': {'Normal Vision (20/20)': 0, 'Mild Vision Impairment': 1, 'Moderate Vision Impairment': 2,
+               'Severe Vision Impairment - Consult Eye Care Professional': 3},
+    'hearing': {'Normal Hearing': 0, 'Mild Hearing Loss': 1, 'Moderate Hearing Loss': 2,
+                'Significant Hearing Loss - Consult Audiologist': 3},
+    'pregnancy': {'Low Risk': 0, 'Moderate Risk': 2, 'High Risk Pregnancy': 3},
+    'hydration': {'Well Hydrated': 0, 'Mildly Dehydrated': 1, 'Dehydrated': 2},
+    **{name: LOW_MODERATE_HIGH_LEVELS for name, fields in RESULT_FIELDS.items() if fields is RISK_RESULT_FIELDS},
+}
+
+def composite_score(results):
+    """Overall risk of {assessment_type: result}: a 0-100 score, its level and the results driving it"""
+    levels = {}
+    for assessment_type, result in results.items():
+        level = CATEGORY_RISK_LEVELS.get(assessment_type, {}).get(result_category(assessment_type, result))
+        if level is not None:
+            levels[assessment_type] = level
+    if not levels:
+        return None
+    score = round(100 * sum(levels.values()) / (3 * len(levels)))
+    worst = max(levels.values())
+    if worst == 3 or score >= 70:
+        level = 'High'
+    elif worst == 2 or score >= 30:
+        level = 'Moderate'
+    else:
+        level = 'Low'
+    concerns = sorted((name for name, value in levels.items() if value >= 2), key=lambda name: (-levels[name], name))
+    return {'score': score, 'level': level, 'assessments': len(levels), 'concerns': concerns}
+
+# Composite graph: a session's profile holds its latest inputs as facts plus
+# every node derived from them. Inputs several forms ask for are one shared fact,
+# whichever form supplied them last, and fields another assessment measures are
+# derived from that assessment instead of the typed-in answer. A submission then
+# only rescores the assessments that read what it changed.
+SHARED_FACTS = frozenset(['age', 'gender'])
+# Every form asking for blood pressure is linked through one 'blood_pressure'
+# reading, [systolic, diastolic]. A form replaces the parts it asks for, and
+# only when it supplies all of them: a form with both replaces the whole
+# reading, one with systolic alone updates that part and keeps the diastolic.
+BLOOD_PRESSURE_FIELDS = ('systolic', 'diastolic')
+
+def fact_name(assessment_type, field):
+    return field if field in SHARED_FACTS else f'{assessment_type}.{field}'
+
+def blood_pressure_fields(assessment):
+    """The parts of the blood pressure reading an assessment's form asks for"""
+    return tuple(field.name for field in assessment.fields if field.name in BLOOD_PRESSURE_FIELDS)
+
+def submission_facts(assessment_type, inputs, timestamp, profile=None):
+    """Profile facts recorded by one submission, to be merged into ``profile``.
+
+    Optional inputs left blank are recorded as None, which removes the value an
+    earlier submission stored.
+    """
+    bp_fields = blood_pressure_fields(ASSESSMENTS[assessment_type])
+    facts = {fact_name(assessment_type, name): value for name, value in inputs.items() if name not in bp_fields}
+    if bp_fields:
+        values = [inputs[name] for name in bp_fields]
+        given = None not in values
+        if given:
+            reading = list((profile or {}).get('blood_pressure') or [None] * len(BLOOD_PRESSURE_FIELDS))
+            for name, value in zip(bp_fields, values):
+                reading[BLOOD_PRESSURE_FIELDS.index(name)] = value
+            facts['blood_pressure'] = reading
+        # A form whose blood pressure was left blank is scored without one
+        facts[f'{assessment_type}.blood_pressure_given'] = given
+    # Marks the assessment as taken; shared facts alone don't score an assessment
+    facts[f'{assessment_type}.submitted'] = timestamp
+    return facts
+
+def linked_bmi_category(bmi, typed):
+    return bmi['category'] if bmi else typed
+
+def linked_high_blood_pressure(reading, typed):
+    # Stage 1 hypertension or worse, graded by the cardiovascular rules in force
+    if reading is None or None in reading:
+        return typed
+    systolic, diastolic = reading
+    status = threshold_rules.current.classify('cardiovascular', systolic=systolic, diastolic=diastolic)['status']
+    return CATEGORY_RISK_LEVELS['cardiovascular'][status] >= 2
+
+LINKED_NODES = [
+    Node('bmi_category', ['bmi', 'diabetes.bmi_category'], linked_bmi_category),
+    Node('high_blood_pressure', ['blood_pressure', 'diabetes.blood_pressure'], linked_high_blood_pressure),
+]
+# (assessment_type, field) -> node its value is read from
+LINKED_FIELDS = {
+    ('diabetes', 'bmi_category'): 'bmi_category',
+    ('diabetes', 'blood_pressure'): 'high_blood_pressure',
+}
+
+def assessment_node(assessment):
+    """Graph node scoring an assessment from profile facts once it has been submitted"""
+    linked_bp = bool(blood_pressure_fields(assessment))
+    names = ['blood_pressure' if field.name in BLOOD_PRESSURE_FIELDS
+             else LINKED_FIELDS.get((assessment.name, field.name)) or fact_name(assessment.name, field.name)
+             for field in assessment.fields]
+    if linked_bp:
+        names.append(f'{assessment.name}.blood_pressure_given')
+
+    def compute(submitted, *values):
+        if submitted is None:
+            return None
+        if linked_bp:
+            *values, given = values
+        inputs = {}
+        for field, value in zip(assessment.fields, values):
+            if field.name in BLOOD_PRESSURE_FIELDS:
+                value = value[BLOOD_PRESSURE_FIELDS.index(field.name)] if given and value else None
+            if value is None and not field.kind.startswith('optional_'):
+                return None
+            inputs[field.name] = value
+        try:
+            return score_inputs(assessment, inputs)
+        except ValueError:
+            return None
+
+    return Node(assessment.name, [f'{assessment.name}.submitted'] + names, compute)
+
+COMPOSITE_GRAPH = DerivationGraph(
+    LINKED_NODES
+    + [assessment_node(assessment) for assessment in ASSESSMENTS.values()]
+    + [Node('composite', list(ASSESSMENTS),
+            lambda *results: composite_score({name: result for name, result in zip(ASSESSMENTS, results) if result}))]
+)
+
+# Report renderers keyed by assessment type, built once at import instead of on every call
+MEDICAL_REPORTS = {
+    'bmi': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-blue-50 rounded-lg border-l-4 border-blue-500">
+        <h4 class="font-semibold text-blue-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Your Body Mass Index (BMI) of <strong>{r['value']}</strong> indicates a <strong>{r['category']}</strong> classification.
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> BMI is a screening tool that estimates body fat based on height and weight. 
+            {'Maintaining a healthy weight through balanced nutrition and regular physical activity is recommended.' if r['category'] in ['Normal weight', 'Underweight'] else 'Consider consulting with a healthcare provider or registered dietitian to develop a personalized weight management plan. Regular monitoring and lifestyle modifications may be beneficial.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Note:</strong> BMI does not account for muscle mass, bone density, or body composition. For a comprehensive assessment, consult with a healthcare professional.
+        </p>
+    </div>
+    """,
+    'cardiovascular': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-red-50 rounded-lg border-l-4 border-red-500">
+        <h4 class="font-semibold text-red-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Your blood pressure reading indicates <strong>{r['status']}</strong> with a <strong>{r['risk']}</strong> risk level.
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Blood pressure is within normal ranges. Continue maintaining a healthy lifestyle with regular exercise, a balanced diet, and stress management.' if r['risk'] == 'Low' else 'Elevated blood pressure may increase cardiovascular risk. Lifestyle modifications including reduced sodium intake, regular exercise, weight management, and stress reduction are recommended. Regular monitoring and consultation with a healthcare provider is advised.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {'Maintain current lifestyle habits and annual blood pressure checks.' if r['risk'] == 'Low' else 'Schedule a consultation with your healthcare provider for comprehensive cardiovascular assessment and potential treatment options.'}
+        </p>
+    </div>
+    """,
+    'stroke-risk': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-orange-50 rounded-lg border-l-4 border-orange-500">
+        <h4 class="font-semibold text-orange-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Your stroke risk assessment score is <strong>{r['score']}</strong>, indicating a <strong>{r['risk']}</strong> risk level.
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Your risk factors for stroke appear to be well-managed. Continue maintaining healthy lifestyle habits including regular exercise, a balanced diet, and regular medical check-ups.' if r['risk'] == 'Low' else 'Multiple risk factors have been identified. Comprehensive risk factor modification is recommended, including blood pressure management, smoking cessation if applicable, diabetes control, and regular cardiovascular monitoring.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {'Annual cardiovascular risk assessment is recommended.' if r['risk'] == 'Low' else 'Consult with a healthcare provider or cardiologist for personalized stroke prevention strategies and potential medical interventions.'}
+        </p>
+    </div>
+    """,
+    'metabolic': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-green-50 rounded-lg border-l-4 border-green-500">
+        <h4 class="font-semibold text-green-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Metabolic health assessment indicates: <strong>{r['status']}</strong> with <strong>{r['factors']}</strong> risk factor(s) identified.
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Metabolic parameters appear to be within healthy ranges. Continue maintaining a balanced diet, regular physical activity, and healthy lifestyle habits.' if r['status'] == 'Healthy' else 'Metabolic risk factors have been identified. Focus on lifestyle modifications including weight management, increased physical activity, dietary improvements, and blood pressure control. Regular monitoring of metabolic parameters is recommended.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {'Continue current healthy lifestyle practices.' if r['status'] == 'Healthy' else 'Consider consultation with a healthcare provider or endocrinologist for comprehensive metabolic assessment and personalized intervention strategies.'}
+        </p>
+    </div>
+    """,
+    'respiratory': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-teal-50 rounded-lg border-l-4 border-teal-500">
+        <h4 class="font-semibold text-teal-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Oxygen saturation (SpO₂) reading: <strong>{r['spo2']}%</strong> - Status: <strong>{r['status']}</strong>
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Oxygen saturation is within normal range, indicating adequate oxygen delivery to tissues. Continue maintaining good respiratory health through regular exercise and avoiding respiratory irritants.' if r['status'] == 'Normal' else 'Reduced oxygen saturation may indicate respiratory compromise. This requires immediate medical evaluation, especially if accompanied by shortness of breath, chest pain, or other symptoms.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {'No immediate action required. Maintain healthy respiratory habits.' if r['status'] == 'Normal' else 'Seek immediate medical attention. Contact your healthcare provider or emergency services if experiencing respiratory distress.'}
+        </p>
+    </div>
+    """,
+    'fitness': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-purple-50 rounded-lg border-l-4 border-purple-500">
+        <h4 class="font-semibold text-purple-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Physical fitness assessment: <strong>{r['status']}</strong> (Heart rate zone: {r['hr_zone']})
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Excellent cardiovascular fitness level. Your resting heart rate indicates strong cardiovascular conditioning. Continue your current exercise regimen.' if 'Athlete' in r['status'] or 'Excellent' in r['status'] else 'Cardiovascular fitness assessment suggests room for improvement. Regular aerobic exercise, gradually increasing intensity and duration, can improve cardiovascular health and reduce resting heart rate over time.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {'Maintain current exercise routine. Consider periodic fitness assessments to track progress.' if 'Athlete' in r['status'] or 'Excellent' in r['status'] else 'Aim for at least 150 minutes of moderate-intensity aerobic exercise per week. Consult with a fitness professional or healthcare provider before starting a new exercise program.'}
+        </p>
+    </div>
+    """,
+    'body-composition': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-pink-50 rounded-lg border-l-4 border-pink-500">
+        <h4 class="font-semibold text-pink-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Body composition analysis: <strong>{r['status']}</strong> (Body fat: {r['percentage']}%)
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Body composition is within optimal ranges for your demographic. Continue maintaining a balanced diet and regular strength training to preserve muscle mass.' if 'Athletes' in r['status'] or 'Fitness' in r['status'] else 'Body composition analysis suggests areas for improvement. Focus on a combination of resistance training to build muscle mass and cardiovascular exercise to reduce body fat. Nutritional guidance from a registered dietitian may be beneficial.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {'Maintain current training and nutrition practices.' if 'Athletes' in r['status'] or 'Fitness' in r['status'] else 'Consider consultation with a fitness professional and registered dietitian for a personalized body composition improvement plan.'}
+        </p>
+    </div>
+    """,
+    'posture': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-indigo-50 rounded-lg border-l-4 border-indigo-500">
+        <h4 class="font-semibold text-indigo-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Postural assessment score: <strong>{r['score']}/10</strong> - Status: <strong>{r['status']}</strong>
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Postural alignment and balance are excellent. Continue maintaining good posture habits and regular physical activity to preserve musculoskeletal health.' if 'Excellent' in r['status'] or 'Good' in r['status'] else 'Postural assessment indicates areas requiring attention. Poor posture can contribute to musculoskeletal pain, reduced mobility, and increased injury risk. Targeted exercises and ergonomic modifications may be beneficial.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {'Continue current practices. Regular posture checks are recommended.' if 'Excellent' in r['status'] or 'Good' in r['status'] else 'Consider consultation with a physical therapist or chiropractor for a comprehensive postural assessment and personalized corrective exercise program.'}
+        </p>
+    </div>
+    """,
+    'mental-health': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-yellow-50 rounded-lg border-l-4 border-yellow-500">
+        <h4 class="font-semibold text-yellow-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            PHQ-9 Depression Screening Score: <strong>{r['score']}</strong> - Severity: <strong>{r['severity']}</strong>
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Minimal depressive symptoms detected. Continue monitoring mental health and maintaining healthy coping strategies.' if 'Minimal' in r['severity'] else 'Depressive symptoms have been identified. Mental health is an important component of overall wellness. Professional support can be highly effective in managing symptoms and improving quality of life.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {r['recommendation']}. {'This screening tool is not a diagnostic instrument. For comprehensive mental health evaluation, consult with a licensed mental health professional.' if 'Minimal' not in r['severity'] else ''}
+        </p>
+    </div>
+    """,
+    'temperature': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-cyan-50 rounded-lg border-l-4 border-cyan-500">
+        <h4 class="font-semibold text-cyan-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Body temperature: <strong>{r['temperature']}°C</strong> - Status: <strong>{r['status']}</strong>
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Body temperature is within normal physiological range, indicating no signs of fever or hypothermia.' if r['status'] == 'Normal' else 'Abnormal body temperature may indicate underlying health conditions, infection, or environmental factors. Monitor for additional symptoms and consider medical evaluation.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {'No immediate action required. Continue monitoring if symptoms develop.' if r['status'] == 'Normal' else 'If temperature persists outside normal range or is accompanied by other symptoms, consult with a healthcare provider for evaluation.'}
+        </p>
+    </div>
+    """,
+    'grip-strength': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-lime-50 rounded-lg border-l-4 border-lime-500">
+        <h4 class="font-semibold text-lime-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Grip strength: <strong>{r['strength']} kg</strong> - Status: <strong>{r['status']}</strong>
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Grip strength is within excellent range, indicating good functional capacity and muscle strength.' if 'Excellent' in r['status'] else 'Grip strength is a marker of overall muscle function and functional capacity. Lower grip strength may indicate reduced muscle mass or strength, which can impact daily activities and overall health.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {'Maintain current strength training routine.' if 'Excellent' in r['status'] else 'Consider incorporating resistance training, particularly hand and forearm strengthening exercises. Consult with a physical therapist or fitness professional for a personalized strength training program.'}
+        </p>
+    </div>
+    """,
+    'lifestyle': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-amber-50 rounded-lg border-l-4 border-amber-500">
+        <h4 class="font-semibold text-amber-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Lifestyle risk assessment: <strong>{r['status']}</strong> (Risk Score: {r['risk_score']})
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Lifestyle factors are well-managed with low health risk. Continue maintaining healthy habits including regular physical activity and avoiding tobacco use.' if r['status'] == 'Low Risk Lifestyle' else 'Lifestyle risk factors have been identified that may impact long-term health. Modifications in smoking habits, physical activity levels, and other lifestyle factors can significantly reduce health risks.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {'Continue current healthy lifestyle practices.' if r['status'] == 'Low Risk Lifestyle' else 'Consider lifestyle modification programs, smoking cessation support if applicable, and consultation with healthcare providers for personalized risk reduction strategies.'}
+        </p>
+    </div>
+    """,
+    'vision': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-violet-50 rounded-lg border-l-4 border-violet-500">
+        <h4 class="font-semibold text-violet-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Visual acuity: <strong>{r['acuity']}</strong> - Status: <strong>{r['status']}</strong>
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Visual acuity is within normal range. Continue regular eye care and protect eyes from UV exposure.' if 'Normal' in r['status'] else 'Visual impairment has been detected. Regular comprehensive eye examinations are important for monitoring vision health and detecting treatable conditions early.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {'Annual comprehensive eye examination is recommended for all adults.' if 'Normal' in r['status'] else 'Schedule a comprehensive eye examination with an optometrist or ophthalmologist for detailed evaluation and appropriate management.'}
+        </p>
+    </div>
+    """,
+    'hearing': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-rose-50 rounded-lg border-l-4 border-rose-500">
+        <h4 class="font-semibold text-rose-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Hearing assessment: <strong>{r['status']}</strong> (Normal frequencies: {r['normal_frequencies']}/5)
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Hearing function appears to be within normal ranges across tested frequencies. Continue protecting hearing from excessive noise exposure.' if 'Normal' in r['status'] else 'Hearing loss has been detected across one or more frequencies. Early detection and management can help preserve remaining hearing function and improve communication.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {'Annual hearing screening is recommended. Protect ears from loud noises.' if 'Normal' in r['status'] else 'Schedule a comprehensive audiological evaluation with a licensed audiologist for detailed assessment, diagnosis, and appropriate intervention options including hearing aids if indicated.'}
+        </p>
+    </div>
+    """,
+    'prostate': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-slate-50 rounded-lg border-l-4 border-slate-500">
+        <h4 class="font-semibold text-slate-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Prostate cancer risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Prostate cancer risk appears to be low based on current assessment. Continue regular health check-ups and discuss screening options with your healthcare provider based on age and guidelines.' if r['risk'] == 'Low Risk' else 'Multiple risk factors for prostate cancer have been identified. Early detection through appropriate screening is important for optimal outcomes.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {r['recommendation']}. Prostate-specific antigen (PSA) testing and digital rectal examination should be discussed with a urologist based on individual risk factors and current screening guidelines.
+        </p>
+    </div>
+    """,
+    'hiv': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-emerald-50 rounded-lg border-l-4 border-emerald-500">
+        <h4 class="font-semibold text-emerald-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            HIV risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'HIV risk appears to be low based on current assessment. Continue practicing safe behaviors and regular testing as recommended.' if r['risk'] == 'Low Risk' else 'Risk factors for HIV transmission have been identified. Early testing, prevention strategies, and appropriate medical care are essential for optimal health outcomes.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {r['recommendation']}. HIV testing is confidential and available through healthcare providers, community health centers, and testing sites. Pre-exposure prophylaxis (PrEP) may be considered for ongoing risk reduction.
+        </p>
+    </div>
+    """,
+    'pregnancy': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-fuchsia-50 rounded-lg border-l-4 border-fuchsia-500">
+        <h4 class="font-semibold text-fuchsia-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Pregnancy assessment: <strong>{r['trimester']}</strong> ({r['weeks']} weeks) - Risk Level: <strong>{r['risk']}</strong>
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {"Pregnancy appears to be progressing normally. Continue routine prenatal care, maintain a healthy diet, take prenatal vitamins, and follow your healthcare provider's recommendations." if r['risk'] == 'Low Risk' else 'Pregnancy risk factors have been identified that require monitoring. Close follow-up with your obstetrician and adherence to medical recommendations are essential for maternal and fetal health.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {r['recommendation']}. Regular prenatal visits, appropriate nutrition, adequate rest, and avoiding harmful substances are important throughout pregnancy.
+        </p>
+    </div>
+    """,
+    'breast-cancer': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-pink-50 rounded-lg border-l-4 border-pink-500">
+        <h4 class="font-semibold text-pink-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Breast cancer risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Breast cancer risk appears to be low based on current assessment. Continue routine breast cancer screening as per age-appropriate guidelines, including regular mammography and clinical breast exams.' if r['risk'] == 'Low Risk' else 'Multiple risk factors for breast cancer have been identified. Early detection through appropriate screening and risk reduction strategies are important for optimal outcomes.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {r['recommendation']}. Breast self-awareness, clinical breast examinations, and mammography are important components of breast health. Discuss personalized screening recommendations with your healthcare provider.
+        </p>
+    </div>
+    """,
+    'tuberculosis': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-amber-50 rounded-lg border-l-4 border-amber-500">
+        <h4 class="font-semibold text-amber-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Tuberculosis risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Tuberculosis risk appears to be low based on current assessment. Continue routine health monitoring and be aware of TB symptoms.' if r['risk'] == 'Low Risk' else 'Risk factors for tuberculosis have been identified. TB is a serious but treatable disease. Early detection and treatment are essential to prevent transmission and complications.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {r['recommendation']}. TB testing (tuberculin skin test or interferon-gamma release assay) and chest imaging may be recommended based on risk factors and symptoms.
+        </p>
+    </div>
+    """,
+    'covid19': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-red-50 rounded-lg border-l-4 border-red-500">
+        <h4 class="font-semibold text-red-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            COVID-19 risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'COVID-19 risk appears to be low. Continue preventive measures including hand hygiene, mask-wearing in crowded places, and staying up to date with vaccinations.' if r['risk'] == 'Low Risk' else 'Risk factors for COVID-19 have been identified. COVID-19 can range from mild to severe. Early testing and appropriate management are important.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {r['recommendation']}. If symptomatic, isolate and consider COVID-19 testing. Seek immediate medical attention for severe symptoms like difficulty breathing.
+        </p>
+    </div>
+    """,
+    'malaria': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-green-50 rounded-lg border-l-4 border-green-500">
+        <h4 class="font-semibold text-green-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Malaria risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Malaria risk appears to be low. Continue preventive measures if in or traveling to endemic areas.' if r['risk'] == 'Low Risk' else 'Risk factors for malaria have been identified. Malaria is a serious but treatable disease. Early diagnosis and treatment are crucial to prevent complications.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {r['recommendation']}. Use insect repellent, bed nets, and antimalarial prophylaxis if in endemic areas. Seek immediate medical attention if symptoms develop.
+        </p>
+    </div>
+    """,
+    'liver-problem': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-yellow-50 rounded-lg border-l-4 border-yellow-500">
+        <h4 class="font-semibold text-yellow-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Liver health risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Liver health risk appears to be low. Maintain healthy lifestyle, limit alcohol consumption, and continue regular health check-ups.' if r['risk'] == 'Low Risk' else 'Risk factors for liver problems have been identified. The liver is vital for many body functions. Early detection and management of liver conditions are important.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {r['recommendation']}. Liver function tests (ALT, AST, bilirubin) and imaging may be recommended. Avoid alcohol if liver problems are suspected.
+        </p>
+    </div>
+    """,
+    'hepatitis-b': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-orange-50 rounded-lg border-l-4 border-orange-500">
+        <h4 class="font-semibold text-orange-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Hepatitis B risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Hepatitis B risk appears to be low. Ensure vaccination is up to date and continue preventive measures.' if r['risk'] == 'Low Risk' else 'Risk factors for Hepatitis B have been identified. Hepatitis B is a vaccine-preventable viral infection that can cause liver disease. Early detection and vaccination are important.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {r['recommendation']}. Hepatitis B testing (HBsAg, anti-HBc) and vaccination are important preventive measures. Post-exposure prophylaxis may be needed if recent exposure.
+        </p>
+    </div>
+    """,
+    'diabetes': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-indigo-50 rounded-lg border-l-4 border-indigo-500">
+        <h4 class="font-semibold text-indigo-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Diabetes risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Diabetes risk appears to be low. Continue maintaining a healthy lifestyle with balanced diet and regular physical activity.' if r['risk'] == 'Low Risk' else 'Risk factors for diabetes have been identified. Diabetes is a chronic condition that affects how your body processes blood sugar. Early detection and management are important to prevent complications.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {r['recommendation']}. Lifestyle modifications including healthy diet, regular exercise, and weight management can help reduce diabetes risk.
+        </p>
+    </div>
+    """,
+    'hydration': lambda r: f"""
+    <div class="medical-report mt-4 p-4 bg-cyan-50 rounded-lg border-l-4 border-cyan-500">
+        <h4 class="font-semibold text-cyan-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
+        <p class="text-sm text-gray-700 mb-2">
+            Hydration status: <strong>{r['status']}</strong> (Hydration Score: {r['hydration_score']})
+        </p>
+        <p class="text-sm text-gray-700 mb-2">
+            <strong>Clinical Assessment:</strong> {'Hydration status appears to be adequate. Continue maintaining good fluid intake throughout the day.' if r['status'] == 'Well Hydrated' else 'Hydration status indicates room for improvement. Adequate hydration is essential for optimal body function, including temperature regulation, nutrient transport, and waste removal.'}
+        </p>
+        <p class="text-sm text-gray-600 italic">
+            <strong>Recommendation:</strong> {r['recommendation']}. General guideline: aim for 8-10 glasses (2-2.5 liters) of water daily, more if you're active, in hot weather, or ill.
+        </p>
+    </div>
+    """
+}
+
 def generate_medical_report(assessment_type, result):
     """Generate a professional medical report for each assessment result"""
-    reports = {
-        'bmi': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-blue-50 rounded-lg border-l-4 border-blue-500">
-            <h4 class="font-semibold text-blue-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Your Body Mass Index (BMI) of <strong>{r['value']}</strong> indicates a <strong>{r['category']}</strong> classification.
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> BMI is a screening tool that estimates body fat based on height and weight. 
-                {'Maintaining a healthy weight through balanced nutrition and regular physical activity is recommended.' if r['category'] in ['Normal weight', 'Underweight'] else 'Consider consulting with a healthcare provider or registered dietitian to develop a personalized weight management plan. Regular monitoring and lifestyle modifications may be beneficial.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Note:</strong> BMI does not account for muscle mass, bone density, or body composition. For a comprehensive assessment, consult with a healthcare professional.
-            </p>
-        </div>
-        """,
-        'cardiovascular': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-red-50 rounded-lg border-l-4 border-red-500">
-            <h4 class="font-semibold text-red-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Your blood pressure reading indicates <strong>{r['status']}</strong> with a <strong>{r['risk']}</strong> risk level.
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Blood pressure is within normal ranges. Continue maintaining a healthy lifestyle with regular exercise, a balanced diet, and stress management.' if r['risk'] == 'Low' else 'Elevated blood pressure may increase cardiovascular risk. Lifestyle modifications including reduced sodium intake, regular exercise, weight management, and stress reduction are recommended. Regular monitoring and consultation with a healthcare provider is advised.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {'Maintain current lifestyle habits and annual blood pressure checks.' if r['risk'] == 'Low' else 'Schedule a consultation with your healthcare provider for comprehensive cardiovascular assessment and potential treatment options.'}
-            </p>
-        </div>
-        """,
-        'stroke-risk': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-orange-50 rounded-lg border-l-4 border-orange-500">
-            <h4 class="font-semibold text-orange-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Your stroke risk assessment score is <strong>{r['score']}</strong>, indicating a <strong>{r['risk']}</strong> risk level.
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Your risk factors for stroke appear to be well-managed. Continue maintaining healthy lifestyle habits including regular exercise, a balanced diet, and regular medical check-ups.' if r['risk'] == 'Low' else 'Multiple risk factors have been identified. Comprehensive risk factor modification is recommended, including blood pressure management, smoking cessation if applicable, diabetes control, and regular cardiovascular monitoring.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {'Annual cardiovascular risk assessment is recommended.' if r['risk'] == 'Low' else 'Consult with a healthcare provider or cardiologist for personalized stroke prevention strategies and potential medical interventions.'}
-            </p>
-        </div>
-        """,
-        'metabolic': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-green-50 rounded-lg border-l-4 border-green-500">
-            <h4 class="font-semibold text-green-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Metabolic health assessment indicates: <strong>{r['status']}</strong> with <strong>{r['factors']}</strong> risk factor(s) identified.
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Metabolic parameters appear to be within healthy ranges. Continue maintaining a balanced diet, regular physical activity, and healthy lifestyle habits.' if r['status'] == 'Healthy' else 'Metabolic risk factors have been identified. Focus on lifestyle modifications including weight management, increased physical activity, dietary improvements, and blood pressure control. Regular monitoring of metabolic parameters is recommended.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {'Continue current healthy lifestyle practices.' if r['status'] == 'Healthy' else 'Consider consultation with a healthcare provider or endocrinologist for comprehensive metabolic assessment and personalized intervention strategies.'}
-            </p>
-        </div>
-        """,
-        'respiratory': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-teal-50 rounded-lg border-l-4 border-teal-500">
-            <h4 class="font-semibold text-teal-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Oxygen saturation (SpO₂) reading: <strong>{r['spo2']}%</strong> - Status: <strong>{r['status']}</strong>
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Oxygen saturation is within normal range, indicating adequate oxygen delivery to tissues. Continue maintaining good respiratory health through regular exercise and avoiding respiratory irritants.' if r['status'] == 'Normal' else 'Reduced oxygen saturation may indicate respiratory compromise. This requires immediate medical evaluation, especially if accompanied by shortness of breath, chest pain, or other symptoms.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {'No immediate action required. Maintain healthy respiratory habits.' if r['status'] == 'Normal' else 'Seek immediate medical attention. Contact your healthcare provider or emergency services if experiencing respiratory distress.'}
-            </p>
-        </div>
-        """,
-        'fitness': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-purple-50 rounded-lg border-l-4 border-purple-500">
-            <h4 class="font-semibold text-purple-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Physical fitness assessment: <strong>{r['status']}</strong> (Heart rate zone: {r['hr_zone']})
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Excellent cardiovascular fitness level. Your resting heart rate indicates strong cardiovascular conditioning. Continue your current exercise regimen.' if 'Athlete' in r['status'] or 'Excellent' in r['status'] else 'Cardiovascular fitness assessment suggests room for improvement. Regular aerobic exercise, gradually increasing intensity and duration, can improve cardiovascular health and reduce resting heart rate over time.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {'Maintain current exercise routine. Consider periodic fitness assessments to track progress.' if 'Athlete' in r['status'] or 'Excellent' in r['status'] else 'Aim for at least 150 minutes of moderate-intensity aerobic exercise per week. Consult with a fitness professional or healthcare provider before starting a new exercise program.'}
-            </p>
-        </div>
-        """,
-        'body-composition': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-pink-50 rounded-lg border-l-4 border-pink-500">
-            <h4 class="font-semibold text-pink-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Body composition analysis: <strong>{r['status']}</strong> (Body fat: {r['percentage']}%)
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Body composition is within optimal ranges for your demographic. Continue maintaining a balanced diet and regular strength training to preserve muscle mass.' if 'Athletes' in r['status'] or 'Fitness' in r['status'] else 'Body composition analysis suggests areas for improvement. Focus on a combination of resistance training to build muscle mass and cardiovascular exercise to reduce body fat. Nutritional guidance from a registered dietitian may be beneficial.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {'Maintain current training and nutrition practices.' if 'Athletes' in r['status'] or 'Fitness' in r['status'] else 'Consider consultation with a fitness professional and registered dietitian for a personalized body composition improvement plan.'}
-            </p>
-        </div>
-        """,
-        'posture': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-indigo-50 rounded-lg border-l-4 border-indigo-500">
-            <h4 class="font-semibold text-indigo-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Postural assessment score: <strong>{r['score']}/10</strong> - Status: <strong>{r['status']}</strong>
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Postural alignment and balance are excellent. Continue maintaining good posture habits and regular physical activity to preserve musculoskeletal health.' if 'Excellent' in r['status'] or 'Good' in r['status'] else 'Postural assessment indicates areas requiring attention. Poor posture can contribute to musculoskeletal pain, reduced mobility, and increased injury risk. Targeted exercises and ergonomic modifications may be beneficial.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {'Continue current practices. Regular posture checks are recommended.' if 'Excellent' in r['status'] or 'Good' in r['status'] else 'Consider consultation with a physical therapist or chiropractor for a comprehensive postural assessment and personalized corrective exercise program.'}
-            </p>
-        </div>
-        """,
-        'mental-health': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-yellow-50 rounded-lg border-l-4 border-yellow-500">
-            <h4 class="font-semibold text-yellow-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                PHQ-9 Depression Screening Score: <strong>{r['score']}</strong> - Severity: <strong>{r['severity']}</strong>
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Minimal depressive symptoms detected. Continue monitoring mental health and maintaining healthy coping strategies.' if 'Minimal' in r['severity'] else 'Depressive symptoms have been identified. Mental health is an important component of overall wellness. Professional support can be highly effective in managing symptoms and improving quality of life.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {r['recommendation']}. {'This screening tool is not a diagnostic instrument. For comprehensive mental health evaluation, consult with a licensed mental health professional.' if 'Minimal' not in r['severity'] else ''}
-            </p>
-        </div>
-        """,
-        'temperature': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-cyan-50 rounded-lg border-l-4 border-cyan-500">
-            <h4 class="font-semibold text-cyan-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Body temperature: <strong>{r['temperature']}°C</strong> - Status: <strong>{r['status']}</strong>
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Body temperature is within normal physiological range, indicating no signs of fever or hypothermia.' if r['status'] == 'Normal' else 'Abnormal body temperature may indicate underlying health conditions, infection, or environmental factors. Monitor for additional symptoms and consider medical evaluation.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {'No immediate action required. Continue monitoring if symptoms develop.' if r['status'] == 'Normal' else 'If temperature persists outside normal range or is accompanied by other symptoms, consult with a healthcare provider for evaluation.'}
-            </p>
-        </div>
-        """,
-        'grip-strength': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-lime-50 rounded-lg border-l-4 border-lime-500">
-            <h4 class="font-semibold text-lime-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Grip strength: <strong>{r['strength']} kg</strong> - Status: <strong>{r['status']}</strong>
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Grip strength is within excellent range, indicating good functional capacity and muscle strength.' if 'Excellent' in r['status'] else 'Grip strength is a marker of overall muscle function and functional capacity. Lower grip strength may indicate reduced muscle mass or strength, which can impact daily activities and overall health.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {'Maintain current strength training routine.' if 'Excellent' in r['status'] else 'Consider incorporating resistance training, particularly hand and forearm strengthening exercises. Consult with a physical therapist or fitness professional for a personalized strength training program.'}
-            </p>
-        </div>
-        """,
-        'lifestyle': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-amber-50 rounded-lg border-l-4 border-amber-500">
-            <h4 class="font-semibold text-amber-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Lifestyle risk assessment: <strong>{r['status']}</strong> (Risk Score: {r['risk_score']})
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Lifestyle factors are well-managed with low health risk. Continue maintaining healthy habits including regular physical activity and avoiding tobacco use.' if r['status'] == 'Low Risk Lifestyle' else 'Lifestyle risk factors have been identified that may impact long-term health. Modifications in smoking habits, physical activity levels, and other lifestyle factors can significantly reduce health risks.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {'Continue current healthy lifestyle practices.' if r['status'] == 'Low Risk Lifestyle' else 'Consider lifestyle modification programs, smoking cessation support if applicable, and consultation with healthcare providers for personalized risk reduction strategies.'}
-            </p>
-        </div>
-        """,
-        'vision': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-violet-50 rounded-lg border-l-4 border-violet-500">
-            <h4 class="font-semibold text-violet-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Visual acuity: <strong>{r['acuity']}</strong> - Status: <strong>{r['status']}</strong>
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Visual acuity is within normal range. Continue regular eye care and protect eyes from UV exposure.' if 'Normal' in r['status'] else 'Visual impairment has been detected. Regular comprehensive eye examinations are important for monitoring vision health and detecting treatable conditions early.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {'Annual comprehensive eye examination is recommended for all adults.' if 'Normal' in r['status'] else 'Schedule a comprehensive eye examination with an optometrist or ophthalmologist for detailed evaluation and appropriate management.'}
-            </p>
-        </div>
-        """,
-        'hearing': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-rose-50 rounded-lg border-l-4 border-rose-500">
-            <h4 class="font-semibold text-rose-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Hearing assessment: <strong>{r['status']}</strong> (Normal frequencies: {r['normal_frequencies']}/5)
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Hearing function appears to be within normal ranges across tested frequencies. Continue protecting hearing from excessive noise exposure.' if 'Normal' in r['status'] else 'Hearing loss has been detected across one or more frequencies. Early detection and management can help preserve remaining hearing function and improve communication.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {'Annual hearing screening is recommended. Protect ears from loud noises.' if 'Normal' in r['status'] else 'Schedule a comprehensive audiological evaluation with a licensed audiologist for detailed assessment, diagnosis, and appropriate intervention options including hearing aids if indicated.'}
-            </p>
-        </div>
-        """,
-        'prostate': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-slate-50 rounded-lg border-l-4 border-slate-500">
-            <h4 class="font-semibold text-slate-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Prostate cancer risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Prostate cancer risk appears to be low based on current assessment. Continue regular health check-ups and discuss screening options with your healthcare provider based on age and guidelines.' if r['risk'] == 'Low Risk' else 'Multiple risk factors for prostate cancer have been identified. Early detection through appropriate screening is important for optimal outcomes.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {r['recommendation']}. Prostate-specific antigen (PSA) testing and digital rectal examination should be discussed with a urologist based on individual risk factors and current screening guidelines.
-            </p>
-        </div>
-        """,
-        'hiv': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-emerald-50 rounded-lg border-l-4 border-emerald-500">
-            <h4 class="font-semibold text-emerald-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                HIV risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'HIV risk appears to be low based on current assessment. Continue practicing safe behaviors and regular testing as recommended.' if r['risk'] == 'Low Risk' else 'Risk factors for HIV transmission have been identified. Early testing, prevention strategies, and appropriate medical care are essential for optimal health outcomes.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {r['recommendation']}. HIV testing is confidential and available through healthcare providers, community health centers, and testing sites. Pre-exposure prophylaxis (PrEP) may be considered for ongoing risk reduction.
-            </p>
-        </div>
-        """,
-        'pregnancy': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-fuchsia-50 rounded-lg border-l-4 border-fuchsia-500">
-            <h4 class="font-semibold text-fuchsia-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Pregnancy assessment: <strong>{r['trimester']}</strong> ({r['weeks']} weeks) - Risk Level: <strong>{r['risk']}</strong>
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Pregnancy appears to be progressing normally. Continue routine prenatal care, maintain a healthy diet, take prenatal vitamins, and follow your healthcare provider\'s recommendations.' if r['risk'] == 'Low Risk' else 'Pregnancy risk factors have been identified that require monitoring. Close follow-up with your obstetrician and adherence to medical recommendations are essential for maternal and fetal health.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {r['recommendation']}. Regular prenatal visits, appropriate nutrition, adequate rest, and avoiding harmful substances are important throughout pregnancy.
-            </p>
-        </div>
-        """,
-        'breast-cancer': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-pink-50 rounded-lg border-l-4 border-pink-500">
-            <h4 class="font-semibold text-pink-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Breast cancer risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Breast cancer risk appears to be low based on current assessment. Continue routine breast cancer screening as per age-appropriate guidelines, including regular mammography and clinical breast exams.' if r['risk'] == 'Low Risk' else 'Multiple risk factors for breast cancer have been identified. Early detection through appropriate screening and risk reduction strategies are important for optimal outcomes.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {r['recommendation']}. Breast self-awareness, clinical breast examinations, and mammography are important components of breast health. Discuss personalized screening recommendations with your healthcare provider.
-            </p>
-        </div>
-        """,
-        'tuberculosis': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-amber-50 rounded-lg border-l-4 border-amber-500">
-            <h4 class="font-semibold text-amber-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Tuberculosis risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Tuberculosis risk appears to be low based on current assessment. Continue routine health monitoring and be aware of TB symptoms.' if r['risk'] == 'Low Risk' else 'Risk factors for tuberculosis have been identified. TB is a serious but treatable disease. Early detection and treatment are essential to prevent transmission and complications.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {r['recommendation']}. TB testing (tuberculin skin test or interferon-gamma release assay) and chest imaging may be recommended based on risk factors and symptoms.
-            </p>
-        </div>
-        """,
-        'covid19': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-red-50 rounded-lg border-l-4 border-red-500">
-            <h4 class="font-semibold text-red-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                COVID-19 risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'COVID-19 risk appears to be low. Continue preventive measures including hand hygiene, mask-wearing in crowded places, and staying up to date with vaccinations.' if r['risk'] == 'Low Risk' else 'Risk factors for COVID-19 have been identified. COVID-19 can range from mild to severe. Early testing and appropriate management are important.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {r['recommendation']}. If symptomatic, isolate and consider COVID-19 testing. Seek immediate medical attention for severe symptoms like difficulty breathing.
-            </p>
-        </div>
-        """,
-        'malaria': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-green-50 rounded-lg border-l-4 border-green-500">
-            <h4 class="font-semibold text-green-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Malaria risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Malaria risk appears to be low. Continue preventive measures if in or traveling to endemic areas.' if r['risk'] == 'Low Risk' else 'Risk factors for malaria have been identified. Malaria is a serious but treatable disease. Early diagnosis and treatment are crucial to prevent complications.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {r['recommendation']}. Use insect repellent, bed nets, and antimalarial prophylaxis if in endemic areas. Seek immediate medical attention if symptoms develop.
-            </p>
-        </div>
-        """,
-        'liver-problem': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-yellow-50 rounded-lg border-l-4 border-yellow-500">
-            <h4 class="font-semibold text-yellow-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Liver health risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Liver health risk appears to be low. Maintain healthy lifestyle, limit alcohol consumption, and continue regular health check-ups.' if r['risk'] == 'Low Risk' else 'Risk factors for liver problems have been identified. The liver is vital for many body functions. Early detection and management of liver conditions are important.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {r['recommendation']}. Liver function tests (ALT, AST, bilirubin) and imaging may be recommended. Avoid alcohol if liver problems are suspected.
-            </p>
-        </div>
-        """,
-        'hepatitis-b': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-orange-50 rounded-lg border-l-4 border-orange-500">
-            <h4 class="font-semibold text-orange-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Hepatitis B risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Hepatitis B risk appears to be low. Ensure vaccination is up to date and continue preventive measures.' if r['risk'] == 'Low Risk' else 'Risk factors for Hepatitis B have been identified. Hepatitis B is a vaccine-preventable viral infection that can cause liver disease. Early detection and vaccination are important.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {r['recommendation']}. Hepatitis B testing (HBsAg, anti-HBc) and vaccination are important preventive measures. Post-exposure prophylaxis may be needed if recent exposure.
-            </p>
-        </div>
-        """,
-        'diabetes': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-indigo-50 rounded-lg border-l-4 border-indigo-500">
-            <h4 class="font-semibold text-indigo-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Diabetes risk assessment: <strong>{r['risk']}</strong> (Risk Score: {r['risk_score']})
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Diabetes risk appears to be low. Continue maintaining a healthy lifestyle with balanced diet and regular physical activity.' if r['risk'] == 'Low Risk' else 'Risk factors for diabetes have been identified. Diabetes is a chronic condition that affects how your body processes blood sugar. Early detection and management are important to prevent complications.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {r['recommendation']}. Lifestyle modifications including healthy diet, regular exercise, and weight management can help reduce diabetes risk.
-            </p>
-        </div>
-        """,
-        'hydration': lambda r: f"""
-        <div class="medical-report mt-4 p-4 bg-cyan-50 rounded-lg border-l-4 border-cyan-500">
-            <h4 class="font-semibold text-cyan-900 mb-2"><i class="fas fa-stethoscope mr-2"></i>Medical Interpretation</h4>
-            <p class="text-sm text-gray-700 mb-2">
-                Hydration status: <strong>{r['status']}</strong> (Hydration Score: {r['hydration_score']})
-            </p>
-            <p class="text-sm text-gray-700 mb-2">
-                <strong>Clinical Assessment:</strong> {'Hydration status appears to be adequate. Continue maintaining good fluid intake throughout the day.' if r['status'] == 'Well Hydrated' else 'Hydration status indicates room for improvement. Adequate hydration is essential for optimal body function, including temperature regulation, nutrient transport, and waste removal.'}
-            </p>
-            <p class="text-sm text-gray-600 italic">
-                <strong>Recommendation:</strong> {r['recommendation']}. General guideline: aim for 8-10 glasses (2-2.5 liters) of water daily, more if you're active, in hot weather, or ill.
-            </p>
-        </div>
-        """
-    }
-    
-    if assessment_type in reports and result:
-        return reports[assessment_type](result)
+    if assessment_type in MEDICAL_REPORTS and result:
+        return MEDICAL_REPORTS[assessment_type](result)
     return ""
 
+def canonical_result(result):
+    """Stable, hashable form of a result dict used as a report cache key"""
+    return tuple(sorted(result.items()))
+
+@lru_cache(maxsize=2048)
+def _render_medical_report_cached(assessment_type, canonical):
+    return generate_medical_report(assessment_type, dict(canonical))
+
+def render_medical_report(assessment_type, result):
+    """Render the medical report for a stored result at display time.
+
+    Reports are derived from the structured result only, so identical outcomes
+    (the common "Normal"/"Low Risk" cases) are rendered once per process.
+    """
+    if not result:
+        return ""
+    return _render_medical_report_cached(assessment_type, canonical_result(result))
+
+# Assessment form templates are discovered once at startup. Only these types are
+# routed to the template loader; anything else is a cheap 404.
+ASSESSMENT_FORM_TYPES = frozenset(
+    name[len('assessments/'):-len('.html')]
+    for name in app.jinja_env.list_templates()
+    if name.startswith('assessments/') and name.endswith('.html')
+)
+
+# Compile the form templates up front so the first visitor doesn't pay for it
+for _assessment_type in ASSESSMENT_FORM_TYPES:
+    app.jinja_env.get_template(f'assessments/{_assessment_type}.html')
+
+def cached_page(render):
+    """Serve a page that only depends on its URL from the page cache.
+
+    The cached copy leaves out flash messages and never touches the session, so
+    it gets no Vary: Cookie and shared caches can serve it to every user. A
+    redirect that flashed messages for the page marks the URL instead (see
+    redirect_with_flash); that request is rendered live, messages included, and
+    kept out of shared caches.
+    """
+    if not app.config['PAGE_CACHE'] or app.debug:
+        return render()
+    if 'flashed' in request.args:
+        response = Response(render(), mimetype='text/html')
+        response.headers['Cache-Control'] = 'private, no-store'
+        return response
+    g.shared_page = True
+    return page_cache.respond(request, request.path, render)
+
+def redirect_with_flash(endpoint, **values):
+    """Redirect to a page that shows the messages just flashed, cached pages included"""
+    return redirect(url_for(endpoint, flashed=1, **values))
+
 @app.route('/')
 def home():
-    return render_template('home.html')
+    return cached_page(lambda: render_template('home.html'))
 
 @app.route('/assessments')
 def assessments():
-    return render_template('assessments.html')
+    return cached_page(lambda: render_template('assessments.html'))
 
 @app.route('/assessment/<assessment_type>')
 def assessment_form(assessment_type):
-    return render_template(f'assessments/{assessment_type}.html', assessment_type=assessment_type)
+    if assessment_type not in ASSESSMENT_FORM_TYPES:
+        abort(404)
+    return cached_page(lambda: render_template(f'assessments/{assessment_type}.html',
+                                               assessment_type=assessment_type))
+
+class LazyJSON:
+    """Log argument that is only serialized if the record is actually emitted"""
+    __slots__ = ('payload',)
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __str__(self):
+        return json.dumps(self.payload, separators=(',', ':'))
+
+_submission_counter = itertools.count()
+
+def log_stored_result(assessment_type, result, timings):
+    """Log a stored submission, honouring the INFO level and LOG_SAMPLE_RATE"""
+    if not app.logger.isEnabledFor(logging.INFO):
+        return
+    if next(_submission_counter) % app.config['LOG_SAMPLE_RATE']:
+        return
+    if app.config['LOG_FORMAT'] == 'json':
+        app.logger.info('%s', LazyJSON({
+            'event': 'assessment_stored',
+            'assessment_type': assessment_type,
+            'category': result_category(assessment_type, result),
+            'timings_ms': {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()},
+        }))
+    else:
+        app.logger.info('Stored result for %s: %s', assessment_type, result)
 
 @app.route('/submit/<assessment_type>', methods=['POST'])
 def submit_assessment(assessment_type):
-    if 'results' not in session:
-        session['results'] = {}
+    assessment = ASSESSMENTS.get(assessment_type)
+    if assessment is None:
+        abort(404)
+    
+    sid = get_session_id(create=True)
     
     # Clear sample flag when user submits real assessment
     session['is_sample'] = False
     
-    result = None
-    
-    if assessment_type == 'bmi':
-        weight = float(request.form.get('weight'))
-        height = float(request.form.get('height')) / 100  # Convert cm to m
-        result = calculate_bmi(weight, height)
-    
-    elif assessment_type == 'cardiovascular':
-        systolic = int(request.form.get('systolic'))
-        diastolic = int(request.form.get('diastolic'))
-        result = assess_cardiovascular(systolic, diastolic)
-    
-    elif assessment_type == 'stroke-risk':
-        age = int(request.form.get('age'))
-        systolic = int(request.form.get('systolic'))
-        smoking = request.form.get('smoking') == 'yes'
-        diabetes = request.form.get('diabetes') == 'yes'
-        heart_disease = request.form.get('heart_disease') == 'yes'
-        result = assess_stroke_risk(age, systolic, smoking, diabetes, heart_disease)
-    
-    elif assessment_type == 'metabolic':
-        waist = float(request.form.get('waist'))
-        gender = request.form.get('gender')
-        systolic = int(request.form.get('systolic'))
-        result = assess_metabolic(waist, gender, systolic)
-    
-    elif assessment_type == 'respiratory':
-        spo2 = int(request.form.get('spo2'))
-        result = assess_respiratory(spo2)
-    
-    elif assessment_type == 'fitness':
-        resting_hr = int(request.form.get('resting_hr'))
-        age = int(request.form.get('age'))
-        result = assess_fitness(resting_hr, age)
-    
-    elif assessment_type == 'body-composition':
-        bf_percentage = float(request.form.get('bf_percentage'))
-        gender = request.form.get('gender')
-        age = int(request.form.get('age'))
-        result = assess_body_composition(bf_percentage, gender, age)
-    
-    elif assessment_type == 'posture':
-        alignment = int(request.form.get('alignment'))
-        balance = int(request.form.get('balance'))
-        result = assess_posture(alignment, balance)
-    
-    elif assessment_type == 'mental-health':
-        phq9_score = sum(int(request.form.get(f'q{i}')) for i in range(1, 10))
-        result = assess_mental_health(phq9_score)
-    
-    elif assessment_type == 'temperature':
-        temp = float(request.form.get('temperature'))
-        result = assess_temperature(temp)
-    
-    elif assessment_type == 'grip-strength':
-        grip = float(request.form.get('grip_strength'))
-        gender = request.form.get('gender')
-        age = int(request.form.get('age'))
-        result = assess_grip_strength(grip, gender, age)
-    
-    elif assessment_type == 'lifestyle':
-        smoking = request.form.get('smoking_status')
-        activity = int(request.form.get('physical_activity', 0))
-        result = assess_lifestyle(smoking, activity)
-    
-    elif assessment_type == 'vision':
-        # Simplified - in real app would use actual Snellen chart results
-        acuity = float(request.form.get('acuity'))
-        result = assess_vision(acuity)
-    
-    elif assessment_type == 'hearing':
-        frequencies = {
-            '250': int(request.form.get('freq_250', 0)),
-            '500': int(request.form.get('freq_500', 0)),
-            '1000': int(request.form.get('freq_1000', 0)),
-            '2000': int(request.form.get('freq_2000', 0)),
-            '4000': int(request.form.get('freq_4000', 0)),
-        }
-        result = assess_hearing(frequencies)
-    
-    elif assessment_type == 'prostate':
-        age = int(request.form.get('age'))
-        family_history = request.form.get('family_history') == 'yes'
-        psa_level = float(request.form.get('psa_level', 0)) if request.form.get('psa_level') else None
-        symptoms = request.form.get('symptoms') == 'yes'
-        result = assess_prostate(age, family_history, psa_level, symptoms)
-    
-    elif assessment_type == 'hiv':
-        age = int(request.form.get('age'))
-        risk_behaviors = request.form.get('risk_behaviors') == 'yes'
-        symptoms = request.form.get('symptoms') == 'yes'
-        recent_exposure = request.form.get('recent_exposure') == 'yes'
-        result = assess_hiv(age, risk_behaviors, symptoms, recent_exposure)
-    
-    elif assessment_type == 'pregnancy':
-        weeks_pregnant = int(request.form.get('weeks_pregnant'))
-        systolic = int(request.form.get('systolic')) if request.form.get('systolic') else None
-        diastolic = int(request.form.get('diastolic')) if request.form.get('diastolic') else None
-        blood_pressure = (systolic, diastolic) if systolic and diastolic else None
-        symptoms = request.form.get('symptoms') == 'yes'
-        previous_complications = request.form.get('previous_complications') == 'yes'
-        result = assess_pregnancy(weeks_pregnant, blood_pressure, symptoms, previous_complications)
-    
-    elif assessment_type == 'breast-cancer':
-        age = int(request.form.get('age'))
-        family_history = request.form.get('family_history', 'none')
-        genetic_factors = request.form.get('genetic_factors') == 'yes'
-        previous_biopsy = request.form.get('previous_biopsy') == 'yes'
-        breast_density = request.form.get('breast_density', 'normal')
-        hormonal_factors = request.form.get('hormonal_factors') == 'yes'
-        result = assess_breast_cancer(age, family_history, genetic_factors, previous_biopsy, breast_density, hormonal_factors)
-    
-    elif assessment_type == 'tuberculosis':
-        age = int(request.form.get('age'))
-        symptoms = request.form.get('symptoms') == 'yes'
-        exposure = request.form.get('exposure') == 'yes'
-        immunocompromised = request.form.get('immunocompromised') == 'yes'
-        previous_tb = request.form.get('previous_tb') == 'yes'
-        result = assess_tuberculosis(age, symptoms, exposure, immunocompromised, previous_tb)
-    
-    elif assessment_type == 'covid19':
-        symptoms = request.form.get('symptoms') == 'yes'
-        exposure = request.form.get('exposure') == 'yes'
-        vaccination_status = request.form.get('vaccination_status', 'unknown')
-        underlying_conditions = request.form.get('underlying_conditions') == 'yes'
-        age_group = request.form.get('age_group', 'adult')
-        result = assess_covid19(symptoms, exposure, vaccination_status, underlying_conditions, age_group)
-    
-    elif assessment_type == 'malaria':
-        symptoms = request.form.get('symptoms') == 'yes'
-        travel_history = request.form.get('travel_history') == 'yes'
-        area_residence = request.form.get('area_residence') == 'yes'
-        previous_malaria = request.form.get('previous_malaria') == 'yes'
-        prevention_measures = request.form.get('prevention_measures') == 'yes'
-        result = assess_malaria(symptoms, travel_history, area_residence, previous_malaria, prevention_measures)
-    
-    elif assessment_type == 'liver-problem':
-        symptoms = request.form.get('symptoms') == 'yes'
-        alcohol_use = request.form.get('alcohol_use', 'none')
-        medications = request.form.get('medications') == 'yes'
-        family_history = request.form.get('family_history') == 'yes'
-        previous_liver_issues = request.form.get('previous_liver_issues') == 'yes'
-        result = assess_liver_problem(symptoms, alcohol_use, medications, family_history, previous_liver_issues)
-    
-    elif assessment_type == 'hepatitis-b':
-        age = int(request.form.get('age'))
-        vaccination_status = request.form.get('vaccination_status', 'unknown')
-        exposure = request.form.get('exposure') == 'yes'
-        symptoms = request.form.get('symptoms') == 'yes'
-        risk_behaviors = request.form.get('risk_behaviors') == 'yes'
-        result = assess_hepatitis_b(age, vaccination_status, exposure, symptoms, risk_behaviors)
-    
-    elif assessment_type == 'diabetes':
-        age = int(request.form.get('age'))
-        family_history = request.form.get('family_history') == 'yes'
-        symptoms = request.form.get('symptoms') == 'yes'
-        bmi_category = request.form.get('bmi_category', 'Normal weight')
-        physical_activity = request.form.get('physical_activity', 'moderate')
-        blood_pressure = request.form.get('blood_pressure') == 'yes'
-        result = assess_diabetes(age, family_history, symptoms, bmi_category, physical_activity, blood_pressure)
-    
-    elif assessment_type == 'hydration':
-        urine_color = request.form.get('urine_color', 'light_yellow')
-        thirst_level = request.form.get('thirst_level', 'normal')
-        activity_level = request.form.get('activity_level', 'moderate')
-        fluid_intake = request.form.get('fluid_intake', 'moderate')
-        symptoms = request.form.get('symptoms') == 'yes'
-        result = assess_hydration(urine_color, thirst_level, activity_level, fluid_intake, symptoms)
-    
-    # Generate medical report for the result
-    medical_report = generate_medical_report(assessment_type, result) if result else ""
-    
-    session['results'][assessment_type] = {
+    timings = {}
+    try:
+        with stage_timer('parse', assessment_type, timings):
+            inputs = parse_inputs(assessment, request.form)
+    except ValueError as exc:
+        flash(f'{assessment_type.replace("-", " ").title()} assessment could not be scored: {exc}', 'error')
+        return redirect_with_flash('assessment_form', assessment_type=assessment_type)
+    # Pinned, so the recorded rule version is the one the result was scored with
+    try:
+        with threshold_rules.pinned() as rules, stage_timer('score', assessment_type, timings):
+            result = score_inputs(assessment, inputs)
+    except ValueError as exc:
+        flash(f'{assessment_type.replace("-", " ").title()} assessment could not be scored: {exc}', 'error')
+        return redirect_with_flash('assessment_form', assessment_type=assessment_type)
+    
+    # Provide a clearer flash message if the assessment returned no result
+    if result is None:
+        flash(f'{assessment_type.replace("-", " ").title()} assessment returned no result — please check your inputs.', 'error')
+        return redirect_with_flash('assessment_form', assessment_type=assessment_type)
+
+    # Only the structured result and its inputs are stored; the medical report is rendered on display
+    record = {
         'result': result,
         'timestamp': datetime.now().isoformat(),
-        'medical_report': medical_report
+        'category': result_category(assessment_type, result),
+        'site': app.config['SITE'],
+        'rules_version': rules.version,
+        'inputs': inputs,
     }
-    session.modified = True
+    # Rescore only what this submission's inputs feed into, composite included
+    with stage_timer('composite', assessment_type, timings):
+        profile = result_store.get_profile(sid)
+        COMPOSITE_GRAPH.update(profile, submission_facts(assessment_type, inputs, record['timestamp'], profile))
+    with stage_timer('store', assessment_type, timings):
+        result_store.put(sid, assessment_type, record, profile=profile)
 
     # Debug logging to help diagnose issues when results don't appear
-    app.logger.info(f"Stored result for {assessment_type}: {session['results'][assessment_type]}")
+    log_stored_result(assessment_type, result, timings)
 
-    # Provide a clearer flash message if the assessment returned no result
+    flash(f'{assessment_type.replace("-", " ").title()} assessment completed!', 'success')
+
+    return redirect(url_for('results'))
+
+def rescore_inputs(assessment_type, inputs):
+    """Score stored inputs with the rules in force: (result, category, rules version)"""
+    with threshold_rules.pinned() as rules:
+        result = score_inputs(ASSESSMENTS[assessment_type], inputs)
+    category = None if result is None else result_category(assessment_type, result)
+    return result, category, rules.version
+
+def _form_value(value):
+    """Map a JSON input value onto the string a browser form would submit"""
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if value is None:
+        return None
+    return str(value)
+
+def score_batch_record(record):
+    """Score one batch record, returning its result or a per-record error"""
+    if not isinstance(record, dict):
+        return {'error': 'Record must be an object with assessment_type and inputs'}
+    assessment_type = record.get('assessment_type')
+    outcome = {'assessment_type': assessment_type}
+    assessment = ASSESSMENTS.get(assessment_type)
+    if assessment is None:
+        outcome['error'] = f"Unknown assessment type: {assessment_type!r}"
+        return outcome
+    inputs = record.get('inputs') or {}
+    if not isinstance(inputs, dict):
+        outcome['error'] = 'inputs must be an object'
+        return outcome
+    form = {name: _form_value(value) for name, value in inputs.items()}
+    try:
+        result = score_inputs(assessment, parse_inputs(assessment, form))
+    except ValueError as exc:
+        outcome['error'] = str(exc)
+        return outcome
     if result is None:
-        flash(f'{assessment_type.replace("-", " ").title()} assessment returned no result — please check your inputs.', 'error')
-        return redirect(url_for('assessment_form', assessment_type=assessment_type))
+        outcome['error'] = 'Assessment returned no result - please check your inputs'
     else:
-        flash(f'{assessment_type.replace("-", " ").title()} assessment completed!', 'success')
+        outcome['result'] = result
+    return outcome
 
-    return redirect(url_for('results'))
+@app.route('/api/v1/assess/batch', methods=['POST'])
+def assess_batch():
+    """Score a JSON array of {assessment_type, inputs} records in one request.
 
-@app.route('/results')
-def results():
-    results_data = session.get('results', {})
+    Records are validated independently; each entry of the response carries
+    either a result or an error. The response is streamed record by record so
+    large batches don't have to be held in memory as one document.
+    """
+    records = request.get_json(silent=True)
+    if not isinstance(records, list):
+        return jsonify(error='Request body must be a JSON array of records'), 400
+
+    def generate():
+        yield '['
+        for index, record in enumerate(records):
+            outcome = score_batch_record(record)
+            outcome = {'index': index, **outcome}
+            yield (',' if index else '') + json.dumps(outcome)
+        yield ']'
+
+    return Response(generate(), mimetype='application/json')
+
+# Card icon per assessment type: (Font Awesome icon, colour class)
+RESULT_ICONS = {
+    'bmi': ('fa-weight', 'text-blue-600'),
+    'cardiovascular': ('fa-heartbeat', 'text-red-600'),
+    'stroke-risk': ('fa-exclamation-triangle', 'text-orange-600'),
+    'metabolic': ('fa-chart-line', 'text-green-600'),
+    'respiratory': ('fa-lungs', 'text-teal-600'),
+    'fitness': ('fa-dumbbell', 'text-purple-600'),
+    'body-composition': ('fa-user-circle', 'text-pink-600'),
+    'posture': ('fa-user', 'text-indigo-600'),
+    'mental-health': ('fa-brain', 'text-yellow-600'),
+    'temperature': ('fa-thermometer-half', 'text-cyan-600'),
+    'grip-strength': ('fa-hand-paper', 'text-lime-600'),
+    'lifestyle': ('fa-smoking', 'text-amber-600'),
+    'vision': ('fa-eye', 'text-violet-600'),
+    'hearing': ('fa-deaf', 'text-rose-600'),
+    'prostate': ('fa-male', 'text-slate-600'),
+    'hiv': ('fa-shield-virus', 'text-emerald-600'),
+    'pregnancy': ('fa-baby', 'text-fuchsia-600'),
+    'breast-cancer': ('fa-ribbon', 'text-pink-600'),
+    'tuberculosis': ('fa-lungs', 'text-amber-600'),
+    'covid19': ('fa-virus', 'text-red-600'),
+    'malaria': ('fa-bug', 'text-green-600'),
+    'liver-problem': ('fa-stethoscope', 'text-yellow-600'),
+    'hepatitis-b': ('fa-virus', 'text-orange-600'),
+    'diabetes': ('fa-syringe', 'text-indigo-600'),
+    'hydration': ('fa-tint', 'text-cyan-600'),
+}
+
+@lru_cache(maxsize=4096)
+def _render_result_card(assessment_type, canonical, day):
+    # Only cache misses are timed: hits are a dict lookup
+    with stage_timer('card', assessment_type):
+        return Markup(app.jinja_env.get_template('partials/result_card.html').render(
+            assessment_type=assessment_type,
+            result=dict(canonical),
+            icon=RESULT_ICONS.get(assessment_type),
+            medical_report=render_medical_report(assessment_type, dict(canonical)),
+            day=day,
+        ))
+
+def render_result_card(assessment_type, record):
+    """HTML for one results-page card.
+
+    Cards only depend on the assessment type, the result and the day it was
+    taken, so each distinct card is rendered once per process and the results
+    page is assembled from these fragments.
+    """
+    return _render_result_card(assessment_type, canonical_result(record['result']), record['timestamp'][:10])
+
+def buffered(chunks, size=8192):
+    """Join small template chunks into writes of about `size` characters"""
+    buffer = []
+    pending = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        pending += len(chunk)
+        if pending >= size:
+            yield ''.join(buffer)
+            buffer = []
+            pending = 0
+    if buffer:
+        yield ''.join(buffer)
+
+def timed(chunks, stage, assessment_type):
+    """Record the time spent producing a streamed response as one stage"""
+    with stage_timer(stage, assessment_type):
+        yield from chunks
+
+def load_results():
+    """(is_sample, [(assessment_type, record)]) for the results this session shows"""
     is_sample = session.get('is_sample', False)
+    if is_sample:
+        results_data = get_sample_results()
+    else:
+        sid = get_session_id()
+        results_data = result_store.get_all(sid) if sid else {}
     
     # Only include assessments that were actually taken (have results)
-    # Filter out None results and ensure result is not None
-    filtered_results = {}
-    for assessment_type, data in results_data.items():
-        if data and data.get('result') is not None:
-            # Generate medical report if not already present
-            if 'medical_report' not in data or not data.get('medical_report'):
-                data['medical_report'] = generate_medical_report(assessment_type, data['result'])
-            filtered_results[assessment_type] = data
-    
-    return render_template('results.html', results=filtered_results, is_sample=is_sample)
+    taken = [(assessment_type, data) for assessment_type, data in results_data.items()
+             if data and data.get('result') is not None]
+    return is_sample, taken
+
+def load_composite(is_sample, taken):
+    """Composite score for the results this session shows"""
+    if not is_sample:
+        sid = get_session_id()
+        profile = result_store.get_profile(sid) if sid else {}
+        if profile:
+            return profile.get('composite')
+    # The sample set, and results stored before profiles were kept, have no inputs to link
+    return composite_score({assessment_type: data['result'] for assessment_type, data in taken})
+
+@app.route('/results')
+def results():
+    is_sample, taken = load_results()
+
+    # The session can't change once streaming has started, so pending flash
+    # messages are taken out now (base.html then reads them from the request)
+    get_flashed_messages(with_categories=True)
+
+    # The header goes out first; cards are rendered (or fetched) as the page streams
+    page = stream_template('results.html', is_sample=is_sample, has_results=bool(taken), report_format=REPORT_FORMAT,
+                           composite=load_composite(is_sample, taken),
+                           cards=(render_result_card(assessment_type, data) for assessment_type, data in taken))
+    return Response(timed(buffered(page), 'template', 'results'), mimetype='text/html')
+
+# Downloadable reports: PDF when weasyprint is usable, otherwise the print-styled HTML it is made from
+REPORT_MIMETYPES = {'html': 'text/html', 'pdf': 'application/pdf'}
+REPORT_FORMAT = 'pdf' if weasyprint is not None else 'html'
+# Seconds a download waits for its document before asking the client to retry
+REPORT_BUILD_TIMEOUT = 20
+document_cache = DocumentCache()
+
+def report_entries(taken):
+    """Per-assessment content of the printable report"""
+    entries = []
+    for assessment_type, record in taken:
+        result = record['result']
+        entries.append({
+            'title': assessment_type.replace('-', ' ').title(),
+            'category': result_category(assessment_type, result),
+            'day': record['timestamp'][:10],
+            'fields': [(field, result[field]) for field, _ in RESULT_FIELDS.get(assessment_type, ())
+                       if field != 'recommendation' and field in result],
+            'medical_report': render_medical_report(assessment_type, result),
+        })
+    return entries
+
+def build_report(report_format, taken, is_sample, generated):
+    """Report document bytes; runs on the document pool, not the request thread"""
+    with stage_timer('document', report_format):
+        html = app.jinja_env.get_template('report_print.html').render(
+            entries=report_entries(taken), is_sample=is_sample, generated=generated)
+        return html_to_pdf(html) if report_format == 'pdf' else html.encode('utf-8')
+
+@app.route('/results/report.<report_format>')
+def results_report(report_format):
+    """Compact printable report (HTML or PDF) of this session's results"""
+    if report_format not in REPORT_MIMETYPES or (report_format == 'pdf' and weasyprint is None):
+        abort(404)
+    is_sample, taken = load_results()
+    generated = date.today().isoformat()
+    # Everything the document is built from, so an unchanged result set is never rebuilt
+    key = content_key(report_format, is_sample, generated,
+                      [(assessment_type, canonical_result(record['result']), record['timestamp'][:10])
+                       for assessment_type, record in taken])
+    build = lambda: Document(build_report(report_format, taken, is_sample, generated),
+                             REPORT_MIMETYPES[report_format], key)
+    try:
+        document = document_cache.get(key, build, timeout=REPORT_BUILD_TIMEOUT)
+    except FuturesTimeoutError:
+        return Response("The report is still being generated, please retry shortly.", status=503,
+                        headers={'Retry-After': '2'}, mimetype='text/plain')
+
+    response = Response(document.body, mimetype=document.mimetype)
+    response.set_etag(document.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    if report_format == 'pdf':
+        response.headers['Content-Disposition'] = 'attachment; filename="health-report.pdf"'
+    return response.make_conditional(request)
+
+# History requests cover the last 90 days unless asked otherwise, and return at most this many readings
+HISTORY_DEFAULT_DAYS = 90
+HISTORY_MAX_READINGS = 5000
+# Longest window a days= query may ask for
+HISTORY_MAX_DAYS = 3650
+
+def history_window(args):
+    """(since, until, limit) from history query parameters; raises ValueError when invalid"""
+    until = datetime.fromisoformat(args['until']) if args.get('until') else None
+    if args.get('since'):
+        since = datetime.fromisoformat(args['since'])
+    else:
+        days = int(args.get('days', HISTORY_DEFAULT_DAYS))
+        if not 0 < days <= HISTORY_MAX_DAYS:
+            raise ValueError(f"days must be between 1 and {HISTORY_MAX_DAYS}")
+        try:
+            since = (until or datetime.now()) - timedelta(days=days)
+        except OverflowError:
+            # an until date too close to datetime.min
+            raise ValueError("days reaches before the earliest supported date") from None
+    limit = int(args.get('limit', HISTORY_MAX_READINGS))
+    if limit <= 0:
+        raise ValueError("limit must be a positive number")
+    return since, until, min(limit, HISTORY_MAX_READINGS)
+
+def get_history(assessment_type, since, until, limit):
+    """This session's readings of one assessment within a time window, oldest first"""
+    sid = get_session_id()
+    if sid is None:
+        return []
+    with stage_timer('history', assessment_type):
+        return result_store.get_history(sid, assessment_type, since=since, until=until, limit=limit,
+                                        rules_version=threshold_rules.current.version)
+
+@app.route('/history/<assessment_type>')
+def history(assessment_type):
+    if assessment_type not in ASSESSMENTS:
+        abort(404)
+    try:
+        since, until, limit = history_window(request.args)
+    except ValueError:
+        abort(400)
+    readings = get_history(assessment_type, since, until, limit)
+    return render_template('history.html', assessment_type=assessment_type, readings=readings,
+                           fields=[field for field, _ in RESULT_FIELDS[assessment_type] if field != 'recommendation'],
+                           since=since, until=until)
+
+def history_reading(reading):
+    """JSON form of a stored reading, with its outcome under the current rules if it was re-scored"""
+    entry = {'timestamp': reading['timestamp'], 'result': reading['result'],
+             'rules_version': reading.get('rules_version')}
+    if 'rescored' in reading:
+        entry['rescored'] = {'result': reading['rescored']['result'],
+                             'rules_version': reading['rescored']['rules_version']}
+    return entry
+
+@app.route('/api/v1/history/<assessment_type>')
+def history_api(assessment_type):
+    """Readings of one assessment as JSON; accepts days, since, until (ISO 8601) and limit"""
+    if assessment_type not in ASSESSMENTS:
+        return jsonify(error=f"Unknown assessment type: {assessment_type!r}"), 404
+    try:
+        since, until, limit = history_window(request.args)
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    readings = get_history(assessment_type, since, until, limit)
+    return jsonify(
+        assessment_type=assessment_type,
+        since=since.isoformat(),
+        until=until.isoformat() if until else None,
+        readings=[history_reading(reading) for reading in readings],
+    )
+
+@app.route('/api/v1/composite')
+def composite_api():
+    """This session's composite score and each assessment as scored with linked inputs"""
+    sid = get_session_id()
+    profile = result_store.get_profile(sid) if sid else {}
+    return jsonify(
+        composite=profile.get('composite'),
+        results={name: profile[name] for name in ASSESSMENTS if name in profile},
+        linked={node.name: profile.get(node.name) for node in LINKED_NODES},
+    )
+
+# Sample dataset for /sample-results: (scorer, arguments, age in days) per assessment.
+# Scored per rules version, so the samples follow a threshold rules reload.
+SAMPLE_INPUTS = MappingProxyType({
+    'bmi': (calculate_bmi, (75, 1.75), 1),  # 75kg, 175cm
+    'cardiovascular': (assess_cardiovascular, (125, 82), 1),
+    'stroke-risk': (assess_stroke_risk, (45, 125, False, False, False), 2),
+    'metabolic': (assess_metabolic, (88, 'male', 125), 1),
+    'respiratory': (assess_respiratory, (98,), 0),
+    'fitness': (assess_fitness, (68, 35), 1),
+    'body-composition': (assess_body_composition, (18, 'male', 35), 2),
+    'posture': (assess_posture, (4, 4), 3),
+    'mental-health': (assess_mental_health, (6,), 0),
+    'temperature': (assess_temperature, (36.8,), 0),
+    'grip-strength': (assess_grip_strength, (42, 'male', 35), 1),
+    'lifestyle': (assess_lifestyle, ('never', 180), 2),
+    'vision': (assess_vision, (20,), 6),
+    'hearing': (assess_hearing, ({
+        '250': 15,
+        '500': 18,
+        '1000': 20,
+        '2000': 22,
+        '4000': 25
+    },), 6),
+})
+
+@lru_cache(maxsize=1)
+def _sample_results_for(day, rules_version):
+    """Sample records scored with the pinned rules, which are version ``rules_version``"""
+    now = datetime.combine(day, datetime.now().time())
+    return MappingProxyType({
+        assessment_type: MappingProxyType({
+            'result': scorer(*args),
+            'timestamp': (now - timedelta(days=age_days)).isoformat(),
+            'rules_version': rules_version,
+        })
+        for assessment_type, (scorer, args, age_days) in SAMPLE_INPUTS.items()
+    })
+
+def get_sample_results():
+    """Sample results as stored records, shared read-only and rebuilt once a day or when the rules change"""
+    with threshold_rules.pinned() as rules:
+        return _sample_results_for(date.today(), rules.version)
 
 @app.route('/sample-results')
 def sample_results():
     """Display sample results for demonstration purposes"""
-    from datetime import datetime, timedelta
-    
-    # Create comprehensive sample results
-    sample_data = {}
-    sample_results_data = {
-        'bmi': calculate_bmi(75, 1.75),  # 75kg, 175cm
-        'cardiovascular': assess_cardiovascular(125, 82),
-        'stroke-risk': assess_stroke_risk(45, 125, False, False, False),
-        'metabolic': assess_metabolic(88, 'male', 125),
-        'respiratory': assess_respiratory(98),
-        'fitness': assess_fitness(68, 35),
-        'body-composition': assess_body_composition(18, 'male', 35),
-        'posture': assess_posture(4, 4),
-        'mental-health': assess_mental_health(6),
-        'temperature': assess_temperature(36.8),
-        'grip-strength': assess_grip_strength(42, 'male', 35),
-        'lifestyle': assess_lifestyle('never', 180),
-        'vision': assess_vision(20),
-        'hearing': assess_hearing({
-            '250': 15,
-            '500': 18,
-            '1000': 20,
-            '2000': 22,
-            '4000': 25
-        })
-    }
-    
-    timestamps = {
-        'bmi': (datetime.now() - timedelta(days=1)).isoformat(),
-        'cardiovascular': (datetime.now() - timedelta(days=1)).isoformat(),
-        'stroke-risk': (datetime.now() - timedelta(days=2)).isoformat(),
-        'metabolic': (datetime.now() - timedelta(days=1)).isoformat(),
-        'respiratory': datetime.now().isoformat(),
-        'fitness': (datetime.now() - timedelta(days=1)).isoformat(),
-        'body-composition': (datetime.now() - timedelta(days=2)).isoformat(),
-        'posture': (datetime.now() - timedelta(days=3)).isoformat(),
-        'mental-health': datetime.now().isoformat(),
-        'temperature': datetime.now().isoformat(),
-        'grip-strength': (datetime.now() - timedelta(days=1)).isoformat(),
-        'lifestyle': (datetime.now() - timedelta(days=2)).isoformat(),
-        'vision': (datetime.now() - timedelta(days=6)).isoformat(),
-        'hearing': (datetime.now() - timedelta(days=6)).isoformat()
-    }
-    
-    # Build sample data with medical reports
-    for assessment_type, result in sample_results_data.items():
-        sample_data[assessment_type] = {
-            'result': result,
-            'timestamp': timestamps[assessment_type],
-            'medical_report': generate_medical_report(assessment_type, result)
-        }
-    
-    session['results'] = sample_data
+    # The session only records that the sample set is being viewed
     session['is_sample'] = True
-    session.modified = True
     return redirect(url_for('results'))
 
+# Longest window /admin/analytics will summarize
+ANALYTICS_MAX_DAYS = 366
+
+def require_admin():
+    """404 unless admin access is configured, 401 unless the request carries the token"""
+    token = app.config['ADMIN_TOKEN']
+    if not token:
+        abort(404)
+    if not secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+
+def analytics_window(args):
+    """(since_day, until_day) of the last ``days`` days; raises ValueError"""
+    days = int(args.get('days', 30))
+    if not 0 < days <= ANALYTICS_MAX_DAYS:
+        raise ValueError(f"days must be between 1 and {ANALYTICS_MAX_DAYS}")
+    until_day = date.today()
+    return until_day - timedelta(days=days - 1), until_day
+
+@app.route('/admin/analytics')
+def admin_analytics():
+    """Category distributions across all users, read from the pre-aggregated rollups.
+
+    Query parameters: days (default 30), site, assessment_type, and group (a
+    comma-separated subset of day,site to break the shares down by).
+    """
+    require_admin()
+    try:
+        since_day, until_day = analytics_window(request.args)
+        group_by = tuple(name for name in request.args.get('group', '').split(',') if name)
+        unknown = [name for name in group_by if name not in GROUP_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown group dimension(s): {', '.join(unknown)}")
+        # Also the metrics label below, so only known types get one
+        assessment_type = request.args.get('assessment_type') or None
+        if assessment_type is not None and assessment_type not in ASSESSMENTS:
+            raise ValueError(f"Unknown assessment type: {assessment_type!r}")
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    site = request.args.get('site')
+    with stage_timer('analytics', assessment_type or 'all'):
+        rows = result_store.get_rollups(since_day.isoformat(), until_day.isoformat(), site, assessment_type)
+        summary = summarize(rows, group_by)
+    return jsonify(since=since_day.isoformat(), until=until_day.isoformat(), site=site,
+                   assessment_type=assessment_type, group=list(group_by), summary=summary)
+
+@app.route('/admin/analytics/inputs')
+def admin_input_analytics():
+    """Distributions of the raw inputs of one assessment across all users, scanned column by column.
+
+    Query parameters: assessment_type (required), days (default 30), site, and
+    fields (comma-separated input fields, default all).
+    """
+    require_admin()
+    assessment_type = request.args.get('assessment_type')
+    if assessment_type not in INPUT_SCHEMAS:
+        return jsonify(error=f"Unknown assessment type: {assessment_type!r}"), 400
+    types = dict(INPUT_SCHEMAS[assessment_type])
+    site = request.args.get('site')
+    try:
+        since_day, until_day = analytics_window(request.args)
+        fields = [name for name in request.args.get('fields', '').split(',') if name] or list(types)
+        unknown = [name for name in fields if name not in types]
+        if unknown:
+            raise ValueError(f"Unknown input field(s): {', '.join(unknown)}")
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    with stage_timer('analytics', assessment_type):
+        columns = result_store.get_input_columns(assessment_type, fields, site=site,
+                                                 since=datetime.combine(since_day, datetime.min.time()),
+                                                 until=datetime.combine(until_day, datetime.max.time()))
+        summary = describe_inputs(columns, types)
+    return jsonify(since=since_day.isoformat(), until=until_day.isoformat(), site=site,
+                   assessment_type=assessment_type, inputs=summary)
+
+@app.route('/metrics')
+def metrics():
+    """Per-stage latency histograms in Prometheus text format"""
+    return render_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 @app.route('/clear')
 def clear_session():
+    """Clear the latest results; the history stays, under the same sid, for /history"""
+    sid = get_session_id()
+    session.clear()
+    if sid:
+        result_store.clear(sid, history=False)
+        session['sid'] = sid
+        session.permanent = True
+    flash('All assessment results cleared. Your history is kept.', 'info')
+    return redirect(url_for('results'))
+
+@app.route('/clear-history')
+def clear_history():
+    """Delete everything stored for this session, history included, and start a new one"""
+    sid = get_session_id()
+    if sid:
+        result_store.clear(sid)
     session.clear()
-    flash('All assessment results cleared.', 'info')
+    flash('All assessment results and history deleted.', 'info')
     return redirect(url_for('results'))
 
 # Debug endpoint to inspect session results during local development
 @app.route('/_debug/session')
 def debug_session():
-    # Return a JSON representation of session['results'] for quick inspection
-    return json.dumps(session.get('results', {}), default=str), 200, {'Content-Type': 'application/json'}
+    # Return a JSON representation of this session's stored results for quick inspection
+    sid = get_session_id()
+    results_data = result_store.get_all(sid) if sid else {}
+    return json.dumps(results_data, default=str), 200, {'Content-Type': 'application/json'}
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,153 @@
+"""ASGI entry point for Health Plus.
+
+    uvicorn asgi:app --workers 4 --host 0.0.0.0 --port 8000
+
+Connections are handled by the event loop: request bodies are read and
+responses are written asynchronously, so a slow mobile client only holds a
+coroutine. The Flask app itself runs unchanged on a bounded thread pool once
+the full request has arrived; scoring stays inline there, and the loop awaits
+the worker thread (including its result store reads and writes) instead of
+blocking on it. Streaming responses (the batch API) are forwarded chunk by
+chunk.
+
+Request bodies are spooled to a temporary file once they outgrow memory, with
+or without a Content-Length, and a body over the app's MAX_CONTENT_LENGTH is
+refused with 413 while it is read rather than after it has been buffered.
+
+HEALTHPLUS_ASGI_THREADS sets the pool size per worker process (default 8).
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from app import app as flask_app
+
+# Request body bytes kept in memory before spooling to disk
+SPOOL_MEMORY_BYTES = 64 * 1024
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope and its fully received request body"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        # The body has been read to its end, so it can be read without a Content-Length (chunked uploads)
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+
+    for raw_name, raw_value in scope['headers']:
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            # Repeated headers are folded; cookies use their own separator
+            value = environ[name] + ('; ' if name == 'HTTP_COOKIE' else ',') + value
+        environ[name] = value
+    return environ
+
+
+class WSGIThreadPoolApp:
+    """Serve a WSGI app over ASGI, running each request on a thread pool"""
+
+    def __init__(self, wsgi_app, threads=8, max_body=None):
+        self.wsgi_app = wsgi_app
+        self.max_body = max_body
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        # Read the whole body on the loop; no thread is held while the client uploads
+        with SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES) as body:
+            size = 0
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                chunk = message.get('body', b'')
+                size += len(chunk)
+                if self.max_body is not None and size > self.max_body:
+                    await self._send_too_large(send)
+                    return
+                body.write(chunk)
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+
+            loop = asyncio.get_running_loop()
+            environ = build_environ(scope, body)
+            await loop.run_in_executor(self.executor, self._run_wsgi_app, environ, send, loop)
+
+    async def _send_too_large(self, send):
+        await send({'type': 'http.response.start', 'status': 413,
+                    'headers': [(b'content-type', b'text/plain; charset=utf-8'), (b'connection', b'close')]})
+        await send({'type': 'http.response.body', 'body': b'Request body too large', 'more_body': False})
+
+    def _run_wsgi_app(self, environ, send, loop):
+        """Run the WSGI app in a worker thread, sending the response through the loop"""
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response_start = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response_start.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response_start.update(
+                status=int(status.split(' ', 1)[0]),
+                headers=[(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+            )
+            return lambda data: send_body(data)
+
+        def send_body(data, more_body=True):
+            if not response_start.get('sent'):
+                send_message({'type': 'http.response.start', 'status': response_start['status'],
+                              'headers': response_start['headers']})
+                response_start['sent'] = True
+            if data or not more_body:
+                send_message({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+        iterable = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in iterable:
+                send_body(chunk)
+            send_body(b'', more_body=False)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+
+app = WSGIThreadPoolApp(flask_app, threads=int(os.environ.get('HEALTHPLUS_ASGI_THREADS', '8')),
+                        max_body=flask_app.config['MAX_CONTENT_LENGTH'])
@@ -0,0 +1,215 @@
+"""Load test: gunicorn sync workers vs the ASGI entry point under uvicorn.
+
+Run from the repository root (needs gunicorn and uvicorn installed):
+
+    python benchmarks/loadtest.py [--workers N] [--duration S] [--clients C] [--slow-clients K]
+                                  [--client-processes P]
+
+Both servers get the same number of worker processes (default: CPU count) and
+a fresh SQLite result store. During the run, C fast clients loop over
+submit-an-assessment then view /results, and K slow clients keep uploading a
+submission one byte at a time, like a phone on a bad connection. The table
+reports throughput and latency of the fast clients' requests. With
+--client-processes the clients are spread over several processes, so the load
+generator itself doesn't become the bottleneck.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SUBMISSION = b'weight=75&height=175'
+
+
+def server_command(server, workers, port):
+    bind = ['127.0.0.1', str(port)]
+    if server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', 'app:app', '--workers', str(workers),
+                '--bind', ':'.join(bind), '--log-level', 'warning']
+    return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--workers', str(workers),
+            '--host', bind[0], '--port', bind[1], '--log-level', 'warning', '--no-access-log']
+
+
+def wait_until_listening(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not start listening on port {port}")
+
+
+def _request(method, path, body=b'', cookie=None):
+    headers = [f'{method} {path} HTTP/1.1', 'Host: 127.0.0.1', 'Connection: close']
+    if cookie:
+        headers.append(f'Cookie: {cookie}')
+    if method == 'POST':
+        headers += ['Content-Type: application/x-www-form-urlencoded', f'Content-Length: {len(body)}']
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1')
+
+
+def _parse_response(raw):
+    head = raw.split(b'\r\n\r\n', 1)[0].decode('latin-1').split('\r\n')
+    status = int(head[0].split()[1])
+    cookie = None
+    for line in head[1:]:
+        name, _, value = line.partition(':')
+        if name.lower() == 'set-cookie':
+            cookie = value.strip().split(';', 1)[0]
+    return status, cookie
+
+
+async def http(port, method, path, body=b'', cookie=None, trickle=None):
+    """One request on a fresh connection; trickle sends the body a byte at a time"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(_request(method, path, body, cookie))
+        if trickle is None:
+            writer.write(body)
+        else:
+            for index in range(len(body)):
+                await asyncio.sleep(trickle)
+                writer.write(body[index:index + 1])
+                await writer.drain()
+        await writer.drain()
+        return _parse_response(await reader.read())
+    finally:
+        writer.close()
+
+
+async def fast_client(port, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        for step in ('submit', 'results'):
+            start = time.perf_counter()
+            try:
+                if step == 'submit':
+                    status, cookie = await asyncio.wait_for(
+                        http(port, 'POST', '/submit/bmi', SUBMISSION), 30)
+                    ok = status == 302
+                else:
+                    status, _ = await asyncio.wait_for(http(port, 'GET', '/results', cookie=cookie), 30)
+                    ok = status == 200
+            except (OSError, asyncio.TimeoutError):
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(step)
+                break
+
+
+async def slow_client(port, deadline, interval, completed):
+    while time.monotonic() < deadline:
+        try:
+            await http(port, 'POST', '/submit/bmi', SUBMISSION, trickle=interval)
+            completed.append(1)
+        except OSError:
+            await asyncio.sleep(interval)
+
+
+async def run_load(port, args):
+    latencies, errors, slow_completed = [], [], []
+    deadline = time.monotonic() + args.duration
+    slow = [asyncio.create_task(slow_client(port, deadline, args.slow_interval, slow_completed))
+            for _ in range(args.slow_clients)]
+    # Let the slow uploads occupy their connections before the measured traffic starts
+    await asyncio.sleep(min(1.0, args.duration / 10))
+    started = time.monotonic()
+    await asyncio.gather(*(fast_client(port, deadline, latencies, errors) for _ in range(args.clients)))
+    elapsed = time.monotonic() - started
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+    return latencies, errors, slow_completed, elapsed
+
+
+def _load_process(port, args):
+    return asyncio.run(run_load(port, args))
+
+
+def generate_load(port, args):
+    """Run the clients, split across args.client_processes processes when above 1"""
+    processes = max(1, getattr(args, 'client_processes', 1))
+    if processes == 1:
+        return _load_process(port, args)
+
+    shares = []
+    for index in range(processes):
+        share = argparse.Namespace(**vars(args))
+        share.clients = args.clients // processes + (index < args.clients % processes)
+        share.slow_clients = args.slow_clients // processes + (index < args.slow_clients % processes)
+        shares.append(share)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        parts = list(pool.map(_load_process, [port] * processes, shares))
+    latencies, errors, slow_completed = [], [], []
+    for part_latencies, part_errors, part_slow, _ in parts:
+        latencies += part_latencies
+        errors += part_errors
+        slow_completed += part_slow
+    return latencies, errors, slow_completed, max(part[3] for part in parts)
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def benchmark(server, args):
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, HEALTHPLUS_RESULT_STORE='sqlite',
+                   HEALTHPLUS_RESULT_DB=os.path.join(directory, 'loadtest.db'))
+        process = subprocess.Popen(server_command(server, args.workers, args.port), cwd=ROOT, env=env)
+        try:
+            wait_until_listening(args.port)
+            latencies, errors, slow_completed, elapsed = generate_load(args.port, args)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return {
+        'server': server,
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'errors': len(errors),
+        'slow': len(slow_completed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servers', default='gunicorn,uvicorn', help='comma-separated: gunicorn,uvicorn')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes per server')
+    parser.add_argument('--duration', type=float, default=15, help='seconds per server')
+    parser.add_argument('--clients', type=int, default=20, help='concurrent fast clients')
+    parser.add_argument('--slow-clients', type=int, default=8, help='concurrent slow uploads')
+    parser.add_argument('--slow-interval', type=float, default=0.25, help='seconds between uploaded bytes')
+    parser.add_argument('--client-processes', type=int, default=1,
+                        help='processes generating load (clients are split between them)')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    rows = [benchmark(server.strip(), args) for server in args.servers.split(',') if server.strip()]
+    print(f"\n{args.workers} worker(s), {args.clients} fast clients, {args.slow_clients} slow clients, "
+          f"{args.duration:g}s per server")
+    print(f"{'server':<10} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7} {'slow done':>10}")
+    for row in rows:
+        print(f"{row['server']:<10} {row['requests']:>9} {row['rps']:>8.1f} {row['p50']:>8.1f} "
+              f"{row['p95']:>8.1f} {row['p99']:>8.1f} {row['errors']:>7} {row['slow']:>10}")
+
+
+if __name__ == '__main__':
+    main()
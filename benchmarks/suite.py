@@ -0,0 +1,320 @@
+"""Benchmark suite with JSON output for comparing commits.
+
+Run from the repository root:
+
+    python benchmarks/suite.py [--groups assess,reports,routes] [--http] [-o out.json] [--compare base.json]
+
+Groups:
+
+* assess  - every assessment scorer on a representative parsed form, and the
+            composite graph updating one reading vs. deriving everything
+* reports - generate_medical_report for every assessment type
+* codec   - encoding and decoding a stored record of every assessment: the
+            compact codec against json and Flask's session serializer
+            (results used to live in the session cookie); entries also
+            record the total payload bytes
+* routes  - Flask test client: POST /submit/<type> for every type, GET /results
+            with 1, 10 and 25 stored assessments, and /sample-results
+* http    - (with --http) gunicorn sync workers and uvicorn/asgi.py under the
+            load generator in loadtest.py
+
+Timings are the best of --repeat runs, each long enough to last ~0.2s, to keep
+noise from other processes out. Results go to benchmarks/results/<commit>.json
+by default; --compare prints the change against an earlier run.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+GROUPS = ('assess', 'reports', 'codec', 'routes', 'http')
+# Stored-result counts for the /results benchmarks
+RESULTS_PAGE_SIZES = (1, 10, 25)
+# A change beyond this fraction is flagged by --compare
+REGRESSION_THRESHOLD = 0.10
+
+# One representative form submission per assessment type, as the browser posts it
+SAMPLE_FORMS = {
+    'bmi': {'weight': '75', 'height': '175'},
+    'cardiovascular': {'systolic': '125', 'diastolic': '82'},
+    'stroke-risk': {'age': '45', 'systolic': '125', 'smoking': 'no', 'diabetes': 'no', 'heart_disease': 'no'},
+    'metabolic': {'waist': '88', 'gender': 'male', 'systolic': '125'},
+    'respiratory': {'spo2': '98'},
+    'fitness': {'resting_hr': '68', 'age': '35'},
+    'body-composition': {'bf_percentage': '18', 'gender': 'male', 'age': '35'},
+    'posture': {'alignment': '4', 'balance': '4'},
+    'mental-health': {f'q{index}': '1' if index < 7 else '0' for index in range(1, 10)},
+    'temperature': {'temperature': '36.8'},
+    'grip-strength': {'grip_strength': '42', 'gender': 'male', 'age': '35'},
+    'lifestyle': {'smoking_status': 'never', 'physical_activity': '180'},
+    'vision': {'acuity': '20'},
+    'hearing': {'freq_250': '15', 'freq_500': '18', 'freq_1000': '20', 'freq_2000': '22', 'freq_4000': '25'},
+    'prostate': {'age': '62', 'family_history': 'yes', 'psa_level': '3.1', 'symptoms': 'no'},
+    'hiv': {'age': '28', 'risk_behaviors': 'no', 'symptoms': 'no', 'recent_exposure': 'no'},
+    'pregnancy': {'weeks_pregnant': '20', 'systolic': '118', 'diastolic': '76', 'symptoms': 'no',
+                  'previous_complications': 'no'},
+    'breast-cancer': {'age': '45', 'family_history': 'none', 'genetic_factors': 'no', 'previous_biopsy': 'no',
+                      'breast_density': 'normal', 'hormonal_factors': 'no'},
+    'tuberculosis': {'age': '40', 'symptoms': 'no', 'exposure': 'no', 'immunocompromised': 'no',
+                     'previous_tb': 'no'},
+    'covid19': {'symptoms': 'no', 'exposure': 'no', 'vaccination_status': 'fully_vaccinated',
+                'underlying_conditions': 'no', 'age_group': 'adult'},
+    'malaria': {'symptoms': 'no', 'travel_history': 'no', 'area_residence': 'yes', 'previous_malaria': 'no',
+                'prevention_measures': 'yes'},
+    'liver-problem': {'symptoms': 'no', 'alcohol_use': 'moderate', 'medications': 'no', 'family_history': 'no',
+                      'previous_liver_issues': 'no'},
+    'hepatitis-b': {'age': '30', 'vaccination_status': 'fully_vaccinated', 'exposure': 'no', 'symptoms': 'no',
+                    'risk_behaviors': 'no'},
+    'diabetes': {'age': '50', 'family_history': 'yes', 'symptoms': 'no', 'bmi_category': 'Overweight',
+                 'physical_activity': 'moderate', 'blood_pressure': 'no'},
+    'hydration': {'urine_color': 'light_yellow', 'thirst_level': 'normal', 'activity_level': 'moderate',
+                  'fluid_intake': 'adequate', 'symptoms': 'no'},
+}
+
+
+def measure(func, repeat):
+    """Per-call timing of func: best and median of `repeat` runs, in microseconds"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    # autorange stops at >= 0.2s; runs are kept at that length
+    runs = [seconds / number * 1e6 for seconds in timer.repeat(repeat=repeat, number=number)]
+    best = min(runs)
+    return {'best_us': round(best, 3), 'median_us': round(statistics.median(runs), 3),
+            'ops_per_sec': round(1e6 / best, 1), 'number': number, 'repeat': repeat}
+
+
+def bench_assess(health_app, repeat):
+    results = {}
+    for assessment_type, form in SAMPLE_FORMS.items():
+        assessment = health_app.ASSESSMENTS[assessment_type]
+        inputs = health_app.parse_inputs(assessment, form)
+        results[f'assess.{assessment_type}'] = measure(
+            lambda: health_app.score_inputs(assessment, inputs), repeat)
+
+    # A new blood pressure reading against a profile holding every assessment,
+    # and the same profile derived from scratch
+    graph = health_app.COMPOSITE_GRAPH
+    facts = {}
+    for assessment_type, form in SAMPLE_FORMS.items():
+        inputs = health_app.parse_inputs(health_app.ASSESSMENTS[assessment_type], form)
+        facts.update(health_app.submission_facts(assessment_type, inputs, '2024-01-01T00:00:00'))
+    profile = graph.evaluate(facts)
+    reading = health_app.submission_facts('cardiovascular', {'systolic': 150, 'diastolic': 95}, '2024-01-02T00:00:00')
+    results['composite.update'] = measure(lambda: graph.update(dict(profile), reading), repeat)
+    results['composite.full'] = measure(lambda: graph.evaluate(facts), repeat)
+    return results
+
+
+def bench_reports(health_app, repeat):
+    results = {}
+    for assessment_type, form in SAMPLE_FORMS.items():
+        assessment = health_app.ASSESSMENTS[assessment_type]
+        result = health_app.score_inputs(assessment, health_app.parse_inputs(assessment, form))
+        results[f'report.{assessment_type}'] = measure(
+            lambda: health_app.generate_medical_report(assessment_type, result), repeat)
+    # The memoized path /results renders reports through
+    results['report.memoized'] = measure(lambda: health_app.render_medical_report(assessment_type, result), repeat)
+    return results
+
+
+def bench_codec(health_app, repeat):
+    import codec
+    from flask.sessions import session_json_serializer
+
+    records = []
+    for assessment_type, form in SAMPLE_FORMS.items():
+        assessment = health_app.ASSESSMENTS[assessment_type]
+        inputs = health_app.parse_inputs(assessment, form)
+        result = health_app.score_inputs(assessment, inputs)
+        records.append((assessment_type, {'result': result, 'timestamp': datetime.now().isoformat(),
+                                          'category': health_app.result_category(assessment_type, result),
+                                          'site': 'default',
+                                          'rules_version': health_app.threshold_rules.current.version,
+                                          'inputs': inputs}))
+    serializers = {
+        'compact': (codec.encode_record, codec.decode_record),
+        'json': (lambda assessment_type, record: json.dumps(record), json.loads),
+        'session': (lambda assessment_type, record: session_json_serializer.dumps(record),
+                    session_json_serializer.loads),
+    }
+    results = {}
+    for name, (encode, decode) in serializers.items():
+        payloads = [encode(assessment_type, record) for assessment_type, record in records]
+        if [decode(payload) for payload in payloads] != [record for _, record in records]:
+            raise RuntimeError(f"{name} doesn't round-trip the sample records")
+        size = sum(len(payload) for payload in payloads)
+        results[f'codec.{name}.encode'] = dict(
+            measure(lambda: [encode(assessment_type, record) for assessment_type, record in records], repeat),
+            bytes=size)
+        results[f'codec.{name}.decode'] = dict(measure(lambda: [decode(payload) for payload in payloads], repeat),
+                                               bytes=size)
+    return results
+
+
+def _client_with_results(health_app, count):
+    client = health_app.app.test_client()
+    for assessment_type in list(SAMPLE_FORMS)[:count]:
+        client.post(f'/submit/{assessment_type}', data=SAMPLE_FORMS[assessment_type])
+    return client
+
+
+def _checked(response, status):
+    if response.status_code != status:
+        raise RuntimeError(f"{response.request.path}: expected {status}, got {response.status_code}")
+    return response
+
+
+def bench_routes(health_app, repeat):
+    results = {}
+    # Without cookies every submission starts a new session, so flashed messages
+    # don't pile up in one cookie over thousands of calls
+    client = health_app.app.test_client(use_cookies=False)
+    for assessment_type, form in SAMPLE_FORMS.items():
+        path = f'/submit/{assessment_type}'
+        _checked(client.post(path, data=form), 302)
+        results[f'route.submit.{assessment_type}'] = measure(lambda: client.post(path, data=form), repeat)
+
+    for count in RESULTS_PAGE_SIZES:
+        client = _client_with_results(health_app, count)
+        _checked(client.get('/results'), 200)
+        results[f'route.results.{count}'] = measure(lambda: client.get('/results'), repeat)
+
+    client = health_app.app.test_client()
+    _checked(client.get('/sample-results', follow_redirects=True), 200)
+    results['route.sample-results'] = measure(
+        lambda: client.get('/sample-results', follow_redirects=True), repeat)
+    return results
+
+
+def bench_http(args):
+    import loadtest
+
+    load_args = argparse.Namespace(workers=args.http_workers, duration=args.http_duration,
+                                   clients=args.http_clients, slow_clients=0, slow_interval=0.25,
+                                   client_processes=args.http_client_processes, port=args.http_port)
+    results = {}
+    for server in args.http_servers.split(','):
+        row = loadtest.benchmark(server.strip(), load_args)
+        name = f"http.{row.pop('server')}"
+        results[name] = {key: round(value, 3) if isinstance(value, float) else value
+                         for key, value in row.items()}
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short=12', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _headline(entry):
+    """(value, higher_is_better) used to compare two runs of a benchmark"""
+    if 'best_us' in entry:
+        return entry['best_us'], False
+    return entry['rps'], True
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Print the change of every benchmark present in both runs; returns the regressed names"""
+    regressed = []
+    print(f"\n{'benchmark':<36} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, entry in current['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            continue
+        old, higher_is_better = _headline(baseline['benchmarks'][name])
+        new, _ = _headline(entry)
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = ' !' if worse > threshold else ''
+        if flag:
+            regressed.append(name)
+        print(f"{name:<36} {old:>12.2f} {new:>12.2f} {change:>+7.1%}{flag}")
+    print(f"{len(regressed)} benchmark(s) more than {threshold:.0%} worse than {baseline.get('commit')}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--groups', default='assess,reports,codec,routes',
+                        help=f"comma-separated benchmark groups ({', '.join(GROUPS[:-1])})")
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per benchmark (best is kept)')
+    parser.add_argument('--store', choices=('sqlite', 'memory'), default='sqlite',
+                        help='result store used by the route benchmarks (default: temporary SQLite file)')
+    parser.add_argument('--http', action='store_true', help='also run the HTTP load generator')
+    parser.add_argument('--http-servers', default='gunicorn,uvicorn')
+    parser.add_argument('--http-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--http-clients', type=int, default=20)
+    parser.add_argument('--http-client-processes', type=int, default=1,
+                        help='processes generating HTTP load (clients are split between them)')
+    parser.add_argument('--http-duration', type=float, default=10)
+    parser.add_argument('--http-port', type=int, default=8765)
+    parser.add_argument('-o', '--output', help='JSON output path (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='earlier JSON output to compare against')
+    args = parser.parse_args()
+
+    groups = [group.strip() for group in args.groups.split(',') if group.strip()]
+    if args.http and 'http' not in groups:
+        groups.append('http')
+    unknown = [group for group in groups if group not in GROUPS]
+    if unknown:
+        parser.error(f"unknown group(s): {', '.join(unknown)}")
+
+    # The store backend is read when app is imported
+    scratch = tempfile.TemporaryDirectory()
+    os.environ['HEALTHPLUS_RESULT_STORE'] = args.store
+    os.environ['HEALTHPLUS_RESULT_DB'] = os.path.join(scratch.name, 'bench.db')
+    sys.path[:0] = [ROOT, os.path.dirname(os.path.abspath(__file__))]
+    import app as health_app
+
+    runners = {
+        'assess': lambda: bench_assess(health_app, args.repeat),
+        'reports': lambda: bench_reports(health_app, args.repeat),
+        'codec': lambda: bench_codec(health_app, args.repeat),
+        'routes': lambda: bench_routes(health_app, args.repeat),
+        'http': lambda: bench_http(args),
+    }
+    benchmarks = {}
+    for group in groups:
+        started = time.perf_counter()
+        benchmarks.update(runners[group]())
+        print(f"{group}: done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    scratch.cleanup()
+
+    commit = git_commit()
+    run = {
+        'commit': commit,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'store': args.store,
+        'benchmarks': benchmarks,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump(run, handle, indent=2)
+
+    for name, entry in benchmarks.items():
+        value, higher_is_better = _headline(entry)
+        print(f"{name:<36} {value:>12.2f} {'req/s' if higher_is_better else 'us/call'}")
+    print(f"wrote {output}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            compare(json.load(handle), run)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Build the self-hosted front-end assets into static/dist/.
+
+    npm install            # tailwindcss, Font Awesome and Inter (see package.json)
+    pip install fonttools brotli
+    python build_assets.py
+
+Produces, with content-hashed file names and a manifest.json that the app
+reads at startup:
+
+* app.css   - Tailwind compiled and purged against the templates (and the
+              report markup in app.py), minified, plus the Inter @font-face rules
+* icons.css - Font Awesome core styles with only the icons the templates use,
+              pointing at solid/regular webfonts subset to those glyphs
+* the Inter and Font Awesome woff2 files referenced by the two stylesheets
+
+Without a build (no manifest), base.html falls back to the public CDNs.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DIST_DIR = os.path.join(ROOT, 'static', 'dist')
+NODE_MODULES = os.path.join(ROOT, 'node_modules')
+FONT_AWESOME_DIR = os.path.join(NODE_MODULES, '@fortawesome', 'fontawesome-free')
+INTER_FILES_DIR = os.path.join(NODE_MODULES, '@fontsource', 'inter', 'files')
+
+# Sources scanned for icon class names
+ICON_SOURCES = ['templates', 'app.py']
+INTER_WEIGHTS = (300, 400, 500, 600, 700, 800)
+# Font Awesome styles in use: 'fas' (solid) and 'far' (regular); brands aren't used
+FONT_AWESOME_STYLES = {'solid': 'fa-solid-900', 'regular': 'fa-regular-400'}
+
+ICON_CLASS = re.compile(r'\bfa-([a-z0-9]+(?:-[a-z0-9]+)*)')
+ICON_SELECTOR = re.compile(r'^\.fa-([a-z0-9-]+)::?before$')
+ICON_CONTENT = re.compile(r'content:\s*"\\([0-9a-fA-F]+)"')
+
+
+def _hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _write_asset(manifest, name, data):
+    """Write data under a content-hashed name and record it in the manifest"""
+    hashed = _hashed_name(name, data)
+    with open(os.path.join(DIST_DIR, hashed), 'wb') as handle:
+        handle.write(data)
+    manifest[name] = f'dist/{hashed}'
+    return hashed
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as handle:
+        return handle.read()
+
+
+def used_icon_names():
+    """Every fa-* class name that appears in the templates and app.py"""
+    names = set()
+    for source in ICON_SOURCES:
+        path = os.path.join(ROOT, source)
+        paths = [path] if os.path.isfile(path) else [
+            os.path.join(directory, filename)
+            for directory, _, filenames in os.walk(path)
+            for filename in filenames if filename.endswith('.html')
+        ]
+        for filename in paths:
+            names.update(ICON_CLASS.findall(_read(filename)))
+    return names
+
+
+def css_blocks(css):
+    """Split a stylesheet into top-level (prelude, body) blocks"""
+    blocks = []
+    depth = 0
+    start = 0
+    prelude = None
+    for index, char in enumerate(css):
+        if char == '{':
+            if depth == 0:
+                prelude = css[start:index].strip()
+                body_start = index + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[body_start:index].strip()))
+                start = index + 1
+    return blocks
+
+
+def subset_icon_css(css, used_names):
+    """Drop icon rules for icons that aren't used; keep core and utility rules.
+
+    Returns the reduced stylesheet and the set of codepoints still referenced.
+    """
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    kept = []
+    codepoints = set()
+    for prelude, body in css_blocks(css):
+        selectors = [selector.strip() for selector in prelude.split(',')]
+        icon_names = [ICON_SELECTOR.match(selector) for selector in selectors]
+        if prelude.startswith('@') or not all(icon_names):
+            kept.append(f'{prelude}{{{body}}}')
+            continue
+        selectors = [selector for selector, match in zip(selectors, icon_names)
+                     if match.group(1) in used_names]
+        if not selectors:
+            continue
+        content = ICON_CONTENT.search(body)
+        if content:
+            codepoints.add(int(content.group(1), 16))
+        kept.append(f'{",".join(selectors)}{{{body}}}')
+    return '\n'.join(kept), codepoints
+
+
+def subset_font(path, codepoints):
+    """woff2 bytes of a font reduced to the given codepoints"""
+    from fontTools import subset
+
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    font = subset.load_font(path, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=sorted(codepoints))
+    subsetter.subset(font)
+    output = os.path.join(DIST_DIR, '.subset.woff2')
+    subset.save_font(font, output, options)
+    with open(output, 'rb') as handle:
+        data = handle.read()
+    os.remove(output)
+    return data
+
+
+def build_icons(manifest):
+    used = used_icon_names()
+    core_css, codepoints = subset_icon_css(_read(os.path.join(FONT_AWESOME_DIR, 'css', 'fontawesome.css')), used)
+    style_css = []
+    for style, font_name in FONT_AWESOME_STYLES.items():
+        font_path = os.path.join(FONT_AWESOME_DIR, 'webfonts', f'{font_name}.ttf')
+        hashed = _write_asset(manifest, f'{font_name}.woff2', subset_font(font_path, codepoints))
+        css = _read(os.path.join(FONT_AWESOME_DIR, 'css', f'{style}.css'))
+        # Point the @font-face at the subset woff2 only
+        css = re.sub(r'src:[^;]*;', f'src:url("{hashed}") format("woff2");', css)
+        style_css.append(css)
+    stylesheet = core_css + '\n' + '\n'.join(style_css)
+    _write_asset(manifest, 'icons.css', _minify(stylesheet).encode('utf-8'))
+    print(f"icons.css: {len(codepoints)} glyphs for {len(used)} icon classes")
+
+
+def inter_font_faces(manifest):
+    rules = []
+    for weight in INTER_WEIGHTS:
+        path = os.path.join(INTER_FILES_DIR, f'inter-latin-{weight}-normal.woff2')
+        with open(path, 'rb') as handle:
+            hashed = _write_asset(manifest, f'inter-{weight}.woff2', handle.read())
+        rules.append(
+            '@font-face{font-family:"Inter";font-style:normal;font-display:swap;'
+            f'font-weight:{weight};src:url("{hashed}") format("woff2")}}'
+        )
+    return '\n'.join(rules)
+
+
+def build_stylesheet(manifest):
+    tailwind = shutil.which('tailwindcss', path=os.path.join(NODE_MODULES, '.bin')) or shutil.which('tailwindcss')
+    if tailwind is None:
+        sys.exit("tailwindcss not found - run `npm install` first")
+    compiled = subprocess.run(
+        [tailwind, '-c', 'tailwind.config.js', '-i', os.path.join('assets', 'app.css'), '--minify'],
+        cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    stylesheet = inter_font_faces(manifest) + '\n' + compiled
+    _write_asset(manifest, 'app.css', stylesheet.encode('utf-8'))
+    print(f"app.css: {len(stylesheet)} bytes")
+
+
+def _minify(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    return re.sub(r'\s*([{};,])\s*', r'\1', css).strip()
+
+
+def main():
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+    manifest = {}
+    build_icons(manifest)
+    build_stylesheet(manifest)
+    with open(os.path.join(DIST_DIR, 'manifest.json'), 'w') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    print(f"wrote {len(manifest)} assets to {os.path.relpath(DIST_DIR, ROOT)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,474 @@
+"""Compact binary encoding of stored assessment records.
+
+A record stored as JSON repeats its field names, its category and
+recommendation sentences, and an ISO timestamp, every time. The compact form
+is a version byte followed by:
+
+* the assessment code, which fixes the order of the input and result fields,
+* a flags byte saying which optional parts follow,
+* the timestamp as integer microseconds since the epoch,
+* the category, site, threshold rule version, submitted input and result
+  values, each a tagged varint: small integers, decimals, booleans and
+  indexes into LABELS fit in one or two bytes.
+
+Strings that are not in LABELS, inputs and results that don't match their
+schema and unknown record keys are still stored, just less compactly. Records the format
+can't hold at all (unknown assessment types, non-scalar values) stay JSON, and
+``decode_record`` reads both.
+"""
+import json
+import math
+import struct
+from datetime import datetime, timedelta
+
+FORMAT_VERSION = 1
+
+# Codes and label indexes are stored in every payload: both tables are
+# append-only. Add entries at the end; never reorder, rename or remove them.
+# A result whose fields change needs a new schema entry under a new name.
+SCHEMAS = (
+    ('bmi', ('value', 'category')),
+    ('cardiovascular', ('status', 'risk')),
+    ('stroke-risk', ('score', 'risk')),
+    ('metabolic', ('factors', 'status')),
+    ('respiratory', ('status', 'spo2')),
+    ('fitness', ('status', 'hr_zone')),
+    ('body-composition', ('status', 'percentage')),
+    ('posture', ('status', 'score')),
+    ('mental-health', ('severity', 'score', 'recommendation')),
+    ('temperature', ('status', 'temperature')),
+    ('grip-strength', ('status', 'strength')),
+    ('lifestyle', ('status', 'risk_score')),
+    ('vision', ('status', 'acuity')),
+    ('hearing', ('status', 'normal_frequencies')),
+    ('prostate', ('risk_score', 'risk', 'recommendation')),
+    ('hiv', ('risk_score', 'risk', 'recommendation')),
+    ('pregnancy', ('trimester', 'weeks', 'status', 'risk', 'risk_factors', 'recommendation')),
+    ('breast-cancer', ('risk_score', 'risk', 'recommendation')),
+    ('tuberculosis', ('risk_score', 'risk', 'recommendation')),
+    ('covid19', ('risk_score', 'risk', 'recommendation')),
+    ('malaria', ('risk_score', 'risk', 'recommendation')),
+    ('liver-problem', ('risk_score', 'risk', 'recommendation')),
+    ('hepatitis-b', ('risk_score', 'risk', 'recommendation')),
+    ('diabetes', ('risk_score', 'risk', 'recommendation')),
+    ('hydration', ('status', 'hydration_score', 'recommendation')),
+)
+
+LABELS = (
+    'default',
+    'Underweight',
+    'Normal weight',
+    'Overweight',
+    'Obese',
+    'Normal',
+    'Low',
+    'Elevated',
+    'Medium',
+    'Stage 1 Hypertension',
+    'Medium-High',
+    'Stage 2 Hypertension',
+    'High',
+    'Healthy',
+    'At Risk',
+    'Metabolic Syndrome Risk',
+    'Mild Hypoxemia',
+    'Severe Hypoxemia - Seek Medical Attention',
+    'Athlete Level',
+    'Excellent',
+    'Good',
+    'Average',
+    'Below Average',
+    'Essential Fat',
+    'Athletes',
+    'Fitness',
+    'Excellent Posture',
+    'Good Posture',
+    'Fair - Needs Improvement',
+    'Poor - Consult Professional',
+    'Minimal or None',
+    'Continue monitoring',
+    'Mild',
+    'Consider self-care strategies',
+    'Moderate',
+    'Consider professional consultation',
+    'Moderately Severe',
+    'Seek professional help',
+    'Severe',
+    'Immediate professional consultation recommended',
+    'Hypothermia Risk',
+    'Low-Grade Fever',
+    'Fever - Seek Medical Attention',
+    'Low Risk Lifestyle',
+    'Moderate Risk Lifestyle',
+    'High Risk Lifestyle',
+    'Normal Vision (20/20)',
+    'Mild Vision Impairment',
+    'Moderate Vision Impairment',
+    'Severe Vision Impairment - Consult Eye Care Professional',
+    'Normal Hearing',
+    'Mild Hearing Loss',
+    'Moderate Hearing Loss',
+    'Significant Hearing Loss - Consult Audiologist',
+    'High Risk',
+    'Immediate consultation with urologist recommended',
+    'Moderate Risk',
+    'Regular screening and consultation with healthcare provider recommended',
+    'Low Risk',
+    'Continue regular health check-ups and screening as per guidelines',
+    'Immediate HIV testing recommended. Consider PEP if exposure within 72 hours',
+    'HIV testing recommended. Practice safe behaviors and consider PrEP',
+    'Regular HIV testing as per guidelines. Continue safe practices',
+    'Normal Pregnancy',
+    'First Trimester',
+    'High Risk Pregnancy',
+    'Close monitoring by obstetrician required. Follow-up appointments essential',
+    'Second Trimester',
+    'Third Trimester',
+    'Monitor Blood Pressure',
+    'Regular prenatal care and monitoring recommended',
+    'Continue routine prenatal care and healthy pregnancy practices',
+    'Consultation with breast specialist and genetic counseling recommended. Enhanced screening may be indicated',
+    'Regular mammography and clinical breast exams. Discuss screening schedule with healthcare provider',
+    'Continue routine breast cancer screening as per age-appropriate guidelines',
+    'Immediate medical evaluation recommended. TB testing (skin test or blood test) and chest X-ray may be indicated',
+    'Consult with healthcare provider for TB screening. Monitor symptoms closely',
+    'Continue routine health monitoring. Be aware of TB symptoms and risk factors',
+    'Consider COVID-19 testing. Isolate and monitor symptoms. Seek medical attention if symptoms worsen or if you have difficulty breathing',
+    'Monitor symptoms closely. Consider COVID-19 testing. Practice isolation if symptomatic',
+    'Continue preventive measures (hand hygiene, mask-wearing in crowded places). Stay up to date with vaccinations',
+    'Immediate medical evaluation and malaria testing (blood smear or rapid diagnostic test) recommended. Early treatment is crucial',
+    'Consult with healthcare provider for malaria testing if symptomatic. Use preventive measures if in endemic areas',
+    'Continue preventive measures if in or traveling to endemic areas. Be aware of symptoms',
+    'Immediate medical evaluation recommended. Liver function tests and imaging may be indicated',
+    'Consult with healthcare provider. Liver function tests may be recommended',
+    'Maintain healthy lifestyle. Limit alcohol consumption. Regular health check-ups recommended',
+    'Hepatitis B testing recommended. If not vaccinated, consider vaccination. Post-exposure prophylaxis may be needed if recent exposure',
+    'Hepatitis B testing and vaccination recommended. Practice safe behaviors',
+    'Continue preventive measures. Ensure vaccination is up to date. Regular screening as per guidelines',
+    'Diabetes screening (fasting blood glucose, HbA1c) strongly recommended. Consult with healthcare provider for comprehensive evaluation',
+    'Diabetes screening recommended. Lifestyle modifications including diet and exercise may help reduce risk',
+    'Continue healthy lifestyle. Regular screening as per age-appropriate guidelines (typically every 3 years after age 45)',
+    'Well Hydrated',
+    'Continue maintaining adequate fluid intake. Aim for 8-10 glasses of water daily, more if active',
+    'Mildly Dehydrated',
+    'Increase fluid intake. Drink water regularly throughout the day. Monitor urine color and thirst',
+    'Dehydrated',
+    'Increase fluid intake immediately. Drink water, electrolyte solutions if needed. Seek medical attention if symptoms are severe',
+    # Choices offered by the assessment forms' text inputs
+    'male',
+    'female',
+    'never',
+    'former',
+    'current',
+    'none',
+    'second_degree',
+    'first_degree',
+    'normal',
+    'high',
+    'unknown',
+    'fully_vaccinated',
+    'partially_vaccinated',
+    'not_vaccinated',
+    'child',
+    'adult',
+    'elderly',
+    'moderate',
+    'heavy',
+    'low',
+    'pale',
+    'light_yellow',
+    'dark',
+    'not_thirsty',
+    'thirsty',
+    'very_thirsty',
+    'adequate',
+)
+
+# Submitted inputs of each assessment and their value types, in form order.
+# Stored payloads list input values in this order, so it's append-only per
+# assessment too: new fields go at the end; never reorder, rename or remove one.
+INPUT_SCHEMAS = {
+    'bmi': (('weight', float), ('height', float)),
+    'cardiovascular': (('systolic', int), ('diastolic', int)),
+    'stroke-risk': (('age', int), ('systolic', int), ('smoking', bool), ('diabetes', bool), ('heart_disease', bool)),
+    'metabolic': (('waist', float), ('gender', str), ('systolic', int)),
+    'respiratory': (('spo2', int),),
+    'fitness': (('resting_hr', int), ('age', int)),
+    'body-composition': (('bf_percentage', float), ('gender', str), ('age', int)),
+    'posture': (('alignment', int), ('balance', int)),
+    'mental-health': tuple((f'q{i}', int) for i in range(1, 10)),
+    'temperature': (('temperature', float),),
+    'grip-strength': (('grip_strength', float), ('gender', str), ('age', int)),
+    'lifestyle': (('smoking_status', str), ('physical_activity', int)),
+    'vision': (('acuity', float),),
+    'hearing': tuple((f'freq_{frequency}', int) for frequency in ('250', '500', '1000', '2000', '4000')),
+    'prostate': (('age', int), ('family_history', bool), ('psa_level', float), ('symptoms', bool)),
+    'hiv': (('age', int), ('risk_behaviors', bool), ('symptoms', bool), ('recent_exposure', bool)),
+    'pregnancy': (('weeks_pregnant', int), ('systolic', int), ('diastolic', int), ('symptoms', bool),
+                  ('previous_complications', bool)),
+    'breast-cancer': (('age', int), ('family_history', str), ('genetic_factors', bool), ('previous_biopsy', bool),
+                      ('breast_density', str), ('hormonal_factors', bool)),
+    'tuberculosis': (('age', int), ('symptoms', bool), ('exposure', bool), ('immunocompromised', bool),
+                     ('previous_tb', bool)),
+    'covid19': (('symptoms', bool), ('exposure', bool), ('vaccination_status', str), ('underlying_conditions', bool),
+                ('age_group', str)),
+    'malaria': (('symptoms', bool), ('travel_history', bool), ('area_residence', bool), ('previous_malaria', bool),
+                ('prevention_measures', bool)),
+    'liver-problem': (('symptoms', bool), ('alcohol_use', str), ('medications', bool), ('family_history', bool),
+                      ('previous_liver_issues', bool)),
+    'hepatitis-b': (('age', int), ('vaccination_status', str), ('exposure', bool), ('symptoms', bool),
+                    ('risk_behaviors', bool)),
+    'diabetes': (('age', int), ('family_history', bool), ('symptoms', bool), ('bmi_category', str),
+                 ('physical_activity', str), ('blood_pressure', bool)),
+    'hydration': (('urine_color', str), ('thirst_level', str), ('activity_level', str), ('fluid_intake', str),
+                  ('symptoms', bool)),
+}
+
+ASSESSMENT_CODES = {name: code for code, (name, _) in enumerate(SCHEMAS)}
+LABEL_INDEXES = {label: index for index, label in enumerate(LABELS)}
+INPUT_NAMES = {name: tuple(field for field, _ in fields) for name, fields in INPUT_SCHEMAS.items()}
+
+# Flags: which optional parts of a record follow the assessment code
+HAS_TIMESTAMP = 1      # microseconds since the epoch
+TEXT_TIMESTAMP = 2     # a timestamp that doesn't survive the integer form, kept as text
+HAS_CATEGORY = 4
+HAS_SITE = 8
+KEYED_RESULT = 16      # result fields as (name, value) pairs instead of schema order
+HAS_EXTRA = 32         # other record keys, as JSON text
+HAS_RULES_VERSION = 64
+HAS_INPUTS = 128       # submitted inputs: in INPUT_SCHEMAS order, or as (name, value) pairs
+
+# Value tags, in the low three bits of each value's varint
+NONE, FALSE, TRUE, INT, DECIMAL, FLOAT, LABEL, TEXT = range(8)
+# Decimal places tried before a float is stored as 8 raw bytes
+MAX_DECIMAL_PLACES = 3
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+RECORD_KEYS = ('result', 'timestamp', 'category', 'site', 'rules_version', 'inputs')
+DOUBLE = struct.Struct('<d')
+
+
+class Unencodable(ValueError):
+    """A record the compact format can't hold"""
+
+
+def _write_varint(out, value):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def _write_text(out, text):
+    encoded = text.encode('utf-8')
+    _write_varint(out, len(encoded) << 3 | TEXT)
+    out += encoded
+
+
+def _write_value(out, value):
+    if value is None:
+        out.append(NONE)
+    elif value is True:
+        out.append(TRUE)
+    elif value is False:
+        out.append(FALSE)
+    elif type(value) is int:
+        _write_varint(out, _zigzag(value) << 3 | INT)
+    elif type(value) is float:
+        if math.isfinite(value):
+            for places in range(MAX_DECIMAL_PLACES + 1):
+                scaled = round(value * 10 ** places)
+                if scaled / 10 ** places == value:
+                    _write_varint(out, (_zigzag(scaled) << 2 | places) << 3 | DECIMAL)
+                    return
+        out.append(FLOAT)
+        out += DOUBLE.pack(value)
+    elif type(value) is str:
+        index = LABEL_INDEXES.get(value)
+        if index is None:
+            _write_text(out, value)
+        else:
+            _write_varint(out, index << 3 | LABEL)
+    else:
+        raise Unencodable(f"Can't encode {type(value).__name__} values")
+
+
+def _read_value(data, pos):
+    word, pos = _read_varint(data, pos)
+    tag = word & 7
+    word >>= 3
+    if tag == LABEL:
+        return LABELS[word], pos
+    if tag == INT:
+        return _unzigzag(word), pos
+    if tag == DECIMAL:
+        return _unzigzag(word >> 2) / 10 ** (word & 3), pos
+    if tag == TEXT:
+        end = pos + word
+        return data[pos:end].decode('utf-8'), end
+    if tag == FLOAT:
+        return DOUBLE.unpack_from(data, pos)[0], pos + DOUBLE.size
+    return (None, False, True)[tag], pos
+
+
+def _write_inputs(out, assessment_type, inputs):
+    # Header: value count << 1, plus 1 when the values are keyed rather than in schema order.
+    # Schema-order payloads may hold fewer values than the schema, so fields can be appended.
+    if not isinstance(inputs, dict):
+        raise Unencodable("Inputs must be a dict")
+    names = tuple(inputs)
+    if names == INPUT_NAMES.get(assessment_type, ())[:len(names)]:
+        _write_varint(out, len(names) << 1)
+        for value in inputs.values():
+            _write_value(out, value)
+    else:
+        _write_varint(out, len(names) << 1 | 1)
+        for name, value in inputs.items():
+            _write_value(out, name)
+            _write_value(out, value)
+
+
+def _read_inputs(data, pos, assessment_type):
+    header, pos = _read_varint(data, pos)
+    inputs = {}
+    if header & 1:
+        for _ in range(header >> 1):
+            name, pos = _read_value(data, pos)
+            inputs[name], pos = _read_value(data, pos)
+    else:
+        for name in INPUT_NAMES[assessment_type][:header >> 1]:
+            inputs[name], pos = _read_value(data, pos)
+    return inputs, pos
+
+
+def _encode(assessment_type, record):
+    code = ASSESSMENT_CODES.get(assessment_type)
+    result = record.get('result')
+    if code is None or not isinstance(result, dict):
+        raise Unencodable(f"No compact form for {assessment_type!r} records")
+    out = bytearray((FORMAT_VERSION,))
+    _write_varint(out, code)
+    flags_at = len(out)
+    out.append(0)
+    flags = 0
+
+    timestamp = record.get('timestamp')
+    if timestamp is not None:
+        moment = datetime.fromisoformat(timestamp) if isinstance(timestamp, str) else None
+        if moment is not None and moment.tzinfo is None and moment.isoformat() == timestamp:
+            flags |= HAS_TIMESTAMP
+            _write_varint(out, _zigzag((moment - EPOCH) // ONE_MICROSECOND))
+        else:
+            flags |= HAS_TIMESTAMP | TEXT_TIMESTAMP
+            _write_value(out, timestamp)
+    if 'category' in record:
+        flags |= HAS_CATEGORY
+        _write_value(out, record['category'])
+    if 'site' in record:
+        flags |= HAS_SITE
+        _write_value(out, record['site'])
+    if 'rules_version' in record:
+        flags |= HAS_RULES_VERSION
+        _write_value(out, record['rules_version'])
+    if 'inputs' in record:
+        flags |= HAS_INPUTS
+        _write_inputs(out, assessment_type, record['inputs'])
+
+    fields = SCHEMAS[code][1]
+    if tuple(result) == fields:
+        for value in result.values():
+            _write_value(out, value)
+    else:
+        flags |= KEYED_RESULT
+        _write_varint(out, len(result))
+        for name, value in result.items():
+            _write_value(out, name)
+            _write_value(out, value)
+
+    extra = {key: value for key, value in record.items() if key not in RECORD_KEYS}
+    if extra:
+        flags |= HAS_EXTRA
+        _write_text(out, json.dumps(extra, separators=(',', ':')))
+    out[flags_at] = flags
+    return bytes(out)
+
+
+def encode_record(assessment_type, record):
+    """Compact bytes for a stored record, or JSON text when the compact form can't hold it"""
+    try:
+        return _encode(assessment_type, record)
+    except (Unencodable, TypeError, ValueError):
+        return json.dumps(record)
+
+
+def decode_record(payload):
+    """The record stored as ``payload``, either compact bytes or JSON text"""
+    if isinstance(payload, str):
+        return json.loads(payload)
+    if payload[0] != FORMAT_VERSION:
+        raise ValueError(f"Unknown record format {payload[0]}")
+    code, pos = _read_varint(payload, 1)
+    flags = payload[pos]
+    pos += 1
+    record = {}
+    if flags & HAS_TIMESTAMP:
+        if flags & TEXT_TIMESTAMP:
+            timestamp, pos = _read_value(payload, pos)
+        else:
+            micros, pos = _read_varint(payload, pos)
+            timestamp = (EPOCH + _unzigzag(micros) * ONE_MICROSECOND).isoformat()
+    if flags & HAS_CATEGORY:
+        category, pos = _read_value(payload, pos)
+    if flags & HAS_SITE:
+        site, pos = _read_value(payload, pos)
+    if flags & HAS_RULES_VERSION:
+        rules_version, pos = _read_value(payload, pos)
+    if flags & HAS_INPUTS:
+        inputs, pos = _read_inputs(payload, pos, SCHEMAS[code][0])
+
+    result = {}
+    if flags & KEYED_RESULT:
+        count, pos = _read_varint(payload, pos)
+        for _ in range(count):
+            name, pos = _read_value(payload, pos)
+            result[name], pos = _read_value(payload, pos)
+    else:
+        for name in SCHEMAS[code][1]:
+            result[name], pos = _read_value(payload, pos)
+
+    # Keys in the order submit_assessment writes them, as the JSON form kept them
+    record['result'] = result
+    if flags & HAS_TIMESTAMP:
+        record['timestamp'] = timestamp
+    if flags & HAS_CATEGORY:
+        record['category'] = category
+    if flags & HAS_SITE:
+        record['site'] = site
+    if flags & HAS_RULES_VERSION:
+        record['rules_version'] = rules_version
+    if flags & HAS_INPUTS:
+        record['inputs'] = inputs
+    if flags & HAS_EXTRA:
+        extra, pos = _read_value(payload, pos)
+        record.update(json.loads(extra))
+    return record
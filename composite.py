@@ -0,0 +1,91 @@
+"""Derivation graph for values computed from other values.
+
+A graph is a set of named nodes, each computed from named inputs that are
+either facts (submitted values) or other nodes. ``DerivationGraph.update``
+merges new facts into a stored set of values and recomputes only the nodes
+downstream of what actually changed, in dependency order, stopping wherever a
+recomputed node comes out the same as before.
+"""
+from collections import namedtuple
+
+# compute(*input values) -> value, or None when the node can't be derived; missing inputs are passed as None
+Node = namedtuple('Node', ['name', 'inputs', 'compute'])
+
+
+class DerivationGraph:
+    """Nodes in dependency order, with the reverse edges needed to find what a change affects"""
+
+    def __init__(self, nodes):
+        self.nodes = {}
+        for node in nodes:
+            if node.name in self.nodes:
+                raise ValueError(f"Duplicate node: {node.name}")
+            self.nodes[node.name] = node
+        self._dependents = {}
+        for node in self.nodes.values():
+            for name in node.inputs:
+                self._dependents.setdefault(name, []).append(node.name)
+        self._order = {name: index for index, name in enumerate(self._sorted())}
+
+    def _sorted(self):
+        """Node names with every node after the nodes it reads; raises ValueError on a cycle"""
+        pending = {name: sum(1 for name in node.inputs if name in self.nodes) for name, node in self.nodes.items()}
+        ready = [name for name, count in pending.items() if not count]
+        order = []
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for dependent in self._dependents.get(name, ()):
+                pending[dependent] -= 1
+                if not pending[dependent]:
+                    ready.append(dependent)
+        if len(order) != len(self.nodes):
+            raise ValueError(f"Cycle between nodes: {', '.join(sorted(set(self.nodes) - set(order)))}")
+        return order
+
+    def affected(self, names):
+        """Nodes downstream of the given facts or nodes, in evaluation order"""
+        seen = set()
+        stack = list(names)
+        while stack:
+            for dependent in self._dependents.get(stack.pop(), ()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    stack.append(dependent)
+        return sorted(seen, key=self._order.__getitem__)
+
+    def update(self, values, facts):
+        """Merge facts into values and bring the nodes that depend on them up to date, in place.
+
+        None means "unknown": a None fact removes a stored one (an optional
+        input left blank), and nodes that come out None are removed. Returns
+        the names of the nodes that were recomputed.
+        """
+        changed = set()
+        for name, value in facts.items():
+            if value is None:
+                if values.pop(name, None) is not None:
+                    changed.add(name)
+            elif values.get(name) != value:
+                values[name] = value
+                changed.add(name)
+        recomputed = []
+        for name in self.affected(changed):
+            node = self.nodes[name]
+            if changed.isdisjoint(node.inputs):
+                continue  # whatever it depends on was recomputed to the same value
+            recomputed.append(name)
+            value = node.compute(*[values.get(input_name) for input_name in node.inputs])
+            if value != values.get(name):
+                changed.add(name)
+                if value is None:
+                    values.pop(name, None)
+                else:
+                    values[name] = value
+        return recomputed
+
+    def evaluate(self, facts):
+        """Every node that can be derived from facts alone"""
+        values = {}
+        self.update(values, facts)
+        return values
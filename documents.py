@@ -0,0 +1,81 @@
+"""Downloadable report documents, cached by a hash of their content.
+
+Building a printable report (and especially a PDF) costs far more than
+serving one, and the same result set tends to be downloaded more than once.
+Documents are keyed by a hash of everything they are built from and built on
+a small worker pool: request threads only wait for a build, identical
+concurrent requests share one build, and repeats are served from memory.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import weasyprint
+except (ImportError, OSError):  # optional; OSError when its system libraries (pango) are missing
+    weasyprint = None
+
+# A built document; etag is the content key it was built from
+Document = namedtuple('Document', ['body', 'mimetype', 'etag'])
+
+
+def content_key(*parts):
+    """Stable hash of JSON-serializable document inputs"""
+    encoded = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+def html_to_pdf(html):
+    """PDF bytes for a self-contained HTML document (needs weasyprint)"""
+    if weasyprint is None:
+        raise RuntimeError("PDF output needs weasyprint: pip install weasyprint")
+    return weasyprint.HTML(string=html).write_pdf()
+
+
+class DocumentCache:
+    """LRU of built documents bounded by total size, filled by a worker pool"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, workers=2):
+        self.max_bytes = max_bytes
+        self._documents = OrderedDict()
+        self._size = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='documents')
+
+    def get(self, key, build, timeout=None):
+        """The document for key, building it on the pool with build() if needed.
+
+        Raises concurrent.futures.TimeoutError if the build takes longer than
+        timeout seconds; it keeps running and is cached when done.
+        """
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+                return document
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = self._executor.submit(self._build, key, build)
+        return future.result(timeout)
+
+    def _build(self, key, build):
+        try:
+            document = build()
+            with self._lock:
+                self._documents[key] = document
+                self._size += len(document.body)
+                while self._size > self.max_bytes and len(self._documents) > 1:
+                    _, evicted = self._documents.popitem(last=False)
+                    self._size -= len(evicted.body)
+            return document
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self._size = 0
@@ -0,0 +1,274 @@
+"""Command-line tools for Health Plus.
+
+    python -m healthplus score input.csv --assessments bmi,cardiovascular,diabetes -o out.parquet
+    python -m healthplus backfill-analytics --db health_plus.db --workers 4
+    python -m healthplus rescore --db health_plus.db --workers 2 --max-rate 2000
+
+``score`` streams a CSV or Parquet file in chunks, runs the selected
+assessments on every row and writes the input columns plus one column per
+result field (``<assessment>.<field>``) and a ``<assessment>.error`` column.
+Input columns use the same names as the assessment form fields. Chunks are
+scored in a process pool, and only a bounded number of chunks are in flight, so
+memory use doesn't depend on the input size.
+
+``backfill-analytics`` rebuilds the population analytics rollups of a SQLite
+result database from its stored history, counting id ranges in parallel.
+
+``rescore`` re-scores the stored history of a SQLite result database with the
+threshold rules in force, storing the new outcomes next to the originals. Runs
+are resumable: rerunning the command continues from the last stored chunk.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# The CLI never needs the web app's result database
+os.environ.setdefault('HEALTHPLUS_RESULT_STORE', 'memory')
+
+import analytics  # noqa: E402
+import app as health_app  # noqa: E402
+import rescore  # noqa: E402
+from result_store import SQLiteResultStore  # noqa: E402
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+
+
+def _is_parquet(path):
+    return path.lower().endswith(PARQUET_SUFFIXES)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        sys.exit("Parquet input/output needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def read_chunks(path, chunk_size):
+    """Yield (columns, rows) where rows is a list of at most chunk_size dicts"""
+    if _is_parquet(path):
+        pyarrow = _require_pyarrow()
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        columns = parquet_file.schema_arrow.names
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield columns, batch.to_pylist()
+        return
+
+    with open(path, newline='') as handle:
+        reader = csv.DictReader(handle)
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield reader.fieldnames, chunk
+                chunk = []
+        if chunk:
+            yield reader.fieldnames, chunk
+
+
+def result_columns(assessment_types):
+    """Output column names and value types appended to every input row"""
+    columns = []
+    for assessment_type in assessment_types:
+        for field, value_type in health_app.RESULT_FIELDS[assessment_type]:
+            columns.append((f'{assessment_type}.{field}', value_type))
+        columns.append((f'{assessment_type}.error', str))
+    return columns
+
+
+def score_row(row, assessment_types):
+    """Score one input row for each requested assessment"""
+    # Blank cells count as missing, like an unanswered form field
+    inputs = {name: value for name, value in row.items() if value is not None and value != ''}
+    scored = dict(row)
+    for assessment_type in assessment_types:
+        outcome = health_app.score_batch_record({'assessment_type': assessment_type, 'inputs': inputs})
+        result = outcome.get('result') or {}
+        for field, _ in health_app.RESULT_FIELDS[assessment_type]:
+            scored[f'{assessment_type}.{field}'] = result.get(field)
+        scored[f'{assessment_type}.error'] = outcome.get('error')
+    return scored
+
+
+def score_chunk(rows, assessment_types):
+    return [score_row(row, assessment_types) for row in rows]
+
+
+def _scored_chunks(chunks, assessment_types, workers):
+    """Score chunks in order, keeping at most 2 * workers chunks in flight"""
+    if workers <= 1:
+        for columns, rows in chunks:
+            yield columns, score_chunk(rows, assessment_types)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for columns, rows in chunks:
+            pending.append((columns, pool.submit(score_chunk, rows, assessment_types)))
+            if len(pending) >= 2 * workers:
+                columns, future = pending.pop(0)
+                yield columns, future.result()
+        for columns, future in pending:
+            yield columns, future.result()
+
+
+class CSVResultWriter:
+    def __init__(self, path, extra_columns):
+        self.handle = sys.stdout if path == '-' else open(path, 'w', newline='')
+        self.extra_columns = extra_columns
+        self.writer = None
+
+    def write(self, input_columns, rows):
+        if self.writer is None:
+            fieldnames = list(input_columns) + [name for name, _ in self.extra_columns]
+            self.writer = csv.DictWriter(self.handle, fieldnames=fieldnames, extrasaction='ignore')
+            self.writer.writeheader()
+        self.writer.writerows(rows)
+
+    def close(self):
+        if self.handle is not sys.stdout:
+            self.handle.close()
+
+
+class ParquetResultWriter:
+    ARROW_TYPES = {int: 'int64', float: 'float64', str: 'string'}
+
+    def __init__(self, path, input_path, extra_columns):
+        self.pyarrow = _require_pyarrow()
+        self.path = path
+        self.input_path = input_path
+        self.extra_columns = extra_columns
+        self.writer = None
+        self.schema = None
+
+    def _input_fields(self, input_columns):
+        pa = self.pyarrow
+        if _is_parquet(self.input_path):
+            return list(pa.parquet.read_schema(self.input_path))
+        return [pa.field(name, pa.string()) for name in input_columns]
+
+    def write(self, input_columns, rows):
+        pa = self.pyarrow
+        if self.writer is None:
+            # Columns get fixed types up front so an all-null first chunk doesn't decide the schema
+            fields = self._input_fields(input_columns)
+            fields += [pa.field(name, getattr(pa, self.ARROW_TYPES[value_type])())
+                       for name, value_type in self.extra_columns]
+            self.schema = pa.schema(fields)
+            self.writer = pa.parquet.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def score_command(args):
+    assessment_types = [name.strip() for name in args.assessments.split(',') if name.strip()]
+    unknown = [name for name in assessment_types if name not in health_app.ASSESSMENTS]
+    if unknown:
+        sys.exit(f"Unknown assessment type(s): {', '.join(unknown)}")
+
+    extra_columns = result_columns(assessment_types)
+    if _is_parquet(args.output):
+        writer = ParquetResultWriter(args.output, args.input, extra_columns)
+    else:
+        writer = CSVResultWriter(args.output, extra_columns)
+
+    total = 0
+    failed = 0
+    error_columns = [f'{assessment_type}.error' for assessment_type in assessment_types]
+    try:
+        chunks = read_chunks(args.input, args.chunk_size)
+        for input_columns, rows in _scored_chunks(chunks, assessment_types, args.workers):
+            writer.write(input_columns, rows)
+            total += len(rows)
+            # Rows that can't be scored keep their error in the output instead of stopping the run
+            failed += sum(1 for row in rows if any(row[column] for column in error_columns))
+            if args.output != '-':
+                print(f"scored {total} rows, {failed} with errors", file=sys.stderr)
+    finally:
+        writer.close()
+
+
+def backfill_analytics_command(args):
+    if not os.path.exists(args.db):
+        sys.exit(f"No result database at {args.db}")
+    started = time.perf_counter()
+    counted = analytics.backfill(SQLiteResultStore(args.db), health_app.result_category,
+                                 workers=args.workers, chunk_rows=args.chunk_size)
+    print(f"rebuilt rollups from {counted} history rows in {time.perf_counter() - started:.1f}s",
+          file=sys.stderr)
+
+
+def rescore_command(args):
+    if not os.path.exists(args.db):
+        sys.exit(f"No result database at {args.db}")
+    store = SQLiteResultStore(args.db)
+    rules_version = health_app.threshold_rules.current.version
+    if args.restart:
+        store.reset_rescore(rules_version)
+
+    def report(stats):
+        percent = 100 * stats['done'] / stats['total'] if stats['total'] else 100
+        print(f"rules {rules_version}: {stats['done']}/{stats['total']} rows ({percent:.0f}%),"
+              f" {stats['rate']:.0f} rows/s, {stats['changed']} changed", file=sys.stderr)
+
+    stats = rescore.rescore(store, health_app.rescore_inputs, rules_version, workers=args.workers,
+                            chunk_rows=args.chunk_size, max_rate=args.max_rate, progress=report)
+    print(f"rules {rules_version}: {stats['rescored']} rows re-scored, {stats['changed']} changed,"
+          f" {stats['skipped']} skipped; {stats['done']} rows in {stats['seconds']:.1f}s", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='healthplus', description='Health Plus command-line tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    score = commands.add_parser('score', help='bulk-score a CSV or Parquet file')
+    score.add_argument('input', help='input .csv or .parquet file')
+    score.add_argument('--assessments', required=True,
+                       help='comma-separated assessment types, e.g. bmi,cardiovascular,diabetes')
+    score.add_argument('-o', '--output', default='-',
+                       help='output .csv or .parquet file (default: CSV on stdout)')
+    score.add_argument('--chunk-size', type=int, default=10000, help='rows per chunk (default: 10000)')
+    score.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                       help='worker processes (default: number of CPUs; 1 scores inline)')
+    score.set_defaults(func=score_command)
+
+    backfill = commands.add_parser('backfill-analytics',
+                                   help='rebuild the analytics rollups from the stored history')
+    backfill.add_argument('--db', default=os.environ.get('HEALTHPLUS_RESULT_DB', 'health_plus.db'),
+                          help='SQLite result database (default: $HEALTHPLUS_RESULT_DB or health_plus.db)')
+    backfill.add_argument('--chunk-size', type=int, default=100000, help='history rows per task (default: 100000)')
+    backfill.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                          help='worker processes (default: number of CPUs; 1 counts inline)')
+    backfill.set_defaults(func=backfill_analytics_command)
+
+    rescore_parser = commands.add_parser('rescore',
+                                         help='re-score the stored history with the current threshold rules')
+    rescore_parser.add_argument('--db', default=os.environ.get('HEALTHPLUS_RESULT_DB', 'health_plus.db'),
+                                help='SQLite result database (default: $HEALTHPLUS_RESULT_DB or health_plus.db)')
+    rescore_parser.add_argument('--chunk-size', type=int, default=1000,
+                                help='history rows per task and per write (default: 1000)')
+    rescore_parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                                help='worker processes (default: half the CPUs; 1 scores inline)')
+    rescore_parser.add_argument('--max-rate', type=float, default=None,
+                                help='most history rows to re-score per second (default: no limit)')
+    rescore_parser.add_argument('--restart', action='store_true',
+                                help='discard this rules version\'s earlier progress and start over')
+    rescore_parser.set_defaults(func=rescore_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Lookup tables for scorers whose inputs only take a few discrete values.
+
+Scorers like ``assess_hiv`` or ``assess_hydration`` take booleans, small
+enumerations and an age, so every input combination can be scored once at
+startup. ``LookupScorer`` does that and replaces each call with one dict
+lookup keyed by the argument tuple. Equal results are interned into a single
+read-only ``FrozenResult`` shared by every lookup that produces it. Arguments
+outside the declared domains are passed to the original scorer.
+
+Run ``python lookup.py`` to check every compiled table against the scorer it
+was built from.
+"""
+import itertools
+import sys
+
+_MISSING = object()
+
+
+class FrozenResult(dict):
+    """Read-only result dict, shared between every lookup that produces it"""
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Lookup table results are shared and read-only; copy them with dict(result)")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return FrozenResult, (dict(self),)
+
+
+class LookupScorer:
+    """A scorer precomputed over the product of its argument domains"""
+
+    def __init__(self, scorer, domains):
+        self.scorer = self.__wrapped__ = scorer
+        self.__name__ = getattr(scorer, '__name__', 'scorer')
+        self.domains = [tuple(domain) for domain in domains]
+        interned = {}
+        self.table = {}
+        for args in itertools.product(*self.domains):
+            result = scorer(*args)
+            if isinstance(result, dict):
+                result = FrozenResult(result)
+                result = interned.setdefault(tuple(result.items()), result)
+            self.table[args] = result
+
+    def __call__(self, *args):
+        try:
+            result = self.table.get(args, _MISSING)
+        except TypeError:  # unhashable arguments
+            result = _MISSING
+        if result is _MISSING:
+            return self.scorer(*args)
+        return result
+
+    def verify(self):
+        """[(args, expected, actual)] for every table entry that differs from the scorer's result"""
+        mismatches = []
+        for args, actual in self.table.items():
+            expected = self.scorer(*args)
+            if expected != actual:
+                mismatches.append((args, expected, actual))
+        return mismatches
+
+
+def verify(scorers):
+    """Check {name: LookupScorer} tables; returns [(name, args, expected, actual)] mismatches"""
+    return [(name, args, expected, actual)
+            for name, scorer in scorers.items()
+            for args, expected, actual in scorer.verify()]
+
+
+if __name__ == '__main__':
+    import app
+
+    compiled = {name: assessment.scorer for name, assessment in app.ASSESSMENTS.items()
+                if isinstance(assessment.scorer, app.LookupScorer)}
+    found = verify(compiled)
+    for name, args, expected, actual in found[:20]:
+        print(f"{name}{args}: scorer={expected!r} table={actual!r}")
+    entries = sum(len(scorer.table) for scorer in compiled.values())
+    print(f"{len(compiled)} tables, {entries} entries, {len(found)} mismatches")
+    sys.exit(1 if found else 0)
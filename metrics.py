@@ -0,0 +1,92 @@
+"""Lightweight latency instrumentation exposed in Prometheus text format.
+
+Only what the app needs: labelled histograms with fixed buckets, a timer
+context manager and a renderer for the /metrics endpoint. Metrics are kept
+per process, so under gunicorn each worker reports its own counts.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; request stages here range from microseconds (scoring) to tens of ms (templates)
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Histogram:
+    """Cumulative histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, documentation, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts (plus +Inf), then sum and count
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: (list(counts), total, count)
+                        for labels, (counts, total, count) in self._series.items()}
+        for label_values, (counts, total, count) in sorted(snapshot.items()):
+            labels = ','.join(f'{name}="{_escape(value)}"'
+                              for name, value in zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total!r}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+STAGE_DURATION = Histogram(
+    'healthplus_stage_duration_seconds',
+    'Time spent in each stage of handling an assessment, by assessment type.',
+    ('stage', 'assessment_type'),
+)
+
+REGISTRY = [STAGE_DURATION]
+
+
+@contextmanager
+def stage_timer(stage, assessment_type, timings=None):
+    """Record how long the enclosed block takes as one stage observation.
+
+    When a ``timings`` dict is given, the duration (in seconds) is also stored
+    in it under the stage name.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe((stage, assessment_type), elapsed)
+        if timings is not None:
+            timings[stage] = elapsed
+
+
+def render_prometheus():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
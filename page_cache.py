@@ -0,0 +1,81 @@
+"""Pre-rendered page cache with strong ETags and pre-compressed variants.
+
+Pages that only depend on the URL (home, assessment list, assessment forms)
+are rendered once per process, hashed, and compressed once with gzip (and
+brotli when the ``brotli`` package is installed). Requests are then answered
+from memory, with ``304 Not Modified`` when the client already holds the
+current version.
+"""
+import gzip
+import hashlib
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# One stored representation of a page: encoded body and its strong ETag
+Variant = namedtuple('Variant', ['body', 'etag'])
+
+
+class CachedPage:
+    def __init__(self, html):
+        body = html.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        # Each encoding is a different representation, so each gets its own strong ETag
+        self.variants = {None: Variant(body, digest)}
+        self.variants['gzip'] = Variant(gzip.compress(body, compresslevel=9, mtime=0), f'{digest}-gz')
+        if brotli is not None:
+            self.variants['br'] = Variant(brotli.compress(body, quality=11), f'{digest}-br')
+
+    def choose_encoding(self, accept_encodings):
+        """Best available encoding the client accepts (None for identity)"""
+        best = max((encoding for encoding in self.variants if encoding),
+                   key=lambda encoding: (accept_encodings[encoding], encoding == 'br'))
+        return best if accept_encodings[best] > 0 else None
+
+
+class PageCache:
+    """Rendered pages keyed by request path, shared by every request of a process"""
+
+    def __init__(self, cache_control='public, no-cache'):
+        # no-cache: clients and proxies keep the page but revalidate it (a cheap 304)
+        self.cache_control = cache_control
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, render):
+        page = self._pages.get(key)
+        if page is None:
+            page = CachedPage(render())
+            with self._lock:
+                page = self._pages.setdefault(key, page)
+        return page
+
+    def respond(self, request, key, render):
+        """Response for a cached page, honouring Accept-Encoding and If-None-Match"""
+        page = self.get(key, render)
+        encoding = page.choose_encoding(request.accept_encodings)
+        variant = page.variants[encoding]
+
+        if request.if_none_match.contains(variant.etag):
+            response = Response(status=304)
+        else:
+            response = Response(variant.body, mimetype='text/html')
+            if encoding:
+                response.content_encoding = encoding
+        response.set_etag(variant.etag)
+        response.last_modified = page.last_modified
+        response.headers['Cache-Control'] = self.cache_control
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
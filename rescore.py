@@ -0,0 +1,125 @@
+"""Re-scoring of stored history after the threshold rules change.
+
+Every stored record carries the inputs it was scored from and the version of
+the threshold rules that scored it. ``rescore`` walks the history of a SQLite
+result store in id-ordered chunks, re-runs each record's assessment on its
+stored inputs in a process pool, and stores the new outcome next to the
+original under the current rules version; the original record is never
+changed. Each chunk is written in one transaction together with a checkpoint,
+so an interrupted run resumes where it stopped.
+
+The job is throttled so it doesn't compete with the web app: workers run at a
+lower CPU priority, at most ``2 * workers`` chunks are in flight, writes are
+short transactions, and ``max_rate`` caps the rows re-scored per second.
+"""
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+from codec import decode_record
+
+# Niceness added to worker processes
+WORKER_NICENESS = 10
+
+
+def _lower_priority():
+    try:
+        os.nice(WORKER_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+def rescore_range(path, first_id, last_id, score, rules_version):
+    """Re-score the history rows with first_id <= id <= last_id.
+
+    ``score(assessment_type, inputs)`` returns (result, category, rules
+    version). Returns (history_id, assessment_type, record, changed) for each
+    re-scored row, and the number of rows skipped: rows already scored with
+    ``rules_version`` and rows without usable stored inputs.
+    """
+    rescored = []
+    skipped = 0
+    with closing(sqlite3.connect(f'file:{path}?mode=ro', uri=True)) as conn:
+        rows = conn.execute("SELECT id, assessment_type, payload FROM history WHERE id BETWEEN ? AND ?",
+                            (first_id, last_id))
+        for history_id, assessment_type, payload in rows:
+            record = decode_record(payload)
+            inputs = record.get('inputs')
+            if record.get('rules_version') == rules_version or not isinstance(inputs, dict):
+                skipped += 1
+                continue
+            try:
+                result, category, version = score(assessment_type, inputs)
+            except (KeyError, TypeError, ValueError):
+                # Inputs the assessment no longer accepts
+                skipped += 1
+                continue
+            if version != rules_version:
+                raise RuntimeError(f"Rules changed from {rules_version} to {version} while re-scoring")
+            if result is None:
+                skipped += 1
+                continue
+            rescored.append((history_id, assessment_type,
+                             {'result': result, 'category': category, 'rules_version': version},
+                             result != record['result']))
+    return rescored, skipped
+
+
+def _chunks(ranges, path, score, rules_version, workers):
+    """(range, rescore_range outcome) in range order, keeping at most 2 * workers chunks in flight"""
+    if workers <= 1:
+        for first_id, last_id in ranges:
+            yield (first_id, last_id), rescore_range(path, first_id, last_id, score, rules_version)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_lower_priority) as pool:
+        pending = []
+        for first_id, last_id in ranges:
+            pending.append(((first_id, last_id),
+                            pool.submit(rescore_range, path, first_id, last_id, score, rules_version)))
+            if len(pending) >= 2 * workers:
+                id_range, future = pending.pop(0)
+                yield id_range, future.result()
+        for id_range, future in pending:
+            yield id_range, future.result()
+
+
+def rescore(store, score, rules_version, workers=1, chunk_rows=1000, max_rate=None, progress=None):
+    """Re-score a SQLite result store's history under ``rules_version``, resuming from its checkpoint.
+
+    Only rows stored before the run started are visited; later ones were scored
+    with the current rules already. ``progress(stats)`` is called after every
+    chunk with the running totals. Returns the final stats: rows ``total``
+    and ``done`` in this run, ``rescored``, ``changed`` and ``skipped`` (all
+    runs of this version), ``seconds`` and ``rate`` (rows per second).
+    """
+    through_id, rescored, changed, skipped = store.rescore_progress(rules_version)
+    last_id = store.history_id_range()[1]
+    stats = {'rules_version': rules_version, 'total': store.count_history(through_id + 1, last_id),
+             'done': 0, 'rescored': rescored, 'changed': changed, 'skipped': skipped,
+             'seconds': 0.0, 'rate': 0.0}
+    if last_id is None or last_id <= through_id:
+        return stats
+
+    ranges = [(start, min(start + chunk_rows - 1, last_id))
+              for start in range(through_id + 1, last_id + 1, chunk_rows)]
+    started = time.perf_counter()
+    for (_, through_id), (rows, chunk_skipped) in _chunks(ranges, store.path, score, rules_version, workers):
+        chunk_changed = sum(1 for *_, row_changed in rows if row_changed)
+        store.save_rescored(rules_version, [row[:3] for row in rows],
+                            through_id, len(rows), chunk_changed, chunk_skipped)
+        stats['done'] += len(rows) + chunk_skipped
+        stats['rescored'] += len(rows)
+        stats['changed'] += chunk_changed
+        stats['skipped'] += chunk_skipped
+        elapsed = time.perf_counter() - started
+        if max_rate and stats['done'] / max_rate > elapsed:
+            time.sleep(stats['done'] / max_rate - elapsed)
+            elapsed = time.perf_counter() - started
+        stats['seconds'] = elapsed
+        stats['rate'] = stats['done'] / elapsed if elapsed else 0.0
+        if progress is not None:
+            progress(dict(stats))
+    return stats
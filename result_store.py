@@ -0,0 +1,512 @@
+"""Server-side storage for assessment results.
+
+Results used to live in Flask's signed cookie session, which overflows the
+browser's ~4 KB cookie limit once a few assessments are stored. The session
+now only carries an opaque id and the results themselves live in one of the
+backends below, keyed by that id.
+
+Every stored result is also appended to a per-session history, so earlier
+readings of an assessment stay available for trends (``get_history``), and
+counted in a rollup per (day, site, assessment type, category) for population
+analytics (``get_rollups``, see analytics.py). A session's composite profile
+(see composite.py) is stored alongside its results. Outcomes of re-scoring the
+history under newer threshold rules (see rescore.py) are stored next to the
+original records, which are never changed.
+
+The submitted inputs of each record are also kept column by column, one table
+of typed columns per assessment (``get_input_columns``), so population
+analytics and re-scoring can scan raw measurements without decoding records.
+
+Records are stored in the compact binary form from codec.py unless
+HEALTHPLUS_RESULT_ENCODING=json; either form is read back.
+"""
+import bisect
+import heapq
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime
+
+from codec import INPUT_SCHEMAS, decode_record, encode_record
+
+# Site recorded for results that don't name one
+DEFAULT_SITE = 'default'
+
+
+def _epoch(timestamp):
+    """Seconds since the epoch for a record's ISO timestamp"""
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+def rollup_key(assessment_type, record, categorize=None):
+    """(day, site, assessment_type, category) counter a stored record belongs to.
+
+    Records carry their category; ``categorize(assessment_type, result)`` is the
+    fallback for older records that don't.
+    """
+    category = record.get('category')
+    if category is None and categorize is not None:
+        category = categorize(assessment_type, record['result'])
+    return (record['timestamp'][:10], record.get('site') or DEFAULT_SITE, assessment_type,
+            'Unknown' if category is None else str(category))
+
+
+def _rollup_matches(key, since_day, until_day, site, assessment_type):
+    day, key_site, key_type, _ = key
+    return ((since_day is None or day >= since_day) and (until_day is None or day <= until_day)
+            and (site is None or key_site == site) and (assessment_type is None or key_type == assessment_type))
+
+
+# SQLite column type of each input value type
+INPUT_COLUMN_TYPES = {bool: 'INTEGER', int: 'INTEGER', float: 'REAL', str: 'TEXT'}
+
+
+def _input_table(assessment_type):
+    return 'inputs_' + assessment_type.replace('-', '_')
+
+
+def _input_column_types(assessment_type, fields):
+    """{column: value type} of the requested input columns; raises ValueError for unknown ones"""
+    types = dict(INPUT_SCHEMAS.get(assessment_type, ()), ts=float, site=str)
+    names = fields or [field for field, _ in INPUT_SCHEMAS.get(assessment_type, ())]
+    unknown = [name for name in names if name not in types]
+    if unknown:
+        raise ValueError(f"No input column {', '.join(unknown)} for {assessment_type!r}")
+    return {name: types[name] for name in names}
+
+
+def _typed_column(values, value_type):
+    # SQLite has no boolean type and returns yes/no answers as 0/1
+    if value_type is bool:
+        return [None if value is None else bool(value) for value in values]
+    return list(values)
+
+
+def _history_entry(assessment_type, payload, rescored=None):
+    entry = decode_record(payload)
+    entry['assessment_type'] = assessment_type
+    if rescored is not None:
+        entry['rescored'] = decode_record(rescored)
+    return entry
+
+
+def _json_record(assessment_type, record):
+    return json.dumps(record)
+
+
+class ResultStore:
+    """Interface shared by all result store backends"""
+
+    def __init__(self, compact=True):
+        # (assessment_type, record) -> stored payload
+        self.encode = encode_record if compact else _json_record
+
+    def get_all(self, sid):
+        """Return {assessment_type: record} for a session id"""
+        raise NotImplementedError
+
+    def put(self, sid, assessment_type, record, profile=None):
+        """Store the latest record of one assessment and append it to the history.
+
+        ``profile`` replaces the session's composite profile in the same write.
+        """
+        raise NotImplementedError
+
+    def get_profile(self, sid):
+        """The session's composite profile, {} if it has none"""
+        raise NotImplementedError
+
+    def get_history(self, sid, assessment_type=None, since=None, until=None, limit=None, rules_version=None):
+        """Records of a session id in time order, optionally for one assessment type.
+
+        ``since`` and ``until`` are inclusive datetime bounds; ``limit`` keeps the
+        most recent records. Each record also carries its ``assessment_type``,
+        and its re-scored outcome under ``rules_version`` as ``rescored`` when
+        there is one.
+        """
+        raise NotImplementedError
+
+    def get_rollups(self, since_day=None, until_day=None, site=None, assessment_type=None):
+        """[(day, site, assessment_type, category, count)] within inclusive 'YYYY-MM-DD' bounds"""
+        raise NotImplementedError
+
+    def get_input_columns(self, assessment_type, fields=None, since=None, until=None, site=None):
+        """{field: [value]} of the stored inputs of one assessment, every session's, in the order stored.
+
+        ``fields`` defaults to every input field of the assessment; ``ts``
+        (epoch seconds) and ``site`` can be asked for too. ``since`` and
+        ``until`` are inclusive datetime bounds.
+        """
+        raise NotImplementedError
+
+    def clear(self, sid, history=True):
+        """Remove a session id's latest results and profile, and its history unless ``history`` is False.
+
+        Rollups are kept either way.
+        """
+        raise NotImplementedError
+
+
+class MemoryResultStore(ResultStore):
+    """Process-local store, intended for tests and single-process development"""
+
+    def __init__(self, compact=True):
+        super().__init__(compact)
+        self._data = {}
+        self._profiles = {}
+        # sid -> {assessment_type: ([epoch seconds], [payload])}, both sorted by time
+        self._history = {}
+        self._rollups = Counter()
+        # assessment_type -> {column: [value]}, with the owning sid in column 'sid'
+        self._inputs = {}
+        self._lock = threading.Lock()
+
+    def get_all(self, sid):
+        with self._lock:
+            return {k: decode_record(v) for k, v in self._data.get(sid, {}).items()}
+
+    def put(self, sid, assessment_type, record, profile=None):
+        # Stored encoded, so callers can't mutate what is stored
+        payload = self.encode(assessment_type, record)
+        ts = _epoch(record['timestamp'])
+        with self._lock:
+            self._data.setdefault(sid, {})[assessment_type] = payload
+            if profile is not None:
+                self._profiles[sid] = json.dumps(profile)
+            times, payloads = self._history.setdefault(sid, {}).setdefault(assessment_type, ([], []))
+            index = bisect.bisect_right(times, ts)
+            times.insert(index, ts)
+            payloads.insert(index, payload)
+            self._rollups[rollup_key(assessment_type, record)] += 1
+            inputs = record.get('inputs')
+            if assessment_type in INPUT_SCHEMAS and isinstance(inputs, dict):
+                columns = self._inputs.setdefault(assessment_type, {})
+                row = {'sid': sid, 'ts': ts, 'site': record.get('site') or DEFAULT_SITE}
+                row.update((field, inputs.get(field)) for field, _ in INPUT_SCHEMAS[assessment_type])
+                for name, value in row.items():
+                    columns.setdefault(name, []).append(value)
+
+    def get_profile(self, sid):
+        with self._lock:
+            payload = self._profiles.get(sid)
+        return json.loads(payload) if payload else {}
+
+    def get_history(self, sid, assessment_type=None, since=None, until=None, limit=None, rules_version=None):
+        # Re-scoring needs SQLite, so there are no re-scored outcomes to attach
+        with self._lock:
+            series = self._history.get(sid, {})
+            if assessment_type is not None:
+                series = {assessment_type: series[assessment_type]} if assessment_type in series else {}
+            ranges = []
+            for series_type, (times, payloads) in series.items():
+                start = bisect.bisect_left(times, since.timestamp()) if since else 0
+                end = bisect.bisect_right(times, until.timestamp()) if until else len(times)
+                ranges.append([(times[i], series_type, payloads[i]) for i in range(start, end)])
+        rows = list(heapq.merge(*ranges))
+        if limit is not None:
+            rows = rows[-limit:] if limit else []
+        return [_history_entry(series_type, payload) for _, series_type, payload in rows]
+
+    def get_rollups(self, since_day=None, until_day=None, site=None, assessment_type=None):
+        with self._lock:
+            return sorted(key + (count,) for key, count in self._rollups.items()
+                          if _rollup_matches(key, since_day, until_day, site, assessment_type))
+
+    def get_input_columns(self, assessment_type, fields=None, since=None, until=None, site=None):
+        names = _input_column_types(assessment_type, fields)
+        with self._lock:
+            columns = self._inputs.get(assessment_type)
+            if not columns:
+                return {name: [] for name in names}
+            rows = range(len(columns['ts']))
+            if since is not None or until is not None or site is not None:
+                times, sites = columns['ts'], columns['site']
+                rows = [row for row in rows
+                        if (since is None or times[row] >= since.timestamp())
+                        and (until is None or times[row] <= until.timestamp())
+                        and (site is None or sites[row] == site)]
+            return {name: [columns[name][row] for row in rows] for name in names}
+
+    def clear(self, sid, history=True):
+        with self._lock:
+            self._data.pop(sid, None)
+            self._profiles.pop(sid, None)
+            if not history:
+                return
+            self._history.pop(sid, None)
+            for assessment_type, columns in self._inputs.items():
+                keep = [row for row, owner in enumerate(columns['sid']) if owner != sid]
+                self._inputs[assessment_type] = {name: [values[row] for row in keep]
+                                                 for name, values in columns.items()}
+
+
+class SQLiteResultStore(ResultStore):
+    """Default store backed by a single SQLite file shared by all workers"""
+
+    def __init__(self, path, compact=True):
+        super().__init__(compact)
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            # payload: codec bytes, or JSON text for rows written before the codec or with it off
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " sid TEXT NOT NULL,"
+                " assessment_type TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " PRIMARY KEY (sid, assessment_type))"
+            )
+            # Append-only; ts is epoch seconds so range scans compare numbers
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                " id INTEGER PRIMARY KEY,"
+                " sid TEXT NOT NULL,"
+                " assessment_type TEXT NOT NULL,"
+                " ts REAL NOT NULL,"
+                " payload TEXT NOT NULL)"
+            )
+            # One index per access path: a type's series, and everything of a session
+            conn.execute("CREATE INDEX IF NOT EXISTS history_sid_type_ts ON history (sid, assessment_type, ts)")
+            conn.execute("CREATE INDEX IF NOT EXISTS history_sid_ts ON history (sid, ts)")
+            # Day leads the key, so dashboard windows are a range scan
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rollups ("
+                " day TEXT NOT NULL,"
+                " site TEXT NOT NULL,"
+                " assessment_type TEXT NOT NULL,"
+                " category TEXT NOT NULL,"
+                " count INTEGER NOT NULL,"
+                " PRIMARY KEY (day, site, assessment_type, category))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS profiles (sid TEXT PRIMARY KEY, payload TEXT NOT NULL)")
+            # A history row's outcome under newer rules, looked up by history row
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rescored ("
+                " history_id INTEGER NOT NULL,"
+                " rules_version TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " PRIMARY KEY (history_id, rules_version))"
+            )
+            self._create_input_tables(conn)
+            # Checkpoint of the re-scoring run for each rules version
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rescore_progress ("
+                " rules_version TEXT PRIMARY KEY,"
+                " through_id INTEGER NOT NULL,"
+                " rescored INTEGER NOT NULL,"
+                " changed INTEGER NOT NULL,"
+                " skipped INTEGER NOT NULL)"
+            )
+
+    def _create_input_tables(self, conn):
+        """One table per assessment, a typed column per input field, keyed by history row"""
+        for assessment_type, fields in INPUT_SCHEMAS.items():
+            table = _input_table(assessment_type)
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ('
+                         ' history_id INTEGER PRIMARY KEY,'
+                         ' ts REAL NOT NULL,'
+                         ' site TEXT NOT NULL)')
+            # Input schemas only ever grow at the end, so adding the missing columns migrates a table
+            existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+            for field, value_type in fields:
+                if field not in existing:
+                    conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{field}" {INPUT_COLUMN_TYPES[value_type]}')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{table}_ts" ON "{table}" (ts)')
+
+    def _connect(self):
+        # sqlite3 connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_all(self, sid):
+        rows = self._connect().execute(
+            "SELECT assessment_type, payload FROM results WHERE sid = ? ORDER BY rowid", (sid,)
+        ).fetchall()
+        return {assessment_type: decode_record(payload) for assessment_type, payload in rows}
+
+    def put(self, sid, assessment_type, record, profile=None):
+        payload = self.encode(assessment_type, record)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (sid, assessment_type, payload) VALUES (?, ?, ?)",
+                (sid, assessment_type, payload),
+            )
+            ts = _epoch(record['timestamp'])
+            history_id = conn.execute(
+                "INSERT INTO history (sid, assessment_type, ts, payload) VALUES (?, ?, ?, ?)",
+                (sid, assessment_type, ts, payload),
+            ).lastrowid
+            inputs = record.get('inputs')
+            if assessment_type in INPUT_SCHEMAS and isinstance(inputs, dict):
+                fields = INPUT_SCHEMAS[assessment_type]
+                columns = ', '.join(f'"{field}"' for field, _ in fields)
+                conn.execute(
+                    f'INSERT INTO "{_input_table(assessment_type)}" (history_id, ts, site, {columns})'
+                    f' VALUES (?, ?, ?{", ?" * len(fields)})',
+                    (history_id, ts, record.get('site') or DEFAULT_SITE, *(inputs.get(field) for field, _ in fields)),
+                )
+            # Same transaction as the history row, so a rollup rebuild never double counts
+            conn.execute(
+                "INSERT INTO rollups (day, site, assessment_type, category, count) VALUES (?, ?, ?, ?, 1)"
+                " ON CONFLICT (day, site, assessment_type, category) DO UPDATE SET count = count + 1",
+                rollup_key(assessment_type, record),
+            )
+            if profile is not None:
+                conn.execute("INSERT OR REPLACE INTO profiles (sid, payload) VALUES (?, ?)", (sid, json.dumps(profile)))
+
+    def get_profile(self, sid):
+        row = self._connect().execute("SELECT payload FROM profiles WHERE sid = ?", (sid,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def get_history(self, sid, assessment_type=None, since=None, until=None, limit=None, rules_version=None):
+        where = ["h.sid = ?"]
+        params = [rules_version, sid]
+        if assessment_type is not None:
+            where.append("h.assessment_type = ?")
+            params.append(assessment_type)
+        if since is not None:
+            where.append("h.ts >= ?")
+            params.append(since.timestamp())
+        if until is not None:
+            where.append("h.ts <= ?")
+            params.append(until.timestamp())
+        query = (f"SELECT h.assessment_type, h.payload, r.payload FROM history h"
+                 f" LEFT JOIN rescored r ON r.history_id = h.id AND r.rules_version = ?"
+                 f" WHERE {' AND '.join(where)} ORDER BY h.ts DESC, h.id DESC")
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        # Newest first so LIMIT keeps the most recent rows, then back to time order
+        rows = self._connect().execute(query, params).fetchall()
+        return [_history_entry(series_type, payload, rescored) for series_type, payload, rescored in reversed(rows)]
+
+    def get_rollups(self, since_day=None, until_day=None, site=None, assessment_type=None):
+        where = []
+        params = []
+        for clause, value in (("day >= ?", since_day), ("day <= ?", until_day),
+                              ("site = ?", site), ("assessment_type = ?", assessment_type)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        query = "SELECT day, site, assessment_type, category, count FROM rollups"
+        if where:
+            query += f" WHERE {' AND '.join(where)}"
+        return self._connect().execute(query + " ORDER BY day, site, assessment_type, category", params).fetchall()
+
+    def get_input_columns(self, assessment_type, fields=None, since=None, until=None, site=None):
+        types = _input_column_types(assessment_type, fields)
+        where = []
+        params = []
+        for clause, value in (("ts >= ?", since and since.timestamp()), ("ts <= ?", until and until.timestamp()),
+                              ("site = ?", site)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        columns = ', '.join(f'"{name}"' for name in types)
+        query = f'SELECT {columns} FROM "{_input_table(assessment_type)}"'
+        if where:
+            query += f" WHERE {' AND '.join(where)}"
+        rows = self._connect().execute(query + " ORDER BY history_id", params).fetchall()
+        values = list(zip(*rows)) if rows else [()] * len(types)
+        return {name: _typed_column(column, value_type) for (name, value_type), column in zip(types.items(), values)}
+
+    def history_id_range(self):
+        """(first, last) history row id, or (None, None) when the history is empty"""
+        return self._connect().execute("SELECT MIN(id), MAX(id) FROM history").fetchone()
+
+    def count_history(self, first_id, last_id):
+        """Number of history rows with first_id <= id <= last_id"""
+        if last_id is None:
+            return 0
+        return self._connect().execute("SELECT COUNT(*) FROM history WHERE id BETWEEN ? AND ?",
+                                       (first_id, last_id)).fetchone()[0]
+
+    def rescore_progress(self, rules_version):
+        """(through_id, rescored, changed, skipped) of the re-scoring run for a rules version"""
+        row = self._connect().execute(
+            "SELECT through_id, rescored, changed, skipped FROM rescore_progress WHERE rules_version = ?",
+            (rules_version,)).fetchone()
+        return row or (0, 0, 0, 0)
+
+    def save_rescored(self, rules_version, rows, through_id, rescored, changed, skipped):
+        """Store [(history_id, assessment_type, record)] re-scored under a rules version and advance its checkpoint"""
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO rescored (history_id, rules_version, payload) VALUES (?, ?, ?)",
+                [(history_id, rules_version, self.encode(assessment_type, record))
+                 for history_id, assessment_type, record in rows],
+            )
+            conn.execute(
+                "INSERT INTO rescore_progress (rules_version, through_id, rescored, changed, skipped)"
+                " VALUES (?, ?, ?, ?, ?) ON CONFLICT (rules_version) DO UPDATE SET"
+                " through_id = excluded.through_id, rescored = rescored + excluded.rescored,"
+                " changed = changed + excluded.changed, skipped = skipped + excluded.skipped",
+                (rules_version, through_id, rescored, changed, skipped),
+            )
+
+    def reset_rescore(self, rules_version):
+        """Forget the re-scoring run of a rules version, so the next one starts over"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM rescored WHERE rules_version = ?", (rules_version,))
+            conn.execute("DELETE FROM rescore_progress WHERE rules_version = ?", (rules_version,))
+
+    def replace_rollups(self, counts, counted_through_id, categorize=None):
+        """Replace every rollup with ``counts``, which covers history rows up to ``counted_through_id``.
+
+        Writers are locked out while the rows stored since then are counted and
+        the table is swapped, so no submission is lost or counted twice.
+        """
+        counts = Counter(counts)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("SELECT assessment_type, payload FROM history WHERE id > ?",
+                                (counted_through_id or 0,))
+            for assessment_type, payload in rows:
+                counts[rollup_key(assessment_type, decode_record(payload), categorize)] += 1
+            conn.execute("DELETE FROM rollups")
+            conn.executemany(
+                "INSERT INTO rollups (day, site, assessment_type, category, count) VALUES (?, ?, ?, ?, ?)",
+                [key + (count,) for key, count in counts.items()],
+            )
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        return counts
+
+    def clear(self, sid, history=True):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results WHERE sid = ?", (sid,))
+            conn.execute("DELETE FROM profiles WHERE sid = ?", (sid,))
+            if not history:
+                return
+            conn.execute("DELETE FROM rescored WHERE history_id IN (SELECT id FROM history WHERE sid = ?)", (sid,))
+            for (assessment_type,) in conn.execute("SELECT DISTINCT assessment_type FROM history WHERE sid = ?",
+                                                   (sid,)).fetchall():
+                if assessment_type in INPUT_SCHEMAS:
+                    conn.execute(f'DELETE FROM "{_input_table(assessment_type)}"'
+                                 ' WHERE history_id IN (SELECT id FROM history WHERE sid = ?)', (sid,))
+            conn.execute("DELETE FROM history WHERE sid = ?", (sid,))
+
+
+def create_result_store(backend=None, path=None, encoding=None):
+    """Build the store selected by HEALTHPLUS_RESULT_STORE (sqlite or memory)"""
+    backend = backend or os.environ.get('HEALTHPLUS_RESULT_STORE', 'sqlite')
+    encoding = encoding or os.environ.get('HEALTHPLUS_RESULT_ENCODING', 'compact')
+    if encoding not in ('compact', 'json'):
+        raise ValueError(f"Unknown result encoding: {encoding}")
+    compact = encoding == 'compact'
+    if backend == 'memory':
+        return MemoryResultStore(compact)
+    if backend == 'sqlite':
+        path = path or os.environ.get('HEALTHPLUS_RESULT_DB', 'health_plus.db')
+        return SQLiteResultStore(path, compact)
+    raise ValueError(f"Unknown result store backend: {backend}")
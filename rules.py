@@ -0,0 +1,284 @@
+"""Threshold rules for the band-based scorers, loaded from a versioned data file.
+
+The cut points that turn a reading into a category (BMI bands, blood pressure
+stages, grip strength norms by gender and age, ...) live in a JSON file rather
+than in code, so they can be changed without a deploy::
+
+    {
+      "version": "2024.1",
+      "rules": {
+        "respiratory": {
+          "outcomes": [{"status": "Severe Hypoxemia - Seek Medical Attention"},
+                       {"status": "Mild Hypoxemia"}, {"status": "Normal"}],
+          "tree": {"input": "spo2", "cuts": [90, 95], "nan": 0, "bands": [0, 1, 2]}
+        }
+      }
+    }
+
+A rule's tree is an outcome index, or a split on one input:
+
+* ``cuts``: ascending cut points, with one band more than there are cuts. A
+  value equal to a cut joins the band above it, or the one below with
+  ``"equal": "lower"``. NaN goes to band ``nan``, the last band by default.
+* ``values``: case-insensitive labels, one band each, plus a last band for
+  anything else.
+
+Bands are outcome indexes or further splits. Files are compiled into sorted cut
+tuples searched with ``bisect`` when they are loaded, and checked against
+``SCORER_RULES``: every rule the scorers use must be there, split only on the
+inputs its scorer passes, and give every result field its scorer reads.
+``RuleFile`` reloads a file when it changes and swaps the compiled rules in as
+one reference, so a scorer never sees half a rule set; a file that doesn't
+compile or check, or that changes the rules without changing the version
+stored results are tagged with, is logged and the rules in force are kept. Run
+``python rules.py FILE...`` to check files before installing them.
+"""
+import bisect
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+# What the scorers in app.py read from each rule: the inputs they classify
+# with ('number' inputs are split by cuts, 'text' ones by values) and the
+# result fields they take from its outcomes.
+SCORER_RULES = {
+    'bmi': ({'bmi': 'number'}, ('category',)),
+    'cardiovascular': ({'systolic': 'number', 'diastolic': 'number'}, ('status', 'risk')),
+    'respiratory': ({'spo2': 'number'}, ('status',)),
+    'fitness': ({'resting_hr': 'number'}, ('status',)),
+    'body-composition': ({'bf_percentage': 'number', 'gender': 'text', 'age': 'number'}, ('status',)),
+    'temperature': ({'temperature': 'number'}, ('status',)),
+    'grip-strength': ({'grip_kg': 'number', 'gender': 'text', 'age': 'number'}, ('status',)),
+}
+
+
+class RuleError(ValueError):
+    """A rule file that can't be compiled"""
+
+
+class _Split:
+    """One compiled decision: which band of its input a value falls in"""
+    __slots__ = ('input', 'cuts', 'values', 'bands', 'nan', 'equal', 'search')
+
+    def band(self, value):
+        if self.values is not None:
+            return self.values.get(str(value).lower(), len(self.values))
+        if value != value:
+            return self.nan
+        return self.search(self.cuts, value)
+
+
+def _compile_node(node, outcomes, where):
+    if isinstance(node, int) and not isinstance(node, bool):
+        if not 0 <= node < len(outcomes):
+            raise RuleError(f"{where}: no outcome {node}")
+        return outcomes[node]
+    if not isinstance(node, dict) or not isinstance(node.get('input'), str):
+        raise RuleError(f"{where}: expected an outcome index or a split with an input")
+    split = _Split()
+    split.input = node['input']
+    bands = node.get('bands')
+    if ('cuts' in node) == ('values' in node):
+        raise RuleError(f"{where}: a split needs either cuts or values")
+    if 'cuts' in node:
+        cuts = node['cuts']
+        if (not isinstance(cuts, list) or not cuts
+                or not all(isinstance(cut, (int, float)) and math.isfinite(cut) for cut in cuts)
+                or any(low >= high for low, high in zip(cuts, cuts[1:]))):
+            raise RuleError(f"{where}: cuts must be ascending numbers")
+        equal = node.get('equal', 'upper')
+        if equal not in ('upper', 'lower'):
+            raise RuleError(f"{where}: equal must be 'upper' or 'lower'")
+        split.cuts = tuple(cuts)
+        split.values = None
+        split.equal = equal
+        split.search = bisect.bisect_right if equal == 'upper' else bisect.bisect_left
+        band_count = len(cuts) + 1
+    else:
+        values = node['values']
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise RuleError(f"{where}: values must be a list of strings")
+        split.cuts = None
+        split.values = {value.lower(): index for index, value in enumerate(values)}
+        split.equal = None
+        split.search = None
+        band_count = len(values) + 1
+    if not isinstance(bands, list) or len(bands) != band_count:
+        raise RuleError(f"{where}: expected {band_count} bands")
+    split.nan = node.get('nan', band_count - 1)
+    if not isinstance(split.nan, int) or not 0 <= split.nan < band_count:
+        raise RuleError(f"{where}: nan must be a band index")
+    split.bands = tuple(_compile_node(band, outcomes, f"{where}.{split.input}[{index}]")
+                        for index, band in enumerate(bands))
+    return split
+
+
+def _check_splits(node, inputs, where):
+    """Raise RuleError unless every split in a compiled tree is on a known input of the right kind"""
+    if type(node) is not _Split:
+        return
+    kind = 'number' if node.cuts is not None else 'text'
+    if node.input not in inputs:
+        raise RuleError(f"{where}: unknown input {node.input!r} (expected one of {', '.join(sorted(inputs))})")
+    if inputs[node.input] != kind:
+        raise RuleError(f"{where}: {node.input!r} is a {inputs[node.input]} input, split it by "
+                        f"{'cuts' if inputs[node.input] == 'number' else 'values'}")
+    for index, band in enumerate(node.bands):
+        _check_splits(band, inputs, f"{where}.{node.input}[{index}]")
+
+
+class RuleSet:
+    """A compiled, immutable rule file.
+
+    ``required`` maps rule names to (inputs, result fields), like
+    ``SCORER_RULES``; those rules must be present and fit them.
+    """
+
+    def __init__(self, document, required=None):
+        if not isinstance(document, dict) or not isinstance(document.get('rules'), dict):
+            raise RuleError("A rule file is an object with a version and rules")
+        version = document.get('version')
+        if not isinstance(version, str) or not version:
+            raise RuleError("A rule file needs a version string")
+        self.version = version
+        self._trees = {}
+        for name, rule in document['rules'].items():
+            outcomes = rule.get('outcomes') if isinstance(rule, dict) else None
+            if not isinstance(outcomes, list) or not all(isinstance(outcome, dict) for outcome in outcomes):
+                raise RuleError(f"{name}: outcomes must be a list of objects")
+            outcomes = [MappingProxyType(outcome) for outcome in outcomes]
+            self._trees[name] = _compile_node(rule.get('tree'), outcomes, name)
+            if required and name in required:
+                inputs, fields = required[name]
+                _check_splits(self._trees[name], inputs, name)
+                for index, outcome in enumerate(outcomes):
+                    missing = [field for field in fields if field not in outcome]
+                    if missing:
+                        raise RuleError(f"{name}: outcome {index} has no {', '.join(missing)}")
+        missing = sorted(set(required or ()) - set(self._trees))
+        if missing:
+            raise RuleError(f"Missing rules: {', '.join(missing)}")
+        self._document = document
+
+    def __contains__(self, name):
+        return name in self._trees
+
+    def tree(self, name):
+        """The compiled tree of rule ``name``, for evaluators other than classify (see vectorized.py)"""
+        return self._trees[name]
+
+    def classify(self, name, **inputs):
+        """The outcome (a read-only dict of result fields) rule ``name`` gives these inputs"""
+        node = self._trees[name]
+        while type(node) is _Split:
+            node = node.bands[node.band(inputs[node.input])]
+        return node
+
+
+def load_rules(path, required=SCORER_RULES):
+    """Compile and check the rule file at path; raises RuleError (or OSError) when it can't"""
+    with open(path) as handle:
+        try:
+            document = json.load(handle)
+        except ValueError as exc:
+            raise RuleError(f"{path}: {exc}") from None
+    return RuleSet(document, required)
+
+
+def check_version(ruleset, installed):
+    """Raise RuleError if ruleset changes the installed rules but keeps their version"""
+    if ruleset.version == installed.version and ruleset._document != installed._document:
+        raise RuleError(f"Rules changed but still version {ruleset.version}; stored results are tagged "
+                        "with the version they were scored with, so changed rules need a new one")
+
+
+class RuleFile:
+    """The rules in a file, reloaded when the file changes.
+
+    ``refresh()`` looks at the file at most every ``check_interval`` seconds.
+    Replace the file by renaming a complete new one over it, so a reload never
+    reads a half-written file.
+    """
+
+    def __init__(self, path, check_interval=1.0, required=SCORER_RULES):
+        self.path = path
+        self.check_interval = check_interval
+        self.required = required
+        self._signature = self._stat()
+        self._current = load_rules(path, required)
+        self._next_check = time.monotonic() + check_interval
+        self._reload_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    @property
+    def current(self):
+        """The rule set this thread scores with"""
+        return getattr(self._local, 'pinned', None) or self._current
+
+    @contextmanager
+    def pinned(self):
+        """Score everything in this block with one rule set, whatever is reloaded meanwhile"""
+        self._local.pinned = ruleset = self._current
+        try:
+            yield ruleset
+        finally:
+            self._local.pinned = None
+
+    def refresh(self):
+        """Reload the file if it changed; returns True when new rules were swapped in"""
+        now = time.monotonic()
+        if now < self._next_check or not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_check = now + self.check_interval
+            try:
+                signature = self._stat()
+                if signature == self._signature:
+                    return False
+                ruleset = load_rules(self.path, self.required)
+                check_version(ruleset, self._current)
+            except (OSError, RuleError) as exc:
+                logger.error("Keeping threshold rules %s: %s", self._current.version, exc)
+                return False
+            self._signature = signature
+            if ruleset.version == self._current.version:
+                return False  # rewritten with the same rules
+            self._current = ruleset
+            logger.info("Loaded threshold rules %s from %s", ruleset.version, self.path)
+            return True
+        finally:
+            self._reload_lock.release()
+
+
+if __name__ == '__main__':
+    # The file a deployment reads, as app.py finds it
+    installed_path = os.environ.get('HEALTHPLUS_RULES', os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'rules', 'thresholds.json'))
+    try:
+        installed = load_rules(installed_path)
+    except (OSError, RuleError):
+        installed = None
+    failed = False
+    for path in sys.argv[1:] or [installed_path]:
+        try:
+            ruleset = load_rules(path)
+            if installed is not None:
+                check_version(ruleset, installed)
+        except (OSError, RuleError) as exc:
+            print(f"{path}: {exc}")
+            failed = True
+        else:
+            print(f"{path}: version {ruleset.version}, rules: {', '.join(sorted(ruleset._trees))}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,11 @@
+/** Tailwind build config; run through build_assets.py. */
+module.exports = {
+  // Medical report markup lives in app.py, so it's scanned alongside the templates
+  content: ['./templates/**/*.html', './app.py'],
+  // base.html assembles the flash message colours from Jinja conditionals
+  safelist: [{ pattern: /^(bg|border|text)-(green|red|blue)-(100|400|700)$/ }],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
@@ -0,0 +1,20 @@
+import os
+import sys
+
+# Tests run against the in-process memory store, never the deployment's database
+os.environ['HEALTHPLUS_RESULT_STORE'] = 'memory'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def health_app():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(health_app):
+    """A test client with a session of its own"""
+    return health_app.app.test_client()
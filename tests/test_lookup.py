@@ -0,0 +1,8 @@
+import lookup
+
+
+def test_lookup_tables_match_their_scorers(health_app):
+    compiled = {name: assessment.scorer for name, assessment in health_app.ASSESSMENTS.items()
+                if isinstance(assessment.scorer, lookup.LookupScorer)}
+    assert compiled, "no assessment is compiled into a lookup table"
+    assert lookup.verify(compiled) == []
@@ -0,0 +1,46 @@
+import pytest
+
+import documents
+
+
+def submit_readings(client):
+    assert client.post('/submit/bmi', data={'weight': '70', 'height': '175'}).status_code == 302
+    assert client.post('/submit/cardiovascular', data={'systolic': '150', 'diastolic': '95'}).status_code == 302
+
+
+def test_html_report(client):
+    submit_readings(client)
+    response = client.get('/results/report.html')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/html'
+    assert 'Stage 2 Hypertension' in response.get_data(as_text=True)
+    assert client.get('/results/report.html', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_pdf_report_route(client, health_app, monkeypatch):
+    # Runs the PDF path without weasyprint's system libraries: the converter is replaced
+    converted = []
+
+    def fake_pdf(html):
+        converted.append(html)
+        return b'%PDF-1.7 fake'
+
+    monkeypatch.setattr(health_app, 'weasyprint', object())
+    monkeypatch.setattr(health_app, 'html_to_pdf', fake_pdf)
+    submit_readings(client)
+    response = client.get('/results/report.pdf')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/pdf'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="health-report.pdf"'
+    assert response.data == b'%PDF-1.7 fake'
+    assert 'Stage 2 Hypertension' in converted[0]
+
+
+def test_pdf_report_needs_weasyprint(client, health_app, monkeypatch):
+    monkeypatch.setattr(health_app, 'weasyprint', None)
+    assert client.get('/results/report.pdf').status_code == 404
+
+
+@pytest.mark.skipif(documents.weasyprint is None, reason="weasyprint (and its system libraries) not installed")
+def test_html_to_pdf():
+    assert documents.html_to_pdf('<html><body><p>Report</p></body></html>').startswith(b'%PDF')
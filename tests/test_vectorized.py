@@ -0,0 +1,12 @@
+import vectorized
+
+
+def test_vectorized_scorers_match_scalar_scorers(health_app):
+    assert vectorized.verify() == []
+
+
+def test_score_columns_uses_the_given_rules(health_app):
+    rules = health_app.threshold_rules.current
+    columns = {'weight': [50.0, 70.0, 95.0, 70.0], 'height': [175.0, 175.0, 175.0, 0.0]}
+    categories = vectorized.score_columns('bmi', columns, rules)['category']
+    assert list(categories) == ['Underweight', 'Normal weight', 'Obese', None]
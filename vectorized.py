@@ -0,0 +1,238 @@
+"""Columnar (NumPy) versions of the threshold-based assessments.
+
+The scorers in app.py classify one reading at a time. The functions here take
+whole columns (lists or arrays) and return arrays of the same categories, so
+population-level re-scoring doesn't pay a Python function call per row.
+
+They evaluate the same compiled threshold rules as the scalar scorers: each
+takes the ``rules.RuleSet`` to score with, normally ``threshold_rules.current``
+(or the one from ``threshold_rules.pinned()``), so a rule reload changes both
+alike. A split's cut points become one ``np.searchsorted`` per tree node,
+with NaN sent to the node's ``nan`` band as in ``RuleSet.classify``. Run
+``python vectorized.py`` to check them against the scalar scorers on every
+boundary value of the rules in force.
+"""
+import sys
+
+import numpy as np
+
+from rules import _Split
+
+
+def _floats(values):
+    return np.asarray(values, dtype=float)
+
+
+def _split_bands(split, values):
+    """Band index of each value at one split, as _Split.band computes it"""
+    if split.values is not None:
+        # Lower-case the few distinct spellings rather than every row
+        spellings, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        bands = np.array([split.values.get(spelling.lower(), len(split.values)) for spelling in spellings],
+                         dtype=int)
+        return bands[inverse.reshape(-1)]
+    values = _floats(values)
+    bands = np.searchsorted(split.cuts, values, side='right' if split.equal == 'upper' else 'left')
+    return np.where(np.isnan(values), split.nan, bands)
+
+
+def _outcomes(node, found):
+    """Every outcome reachable from node, in tree order, without repeats"""
+    if type(node) is _Split:
+        for band in node.bands:
+            _outcomes(band, found)
+    elif not any(outcome is node for outcome in found):
+        found.append(node)
+    return found
+
+
+def classify_columns(rules, name, **columns):
+    """Vectorized RuleSet.classify: a dict of result-field arrays for whole input columns"""
+    tree = rules.tree(name)
+    outcomes = _outcomes(tree, [])
+    columns = {input_name: np.asarray(values) for input_name, values in columns.items()}
+    rows = len(next(iter(columns.values())))
+    index = np.zeros(rows, dtype=int)
+
+    def walk(node, selected):
+        if type(node) is not _Split:
+            index[selected] = next(i for i, outcome in enumerate(outcomes) if outcome is node)
+            return
+        bands = _split_bands(node, columns[node.input][selected])
+        for band, child in enumerate(node.bands):
+            rows_in_band = selected[bands == band]
+            if rows_in_band.size:
+                walk(child, rows_in_band)
+
+    walk(tree, np.arange(rows))
+    fields = dict.fromkeys(field for outcome in outcomes for field in outcome)
+    return {field: np.array([outcome.get(field) for outcome in outcomes], dtype=object)[index]
+            for field in fields}
+
+
+def bmi_category(rules, weight_kg, height_m):
+    """Vectorized calculate_bmi category; None where the height is not positive"""
+    weight = _floats(weight_kg)
+    height = _floats(height_m)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bmi = weight / height ** 2
+    return np.where(height <= 0, None, classify_columns(rules, 'bmi', bmi=bmi)['category'])
+
+
+def cardiovascular(rules, bp_systolic, bp_diastolic):
+    """Vectorized assess_cardiovascular: returns (status, risk) arrays"""
+    outcome = classify_columns(rules, 'cardiovascular', systolic=bp_systolic, diastolic=bp_diastolic)
+    return outcome['status'], outcome['risk']
+
+
+def respiratory_status(rules, spo2):
+    """Vectorized assess_respiratory status"""
+    return classify_columns(rules, 'respiratory', spo2=spo2)['status']
+
+
+def fitness_status(rules, resting_hr):
+    """Vectorized assess_fitness status"""
+    return classify_columns(rules, 'fitness', resting_hr=resting_hr)['status']
+
+
+def temperature_status(rules, temp_celsius):
+    """Vectorized assess_temperature status"""
+    return classify_columns(rules, 'temperature', temperature=temp_celsius)['status']
+
+
+def body_composition_status(rules, bf_percentage, gender, age):
+    """Vectorized assess_body_composition status"""
+    return classify_columns(rules, 'body-composition', bf_percentage=bf_percentage, gender=gender, age=age)['status']
+
+
+def grip_strength_status(rules, grip_kg, gender, age):
+    """Vectorized assess_grip_strength status"""
+    return classify_columns(rules, 'grip-strength', grip_kg=grip_kg, gender=gender, age=age)['status']
+
+
+def _score_cardiovascular(rules, columns):
+    status, risk = cardiovascular(rules, columns['systolic'], columns['diastolic'])
+    return {'status': status, 'risk': risk}
+
+
+# Column scorers keyed by assessment type. Inputs are dicts of arrays named
+# like the assessment's form fields; outputs are dicts of result-field arrays.
+COLUMN_SCORERS = {
+    # Height is entered in cm
+    'bmi': lambda r, c: {'category': bmi_category(r, c['weight'], _floats(c['height']) / 100)},
+    'cardiovascular': _score_cardiovascular,
+    'respiratory': lambda r, c: {'status': respiratory_status(r, c['spo2'])},
+    'fitness': lambda r, c: {'status': fitness_status(r, c['resting_hr'])},
+    'temperature': lambda r, c: {'status': temperature_status(r, c['temperature'])},
+    'body-composition': lambda r, c: {
+        'status': body_composition_status(r, c['bf_percentage'], c['gender'], c['age'])
+    },
+    'grip-strength': lambda r, c: {'status': grip_strength_status(r, c['grip_strength'], c['gender'], c['age'])},
+}
+
+
+def score_columns(assessment_type, columns, rules):
+    """Score whole input columns for one assessment type with a rule set (record ``rules.version`` with them)"""
+    return COLUMN_SCORERS[assessment_type](rules, columns)
+
+
+def _rule_cuts(rules, name, input_name):
+    """Every cut point rule ``name`` splits ``input_name`` on"""
+    cuts = set()
+    stack = [rules.tree(name)]
+    while stack:
+        node = stack.pop()
+        if type(node) is _Split:
+            if node.input == input_name and node.cuts is not None:
+                cuts.update(node.cuts)
+            stack.extend(node.bands)
+    return sorted(cuts)
+
+
+def _boundary_values(cuts, extra=(), nan=True):
+    """Each cut point, its floating-point neighbours, +-1 around it and NaN"""
+    values = {0.0, -1.0, 1000.0, *extra}
+    if nan:
+        values.add(float('nan'))
+    for cut in cuts:
+        cut = float(cut)
+        values.update({cut, cut - 1, cut + 1, cut - 0.05, cut + 0.05,
+                       float(np.nextafter(cut, -np.inf)), float(np.nextafter(cut, np.inf))})
+    return sorted(values, key=lambda v: (v != v, v))
+
+
+def _grid(*axes):
+    mesh = np.meshgrid(*[np.asarray(axis, dtype=object) for axis in axes], indexing='ij')
+    return [m.ravel() for m in mesh]
+
+
+def _same(expected, actual):
+    return expected == actual or (expected is None and actual is None)
+
+
+def verify():
+    """Compare every vectorized scorer with its scalar counterpart on the boundary values of the rules in force.
+
+    Returns a list of (function name, inputs, expected, actual) mismatches.
+    """
+    import app as scalar
+
+    mismatches = []
+
+    def check(name, inputs, expected, actual):
+        for row, (exp, act) in enumerate(zip(expected, actual)):
+            if not _same(exp, act):
+                mismatches.append((name, tuple(values[row] for values in inputs), exp, act))
+
+    with scalar.threshold_rules.pinned() as rules:
+        ages = _boundary_values(_rule_cuts(rules, 'body-composition', 'age') + _rule_cuts(rules, 'grip-strength', 'age'),
+                                extra=(18.0, 65.0))
+        genders = ['male', 'Male', 'female', 'other']
+
+        # A height of 1 m makes the weight the BMI, so these land on and just under each BMI cut
+        bmi_cuts = _rule_cuts(rules, 'bmi', 'bmi')
+        weight, height = _grid([40.0, 55.5, 70.0, 92.0, 130.0], _boundary_values([1.0], extra=(1.5, 1.75, 2.0)))
+        weight = np.concatenate([weight, bmi_cuts, [cut - 0.0001 for cut in bmi_cuts]]).astype(float)
+        height = np.concatenate([height, [1.0] * (2 * len(bmi_cuts))]).astype(float)
+        expected = [(scalar.calculate_bmi(w, h) or {}).get('category') for w, h in zip(weight, height)]
+        check('bmi_category', (weight, height), expected, bmi_category(rules, weight, height))
+
+        systolic, diastolic = _grid(_boundary_values(_rule_cuts(rules, 'cardiovascular', 'systolic')),
+                                    _boundary_values(_rule_cuts(rules, 'cardiovascular', 'diastolic')))
+        status, risk = cardiovascular(rules, systolic.astype(float), diastolic.astype(float))
+        results = [scalar.assess_cardiovascular(s, d) for s, d in zip(systolic, diastolic)]
+        check('cardiovascular.status', (systolic, diastolic), [r['status'] for r in results], status)
+        check('cardiovascular.risk', (systolic, diastolic), [r['risk'] for r in results], risk)
+
+        spo2 = _boundary_values(_rule_cuts(rules, 'respiratory', 'spo2'))
+        check('respiratory_status', (spo2,), [scalar.assess_respiratory(v)['status'] for v in spo2],
+              respiratory_status(rules, spo2))
+
+        # assess_fitness can't format a heart-rate zone for NaN, so it's left out here
+        resting_hr = _boundary_values(_rule_cuts(rules, 'fitness', 'resting_hr'), nan=False)
+        check('fitness_status', (resting_hr,), [scalar.assess_fitness(v, 40)['status'] for v in resting_hr],
+              fitness_status(rules, resting_hr))
+
+        temps = _boundary_values(_rule_cuts(rules, 'temperature', 'temperature'))
+        check('temperature_status', (temps,), [scalar.assess_temperature(v)['status'] for v in temps],
+              temperature_status(rules, temps))
+
+        bf, gender, age = _grid(_boundary_values(_rule_cuts(rules, 'body-composition', 'bf_percentage')),
+                                genders, ages)
+        expected = [scalar.assess_body_composition(b, g, a)['status'] for b, g, a in zip(bf, gender, age)]
+        check('body_composition_status', (bf, gender, age), expected,
+              body_composition_status(rules, bf.astype(float), gender.astype(str), age.astype(float)))
+
+        grip, gender, age = _grid(_boundary_values(_rule_cuts(rules, 'grip-strength', 'grip_kg')), genders, ages)
+        expected = [scalar.assess_grip_strength(v, g, a)['status'] for v, g, a in zip(grip, gender, age)]
+        check('grip_strength_status', (grip, gender, age), expected,
+              grip_strength_status(rules, grip.astype(float), gender.astype(str), age.astype(float)))
+
+    return mismatches
+
+if __name__ == '__main__':
+    found = verify()
+    for name, inputs, expected, actual in found[:20]:
+        print(f"{name}{inputs}: scalar={expected!r} vectorized={actual!r}")
+    print(f"{len(found)} mismatches")
+    sys.exit(1 if found else 0)